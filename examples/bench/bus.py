@@ -0,0 +1,106 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+
+import os
+import sys
+import time
+import threading
+
+import appier
+
+COUNT = 1000
+""" The number of ping/pong round trips to be performed
+for each of the bus engines under benchmark """
+
+
+def child(bus):
+    stop = threading.Event()
+    bus.reload()
+    bus.bind("ping", lambda value: bus.trigger("pong", value))
+    bus.bind("stop", lambda: stop.set())
+    bus.trigger("ready")
+    stop.wait(60.0)
+    bus.unload()
+
+
+def run(name, bus_c):
+    try:
+        bus = bus_c.new()
+    except Exception as exception:
+        print("%-8s skipped (%s)" % (name, exception))
+        return
+
+    event = threading.Event()
+    bus.bind("ready", lambda: event.set())
+    bus.bind("pong", lambda value: event.set())
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            child(bus)
+        finally:
+            os._exit(0)
+
+    event.wait(10.0)
+
+    # runs the complete set of round trips (parent to child and back)
+    # measuring the latency of each of them (in microseconds)
+    latencies = []
+    for index in range(COUNT):
+        event.clear()
+        start = time.time()
+        bus.trigger("ping", index)
+        event.wait(10.0)
+        latencies.append((time.time() - start) * 1000000.0)
+
+    bus.trigger("stop")
+    os.waitpid(pid, 0)
+    bus.unload()
+
+    latencies.sort()
+    print(
+        "%-8s %8.2f us (avg) %8.2f us (p50) %8.2f us (p99)"
+        % (
+            name,
+            sum(latencies) / len(latencies),
+            latencies[len(latencies) // 2],
+            latencies[int(len(latencies) * 0.99)],
+        )
+    )
+
+
+if len(sys.argv) > 1:
+    COUNT = int(sys.argv[1])
+
+app = appier.App()
+run("local", appier.LocalBus)
+run("redis", appier.RedisBus)
+app.unload()
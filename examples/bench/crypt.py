@@ -0,0 +1,64 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+
+import sys
+import time
+
+import appier
+
+COUNT = 100
+""" The number of encryption operations to be performed for
+each of the payload sizes under benchmark """
+
+SIZES = (16, 1024, 65536)
+""" The sizes (in bytes) of the payloads to be encrypted """
+
+
+def run(name, size):
+    data = b"x" * size
+
+    start = time.time()
+    for _index in range(COUNT):
+        appier.Cipher.new(name, b"secret key").encrypt(data)
+    elapsed = (time.time() - start) / COUNT
+
+    print(
+        "%-8s %8d bytes %10.2f us %10.2f MB/s"
+        % (name, size, elapsed * 1000000.0, size / elapsed / 1000000.0)
+    )
+
+
+if len(sys.argv) > 1:
+    COUNT = int(sys.argv[1])
+
+for name in ("rc4", "spritz"):
+    for size in SIZES:
+        run(name, size)
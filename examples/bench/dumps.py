@@ -0,0 +1,95 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+
+import sys
+import json
+import time
+import datetime
+
+import appier
+
+COUNT = 10000
+""" The number of items (documents) in the list that is going
+to be encoded by each of the engines under benchmark """
+
+REPEAT = 10
+""" The number of times the encoding of the list is repeated """
+
+
+def items():
+    date = datetime.datetime(2024, 1, 1)
+    return [
+        dict(id=index, name="name %d" % index, price=index * 0.5, created=date)
+        for index in range(COUNT)
+    ]
+
+
+def run(name, method):
+    value = items()
+
+    start = time.time()
+    for _index in range(REPEAT):
+        size = method(value)
+    elapsed = (time.time() - start) / REPEAT
+
+    print(
+        "%-20s %8d items %10.2f ms %10.2f us/item %10d bytes"
+        % (name, COUNT, elapsed * 1000.0, elapsed / COUNT * 1000000.0, size)
+    )
+
+
+def dumps_legacy(value):
+    encoder = appier.JSONEncoder()
+    return len(legacy.bytes(encoder.encode(value), "utf-8", force=True))
+
+
+def dumps_json(value):
+    return len(appier.serialize.dumps_json_b(value))
+
+
+def dumps_json_g(value):
+    return sum(len(chunk) for chunk in appier.serialize.dumps_json_g(value))
+
+
+if len(sys.argv) > 1:
+    COUNT = int(sys.argv[1])
+
+legacy = appier.legacy
+
+run("json (legacy)", dumps_legacy)
+
+for engine in appier.serialize.JSON_ENGINES:
+    try:
+        appier.serialize.set_json_engine(engine)
+    except appier.OperationalError:
+        continue
+    run(engine, dumps_json)
+    run(engine + " (g)", dumps_json_g)
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+
+import sys
+import time
+import random
+
+import appier
+
+SIZE = 200
+""" The size of the side of the synthetic grid graph, meaning
+that the graph is going to have the square of it as nodes """
+
+QUERIES = 20
+""" The number of (random) shortest path queries to be run
+for each of the algorithms under benchmark """
+
+LEGACY_SIZE = 20
+""" The maximum size of the grid for which the legacy algorithm
+is run, as its running time grows very fast with the size """
+
+
+def legacy(graph, src, dst):
+    # previous implementation of the algorithm, that used the memory
+    # queue as the heap with no visited set (nor early exit), kept
+    # here as the baseline for the comparison
+    dist, prev = dict(), dict()
+    dist[src] = 0
+
+    queue = appier.MemoryQueue()
+    queue.push(src, priority=0)
+
+    while queue.length() > 0:
+        _, _, top = queue.pop(full=True)
+        dist[top] = dist[top] if top in dist else appier.defines.INFINITY
+
+        edges = graph.edges[top] if top in graph.edges else {}
+        for nxt, cost in edges.items():
+            dist[nxt] = dist[nxt] if nxt in dist else appier.defines.INFINITY
+
+            alt = dist[top] + cost
+            if alt < dist[nxt]:
+                dist[nxt] = alt
+                prev[nxt] = top
+                queue.push(nxt, priority=dist[nxt])
+
+    return appier.Graph._build_path(prev, src, dst), dist.get(dst)
+
+
+def build(size):
+    graph = appier.Graph()
+    for x in range(size):
+        for y in range(size):
+            if x < size - 1:
+                cost = random.randint(1, 9)
+                graph.add_edge((x, y), (x + 1, y), cost=cost, bidirectional=True)
+            if y < size - 1:
+                cost = random.randint(1, 9)
+                graph.add_edge((x, y), (x, y + 1), cost=cost, bidirectional=True)
+    return graph
+
+
+def heuristic(node, dst):
+    return abs(node[0] - dst[0]) + abs(node[1] - dst[1])
+
+
+def run(name, method, queries):
+    start = time.time()
+    for src, dst in queries:
+        method(src, dst)
+    elapsed = (time.time() - start) / len(queries) * 1000.0
+    print("%-12s %10.2f ms" % (name, elapsed))
+
+
+if len(sys.argv) > 1:
+    SIZE = int(sys.argv[1])
+
+random.seed(0)
+
+start = time.time()
+graph = build(SIZE)
+print("%-12s %10.2f ms (%d nodes)" % ("build", (time.time() - start) * 1000.0, SIZE**2))
+
+nodes = [(x, y) for x in range(SIZE) for y in range(SIZE)]
+queries = [(random.choice(nodes), random.choice(nodes)) for _index in range(QUERIES)]
+sources = [(nodes[0], dst) for _src, dst in queries]
+
+if SIZE <= LEGACY_SIZE:
+    run("legacy", lambda src, dst: legacy(graph, src, dst), queries)
+run("dijkstra", graph.dijkstra, queries)
+run("astar", lambda src, dst: graph.astar(src, dst, heuristic), queries)
+
+graph.tree(nodes[0])
+run("cached", graph.dijkstra, sources)
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+
+import sys
+import time
+
+import appier
+
+COUNT = 100000
+""" The number of rows (items) to be serialized by each
+of the serialization strategies under benchmark """
+
+
+def items():
+    for index in range(COUNT):
+        yield dict(id=index, name="name %d" % index, price=index * 0.5)
+
+
+def run(name, method):
+    start = time.time()
+    size = method()
+    elapsed = time.time() - start
+
+    print(
+        "%-20s %8d rows %10.2f ms %10.2f us/row %10d bytes"
+        % (name, COUNT, elapsed * 1000.0, elapsed / COUNT * 1000000.0, size)
+    )
+
+
+def serialize_csv():
+    return len(appier.serialize_csv(list(items())))
+
+
+def serialize_csv_g():
+    return sum(len(chunk) for chunk in appier.serialize_csv_g(items()))
+
+
+def serialize_csv_e():
+    encoders = dict(id=str, name=str, price=str)
+    chunks = appier.serialize_csv_g(items(), encoders=encoders)
+    return sum(len(chunk) for chunk in chunks)
+
+
+if len(sys.argv) > 1:
+    COUNT = int(sys.argv[1])
+
+run("serialize_csv", serialize_csv)
+run("serialize_csv_g", serialize_csv_g)
+run("serialize_csv_g (e)", serialize_csv_e)
@@ -46,9 +46,12 @@ from . import geo
 from . import git
 from . import graph
 from . import http
+from . import imaging
+from . import ipc
 from . import legacy
 from . import log
 from . import meta
+from . import metrics
 from . import mock
 from . import model
 from . import mongo
@@ -70,7 +73,7 @@ from . import util
 from . import validation
 
 from .amqp import AMQP
-from .api import API, OAuthAPI, OAuth1API, OAuth2API
+from .api import gather, gather_a, API, OAuthAPI, OAuth1API, OAuth2API
 from .asynchronous import (
     ASYNC_HEADER,
     AsyncManager,
@@ -140,7 +143,7 @@ from .base import (
     build_asgi,
     build_asgi_i,
 )
-from .bus import Bus, MemoryBus, RedisBus
+from .bus import Bus, MemoryBus, LocalBus, RedisBus
 from .cache import Cache, MemoryCache, FileCache, RedisCache, SerializedCache
 from .component import Component
 from .compress import Compress
@@ -227,11 +230,25 @@ from .extra import (
 from .geo import GeoResolver
 from .git import Git
 from .graph import Graph
-from .http import file_g, get_f, get, post, put, delete, patch, basic_auth, HTTPResponse
+from .http import (
+    file_g,
+    get_f,
+    get,
+    post,
+    put,
+    delete,
+    patch,
+    basic_auth,
+    HTTPResponse,
+    HTTPStreamResponse,
+)
+from .imaging import Pipeline
 from .log import (
     SILENT,
     TRACE,
     MemoryHandler,
+    QueueHandler,
+    QueueListener,
     BaseFormatter,
     ThreadFormatter,
     DummyLogger,
@@ -242,6 +259,15 @@ from .log import (
     in_signature,
 )
 from .meta import Ordered, Indexed
+from .metrics import (
+    Histogram,
+    RouteMetrics,
+    Metrics,
+    CollectionMetrics,
+    QueryProfiler,
+    SamplingProfiler,
+    Sampler,
+)
 from .mock import MockObject, MockResponse, MockApp
 from .model import (
     Model,
@@ -276,13 +302,21 @@ from .preferences import (
     Preferences,
     MemoryPreferences,
     FilePreferences,
+    LogPreferences,
     RedisPreferences,
+    RedisCachedPreferences,
 )
 from .queuing import Queue, MemoryQueue, MultiprocessQueue, AMQPQueue
 from .redisdb import Redis
 from .request import CODE_STRINGS, Request, MockRequest
 from .scheduler import Scheduler, CronScheduler, SchedulerTask, SchedulerDate, Cron
-from .serialize import serialize_csv, serialize_ics, build_encoder
+from .serialize import (
+    serialize_csv,
+    serialize_csv_g,
+    serialize_ics,
+    serialize_ics_g,
+    build_encoder,
+)
 from .session import (
     Session,
     MockSession,
@@ -303,13 +337,14 @@ from .smtp import (
     application,
     header,
 )
-from .storage import StorageEngine, BaseEngine, FsEngine
+from .storage import StorageEngine, BaseEngine, FsEngine, ChunkEngine, ContentEngine
 from .structures import (
     OrderedDict,
     LazyDict,
     LazyValue,
     GeneratorFile,
     LimitedSizeDict,
+    LRUDict,
     lazy_dict,
     lazy,
 )
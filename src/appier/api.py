@@ -44,15 +44,23 @@ import time
 import base64
 import hashlib
 import logging
+import threading
+import collections
 
 from . import log
 from . import base
 from . import http
+from . import config
 from . import legacy
 from . import observer
 from . import exceptions
 from . import structures
 
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
 RESERVED_KWARGS = (
     "uuid",
     "retry",
@@ -61,6 +69,7 @@ RESERVED_KWARGS = (
     "async",
     "asynchronous",
     "use_file",
+    "stream",
     "callback",
     "callback_init",
     "callback_open",
@@ -74,6 +83,143 @@ API client for the handling of specific features, these should
 not be used as part of the parameters sent to the server side and
 are reserved for the internal handling of the API client """
 
+WORKERS = 8
+""" The default maximum number of threads that are going to be
+used to run the requests of a gather operation concurrently """
+
+
+def gather(calls, workers=None, raise_e=True):
+    """
+    Runs the provided sequence of calls (typically API requests)
+    concurrently using a bounded pool of threads, returning the
+    results in the same order as the calls.
+
+    Each call may be either a callable (with no arguments) or a
+    tuple containing the callable followed by a sequence of positional
+    arguments and optionally a dictionary of keyword arguments, eg:
+    `(api.get, (url,), dict(timeout=10))`.
+
+    As each call is run as is, both the authentication retries (using
+    the auth callback) and the per call timeouts are preserved.
+
+    :type calls: List
+    :param calls: The sequence of calls that are going to be run
+    concurrently (callables or tuples).
+    :type workers: int
+    :param workers: The maximum number of threads to be used, if not
+    provided the `API_WORKERS` configuration value is used.
+    :type raise_e: bool
+    :param raise_e: If the first (in order) exception raised by the
+    calls should be re-raised, otherwise exceptions are returned in
+    place of the results.
+    :rtype: List
+    :return: The list containing the results of the calls in the same
+    order as the one of the provided calls.
+    """
+
+    calls = [_callable(call) for call in calls]
+    if not calls:
+        return []
+
+    if workers == None:
+        workers = config.conf("API_WORKERS", WORKERS, cast=int)
+    workers = max(min(workers, len(calls)), 1)
+
+    results = [None] * len(calls)
+    errors = [None] * len(calls)
+    pending = collections.deque(range(len(calls)))
+
+    def worker(context=None):
+        while True:
+            try:
+                index = pending.popleft()
+            except IndexError:
+                break
+            try:
+                if context:
+                    results[index] = context.copy().run(calls[index])
+                else:
+                    results[index] = calls[index]()
+            except Exception as exception:
+                errors[index] = exception
+
+    # in case there's a single worker (or a single call) runs the calls
+    # in the current thread avoiding the (useless) overhead of threads
+    if workers == 1:
+        worker()
+    else:
+        # propagates the current context (eg: the request context) to
+        # the worker threads so that the calls run under the same context
+        context = contextvars.copy_context() if contextvars else None
+        threads = [
+            threading.Thread(target=worker, kwargs=dict(context=context))
+            for _index in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for index, error in enumerate(errors):
+        if not error:
+            continue
+        if raise_e:
+            raise error
+        results[index] = error
+
+    return results
+
+
+def gather_a(calls, workers=None, raise_e=True):
+    """
+    Asynchronous version of the gather operation, to be used from
+    coroutine based actions (eg: under the ASGI server) so that the
+    event loop is not blocked while the calls are running.
+
+    The calls are run in a pool of threads of the running event loop
+    and the returned awaitable resolves to the results in order.
+
+    :type calls: List
+    :param calls: The sequence of calls that are going to be run
+    concurrently (callables or tuples).
+    :type workers: int
+    :param workers: The maximum number of threads to be used, if not
+    provided the `API_WORKERS` configuration value is used.
+    :type raise_e: bool
+    :param raise_e: If the first (in order) exception raised by the
+    calls should be re-raised, otherwise exceptions are returned in
+    place of the results.
+    :rtype: Future
+    :return: The awaitable that resolves to the list of results.
+    """
+
+    import asyncio
+    import concurrent.futures
+
+    calls = [_callable(call) for call in calls]
+    if workers == None:
+        workers = config.conf("API_WORKERS", WORKERS, cast=int)
+    workers = max(min(workers, len(calls)), 1)
+
+    loop = asyncio.get_event_loop()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    context = contextvars.copy_context()
+    futures = [
+        loop.run_in_executor(executor, context.copy().run, call) for call in calls
+    ]
+    future = asyncio.gather(*futures, return_exceptions=not raise_e)
+    future.add_done_callback(lambda future: executor.shutdown(wait=False))
+    return future
+
+
+def _callable(call):
+    if callable(call):
+        return call
+    method = call[0]
+    args = call[1] if len(call) > 1 else ()
+    kwargs = call[2] if len(call) > 2 else dict()
+    return lambda: method(*args, **kwargs)
+
 
 class API(observer.Observable):
     """
@@ -1,8 +1,15 @@
-from typing import Any, Callable, Self
+from typing import Any, Awaitable, Callable, Sequence, Self
 
 from .base import App
 from .observer import Observable
 
+def gather(
+    calls: Sequence[Callable | tuple], workers: int | None = ..., raise_e: bool = ...
+) -> list[Any]: ...
+def gather_a(
+    calls: Sequence[Callable | tuple], workers: int | None = ..., raise_e: bool = ...
+) -> Awaitable[list[Any]]: ...
+
 class API(Observable):
     SINGLETON: Self | None
     owner: App
@@ -41,6 +41,7 @@ __license__ = "Apache License, Version 2.0"
 import os
 import re
 import sys
+import hmac
 import time
 import json
 import uuid
@@ -74,9 +75,12 @@ from . import legacy
 from . import defines
 from . import session
 from . import request
+from . import imaging
+from . import metrics
 from . import compress
 from . import settings
 from . import observer
+from . import serialize
 from . import execution
 from . import scheduler
 from . import controller
@@ -392,6 +396,9 @@ class App(
         self.local_url = None
         self.adapter = adapter_c()
         self.manager = manager_c(self)
+        self.collector = None
+        self.query_profiler = None
+        self.profiler = None
         self.routes_v = None
         self.pid = None
         self.tid = None
@@ -434,6 +441,8 @@ class App(
         self._loaded = False
         self._resolved = False
         self._locale_d = locales[0]
+        self._locales_i = {}
+        self._locales_l = locales
         self._server = None
         self._user_routes = None
         self._core_routes = None
@@ -695,13 +704,14 @@ class App(
         self._load_settings()
         self._load_handlers(handlers)
         self._load_cache()
-        self._load_preferences()
         self._load_bus()
+        self._load_preferences()
         self._load_session()
         self._load_adapter()
         self._load_manager()
         self._load_execution()
         self._load_request()
+        self._load_metrics()
         self._load_context()
         self._load_templating()
         self._load_imaging()
@@ -726,9 +736,10 @@ class App(
         self._unload_execution()
         self._unload_manager()
         self._unload_session()
-        self._unload_bus()
         self._unload_preferences()
+        self._unload_bus()
         self._unload_cache()
+        self._unload_metrics()
         self._unload_logging()
         self._loaded = False
 
@@ -760,6 +771,7 @@ class App(
         self._stop_supervisor()
         self._stop_models()
         self._stop_controllers()
+        self._flush_logging()
         self.tid = None
         self.pid = None
         self.status = STOPPED
@@ -828,6 +840,8 @@ class App(
     def reset(self, *args, **kwargs):
         if self.adapter:
             self.adapter.reset()
+        http.reset_pools()
+        imaging.reset_pipeline()
 
     def child(self, *args, **kwargs):
         """
@@ -947,7 +961,7 @@ class App(
                 continue
             kwargs[name_s] = value
 
-        kwargs["handlers"] = self.handlers
+        kwargs["handlers"] = self._get_handlers()
         kwargs["level"] = self.level
 
         self.logger.info("Starting '%s' with '%s' ..." % (self.name, server))
@@ -1402,6 +1416,8 @@ class App(
                 (("GET",), "/info", self.info),
                 (("GET",), "/versions", self.versions),
                 (("GET",), "/log", self.logging),
+                (("GET",), "/metrics", self.metrics),
+                (("GET",), "/profile", self.profile),
                 (("GET",), "/debug", self.debug),
                 (("GET", "POST"), "/login", self.login),
                 (("GET", "POST"), "/logout", self.logout),
@@ -1464,6 +1480,11 @@ class App(
         if not self.has_request_ctx():
             self._request.close()
 
+        # stops the sampling of the current thread in case the request
+        # has been profiled, this is a no-op for the other requests
+        if self.profiler:
+            self.profiler.end()
+
         # restores both the request and owner variable back
         # to their original state, ready to be used by another
         # request life-cycle
@@ -1545,11 +1566,12 @@ class App(
         params = util.decode_params(params)
         self.request.set_params(params)
 
-        # reads the data from the input stream file and then tries
-        # to load the data appropriately handling all normal cases
-        # (eg JSON, form data, etc.)
-        data = None if method in BODYLESS_METHODS else input.read(content_length_i)
-        self.request.set_data(data)
+        # sets the input stream file as the source of the data for the
+        # request and then loads the base structures of the request, note
+        # that both the reading of the data and its parsing (eg JSON, form
+        # data, etc.) are deferred until the data is first accessed
+        if not method in BODYLESS_METHODS:
+            self.request.set_input(input, content_length_i)
         self.request.load_base()
         self.request.load_locale(self.locales)
 
@@ -1567,11 +1589,30 @@ class App(
         # back to the original (unset) value
         self._set_locale()
 
+        # in case the metrics collection is enabled creates the map that
+        # is going to store the time spent in each of the request phases
+        # and sets the (monotonic) start time for the request's latency
+        if self.collector:
+            self.request.timings = dict()
+            self.request.ptime = legacy.perf_counter()
+
+        # in case the query profiler is enabled creates the list that will
+        # hold the queries performed while handling the request
+        if self.query_profiler:
+            self.request.queries = []
+
         # calls the before request handler method, indicating that the
         # request is going to be handled in the next few logic steps
+        stime = legacy.perf_counter()
         self.before_request()
+        self.request.timing("before", legacy.perf_counter() - stime)
 
         try:
+            # verifies if the current request should be profiled by the sampling
+            # profiler and if that's the case starts the sampling of the thread
+            if self.profiler and self._is_profiled():
+                self.profiler.begin(self.request)
+
             # handles the currently defined request and in case there's an
             # exception triggered by the underlying action methods, handles
             # it with the proper error handler so that a proper result value
@@ -1643,7 +1684,9 @@ class App(
         finally:
             # calls the finally request handler method, indicating that the request
             # has finished the current try context, useful for cleanup operations
+            stime = legacy.perf_counter()
             self.finally_request()
+            self.request.timing("finally", legacy.perf_counter() - stime)
 
         # in case the current method required empty responses/result the result
         # is "forced" to be empty so that no specification is
@@ -1689,7 +1732,9 @@ class App(
         # string value from it as the final message to be sent to the client, then
         # validates that the value is a string value in case it's not casts it as
         # a string using the default "serializer" structure
-        result_s = json.dumps(result) if is_json else result
+        result_s = (
+            serialize.dumps_json_b(result, encoding=encoding) if is_json else result
+        )
         result_t = type(result_s)
         if result_t == legacy.UNICODE:
             result_s = result_s.encode(encoding)
@@ -1726,7 +1771,13 @@ class App(
         # calls the after request handler that is meant to defined the end of the
         # processing of the request, this creates an extension point for final
         # modifications on the request/response to be sent to the client
+        stime = legacy.perf_counter()
         self.after_request()
+        self.request.timing("after", legacy.perf_counter() - stime)
+
+        # records the duration of the request handling (and the time spent
+        # in each of its phases) under the route that handled the request
+        self._record_metrics()
 
         # retrieves the (output) headers defined in the current request and extends
         # them with the current content type (JSON) then calls starts the response
@@ -1950,6 +2001,10 @@ class App(
         used in the handling of the current request.
         """
 
+        # stores the time at which the routing process has started so that
+        # it's possible to measure the time spent matching the route
+        stime = legacy.perf_counter()
+
         # retrieves the currently defined set of routes, this should be
         # handled using a lazy loading strategy, where only the first call
         # will trigger a loading process, the following ones are cached
@@ -2000,6 +2055,13 @@ class App(
             item_l = len(route)
             opts_i = route[3] if item_l > 3 else {}
 
+            # sets the name of the route that is handling the request, the
+            # (base) expression of the route is used so that the metrics of
+            # the request are grouped independently of the route parameters,
+            # then records the time that was spent in the routing process
+            self.request.route_name = method + " " + opts_i.get("base", path)
+            self.request.timing("route", legacy.perf_counter() - stime)
+
             # tries to retrieve the payload attribute for the current item in case
             # a JSON data value is defined otherwise default to single value (simple
             # message handling)
@@ -2074,7 +2136,9 @@ class App(
                     self.request.context = context
                     self.request.method_i = method_i
                     self.trigger("before_route", method_i, args, kwargs)
+                    stime = legacy.perf_counter()
                     return_v = method_i(*args, **kwargs)
+                    self.request.timing("action", legacy.perf_counter() - stime)
                     self.trigger("after_route", method_i, args, kwargs)
 
             # returns the currently defined return value, for situations where
@@ -2559,17 +2623,29 @@ class App(
         separators=None,
         **kwargs
     ):
-        data = json.dumps(
+        data = serialize.dumps_json_b(
             structure,
+            encoding=encoding,
             sort_keys=sort_keys,
             indent=indent,
             separators=separators,
             **kwargs
         )
-        data = legacy.bytes(data, encoding=encoding, force=True)
         self.request.set_content_type(content_type)
         return data
 
+    def json_g(
+        self,
+        items,
+        content_type="application/json",
+        encoding="utf-8",
+        buffer_size=BUFFER_SIZE,
+    ):
+        self.request.set_content_type(content_type)
+        return serialize.dumps_json_g(
+            items, encoding=encoding, sized=True, buffer_size=buffer_size
+        )
+
     def slugify(self, word):
         """
         Runs the "slugification" process on the provided word,
@@ -2685,6 +2761,10 @@ class App(
         if locale:
             kwargs["_locale"] = locale
 
+        # stores the time at which the rendering has started so that the
+        # time spent in the template engine is accounted in the request
+        stime = legacy.perf_counter()
+
         # runs a series of template engine validation to detect the one
         # that should be used for the current context, returning the result
         # for each of them inside the result variable
@@ -2703,6 +2783,11 @@ class App(
         if result == None:
             raise exceptions.OperationalError(message="No valid template engine found")
 
+        # accounts the time spent in the rendering of the template in the
+        # current request, a no-op in case no metrics are being collected
+        if self.request:
+            self.request.timing("template", legacy.perf_counter() - stime)
+
         # in case there's no request currently defined or the template is
         # being rendered in a detached environment (eg: email rendering)
         # no extra operations are required and the result value is returned
@@ -3221,9 +3306,9 @@ class App(
             self.content_disposition('filename="%s"' % name)
         if content_type:
             self.content_type(content_type)
-        for value in asynchronous.header_a():
+        response = http.get(url, params=params, stream=True)
+        for value in response.generator():
             yield value
-        yield http.get(url, params=params)
 
     def send_url_a(self, url, name=None, content_type=None, params=None, **kwargs):
         params = params or kwargs or dict()
@@ -3893,24 +3978,10 @@ class App(
                 ]
             )
         locale = locale or self.request.locale
-        if locale:
-            bundle = self.get_bundle(locale, context=context) or {}
-            result = bundle.get(value, None)
-            if not result == None:
-                return result
-            language = locale.split("_", 1)[0]
-            bundle = self.get_bundle(language, context=context) or {}
-            result = bundle.get(value, None)
-            if not result == None:
-                return result
-        if fallback:
-            return self.to_locale(
-                value,
-                locale=self._locale_d,
-                context=context,
-                default=default,
-                fallback=False,
-            )
+        index = self._locale_index(locale, context=context, fallback=fallback)
+        result = index.get(value, None)
+        if not result == None:
+            return result
         return value if default == None else default
 
     def has_locale(self, value, locale=None, context=None):
@@ -4122,6 +4193,31 @@ class App(
         level = level if level else None
         return dict(messages=self.handler_memory.get_latest(count=count, level=level))
 
+    @util.private
+    def metrics(self, data={}, reset=False):
+        if not self.collector and not self.query_profiler:
+            raise exceptions.OperationalError(message="Metrics not enabled")
+        reset = reset in (True, "1", "true")
+        result = self.collector.to_dict() if self.collector else dict()
+        if self.query_profiler:
+            result["queries"] = self.query_profiler.to_dict()
+        if self.profiler:
+            result["profiler"] = self.profiler.to_dict()
+        for registry in (self.collector, self.query_profiler):
+            if registry and reset:
+                registry.reset()
+        return result
+
+    @util.private
+    def profile(self, data={}, reset=False):
+        if not self.profiler:
+            raise exceptions.OperationalError(message="Profiler not enabled")
+        result = self.profiler.collapsed()
+        if reset in (True, "1", "true"):
+            self.profiler.reset()
+        self.request.set_content_type("text/plain")
+        return result
+
     @util.private
     def debug(self, data={}):
         if not settings.DEBUG:
@@ -4551,13 +4647,20 @@ class App(
         # iterates over the complete set of handlers registered
         # for the logging and tries to remove them from the
         # current logger (unregistration process)
-        for handler in self.handlers:
+        for handler in self._get_handlers():
             if not handler:
                 continue
             if not handler in self.logger.handlers:
                 continue
             self.logger.removeHandler(handler)
 
+        # in case the asynchronous logging is enabled stops the
+        # queue handler, flushing the complete set of pending records
+        handler_queue = getattr(self, "handler_queue", None)
+        if handler_queue:
+            handler_queue.close()
+            self.handler_queue = None
+
         # unsets the various logging related attributes from the
         # current instance, this way no more access to logging is
         # allow or possible (note that no further unload is possible)
@@ -4722,6 +4825,14 @@ class App(
         # some more handlers may be created according to the logging config
         self._extra_logging(self.level, self.formatter)
 
+        # in case the asynchronous logging mode is enabled creates the queue
+        # handler that wraps the "real" handlers, so that they are called
+        # from a dedicated listener thread and not from the logging caller
+        logging_async = config.conf("LOGGING_ASYNC", False, cast=bool)
+        self.handler_queue = log.QueueHandler(self.handlers) if logging_async else None
+        if self.handler_queue:
+            self.handler_queue.start()
+
         # iterates over the complete set of handlers defined in the default
         # logger to remove them, as new ones are going to be created, this
         # operation is only performed in case the set default flag is set
@@ -4731,7 +4842,7 @@ class App(
         # iterates over the complete set of handlers currently registered
         # to add them to the current logger infra-structure so that they
         # are used when logging functions are called
-        for handler in self.handlers:
+        for handler in self._get_handlers():
             if not handler:
                 continue
             self.logger.addHandler(handler)
@@ -4897,6 +5008,51 @@ class App(
         self._mock = request.MockRequest(locale=locale, session_c=self.session_c)
         self._request = self._mock
 
+    def _load_metrics(self):
+        # creates the registry for the request metrics (latency histograms
+        # and phase timings per route) in case their collection is enabled
+        # by configuration, notice that the collection is enabled by default
+        metrics_enabled = config.conf("METRICS", True, cast=bool)
+        self.collector = metrics.Metrics() if metrics_enabled else None
+
+        # creates the profiler for the data collection queries in case it's
+        # enabled, notice that slow queries and N+1 query patterns detected
+        # by the profiler are logged as warnings using the app's logger
+        query_profile = config.conf("QUERY_PROFILE", False, cast=bool)
+        slow_query = config.conf("SLOW_QUERY", 100.0, cast=float)
+        query_repeat = config.conf("QUERY_REPEAT", 10, cast=int)
+        self.query_profiler = (
+            metrics.QueryProfiler(
+                threshold=slow_query / 1000.0, repeat=query_repeat, logger=self.logger
+            )
+            if query_profile
+            else None
+        )
+
+        # creates the sampling (CPU) profiler that is used for the requests
+        # that are explicitly profiled or for a fraction of them (sample),
+        # the sampling thread is only started when a request is profiled
+        profiler = config.conf("PROFILER", True, cast=bool)
+        profiler_sample = config.conf("PROFILER_SAMPLE", 0.0, cast=float)
+        profiler_token = config.conf("PROFILER_TOKEN", None)
+        profiler_acl = config.conf("PROFILER_ACL", "admin")
+        profiler_interval = config.conf("PROFILER_INTERVAL", 5.0, cast=float)
+        self.profiler = (
+            metrics.SamplingProfiler(
+                interval=profiler_interval / 1000.0,
+                sample=profiler_sample,
+                token=profiler_token,
+                acl=profiler_acl,
+            )
+            if profiler
+            else None
+        )
+
+    def _unload_metrics(self):
+        if not self.profiler:
+            return
+        self.profiler.stop()
+
     def _load_context(self):
         self.context["echo"] = self.echo
         self.context["dumps"] = self.dumps
@@ -4963,9 +5119,21 @@ class App(
         if not os.path.exists(bundles_path):
             return
 
-        # list the bundles directory files and iterates over each of the
-        # files to load its own contents into the bundles "registry"
+        # reads the complete set of bundle items from the directory and
+        # registers each of them under the current system, this should
+        # extend the current registry with new information so that it
+        # becomes available to the possible end-user usage
+        for data_j, locale, base in self._read_bundles(bundles_path):
+            method(data_j, locale, context=base)
+
+    def _read_bundles(self, bundles_path):
+        # lists the complete set of files in the bundles directory (sorted
+        # so that the registration order is deterministic) and parses each
+        # of them building the items to be registered
         paths = os.listdir(bundles_path)
+        paths.sort()
+
+        items = []
         for path in paths:
             # joins the current (base) bundles path with the current path
             # in iteration to create the full path to the file and opens
@@ -4992,10 +5160,9 @@ class App(
             except Exception:
                 continue
 
-            # registers the new bundle information under the current system
-            # this should extend the current registry with new information so
-            # that it becomes available to the possible end-user usage
-            method(data_j, locale, context=base)
+            items.append([data_j, locale, base])
+
+        return items
 
     def _unload_bundles(self, bundles_path=None):
         return self._load_bundles(
@@ -5190,6 +5357,7 @@ class App(
         patch_email = config.conf("PATH_EMAIL", True, cast=bool)
         if patch_json:
             json._default_encoder = util.JSONEncoder()
+        serialize.set_json_permissive(patch_json)
         if patch_email:
             email.charset.add_charset(
                 "utf-8",
@@ -5221,11 +5389,64 @@ class App(
         self.unbind_bus("peer-%s" % self.uid, self._on_self)
 
     def _add_handlers(self, logger):
-        for handler in self.handlers:
+        for handler in self._get_handlers():
             if not handler:
                 continue
             logger.addHandler(handler)
 
+    def _get_handlers(self):
+        handler_queue = getattr(self, "handler_queue", None)
+        if handler_queue:
+            return (handler_queue,)
+        return self.handlers
+
+    def _flush_logging(self):
+        handler_queue = getattr(self, "handler_queue", None)
+        if not handler_queue:
+            return
+        handler_queue.flush()
+
+    def _is_profiled(self):
+        # verifies if the current request has been selected for profiling
+        # as part of the sampling of a fraction of the overall traffic
+        if self.profiler.is_sampled():
+            return True
+
+        # in case the profiling header is set and matches the configured
+        # token the request is profiled (no login is required for it), the
+        # comparison is constant time so that the token is not leaked
+        token = self.request.get_header("X-Profile")
+        if token and self.profiler.token:
+            token = legacy.bytes(token, encoding="utf-8")
+            expected = legacy.bytes(self.profiler.token, encoding="utf-8")
+            if hmac.compare_digest(token, expected):
+                return True
+
+        # the profile parameter is only accepted for a logged in user that
+        # owns the profiler's ACL token, as otherwise anyone could trigger
+        # profiling (an expensive operation) for its requests
+        if not "profile" in self.request.params:
+            return False
+        if not self.profiler.acl:
+            return False
+        if not util.check_user(self, request=self.request):
+            return False
+        return util.check_token(self, self.profiler.acl, request=self.request)
+
+    def _record_metrics(self):
+        if self.query_profiler and not self.request.queries == None:
+            self.query_profiler.record_request(
+                self.request.route_name, self.request.queries
+            )
+        if not self.collector or not self.request.ptime:
+            return
+        self.collector.record(
+            self.request.route_name,
+            legacy.perf_counter() - self.request.ptime,
+            code=self.request.code,
+            timings=self.request.timings,
+        )
+
     def _load_part(self, part):
         # retrieves the various characteristics of the part and uses
         # them to start some of its features (eg: routes and models)
@@ -5382,6 +5603,10 @@ class App(
         self._register_models(models_c)
 
     def _register_bundle(self, extra, locale, context=None, is_global=True):
+        # invalidates the flattened locale index as the registry is
+        # going to be changed (values must be re-computed)
+        self._locales_i = {}
+
         # retrieves a possible existing map for the current locale in the
         # registry and updates such map with the loaded data, then re-updates
         # the reference to the locale in the current bundle registry, do this
@@ -5403,6 +5628,8 @@ class App(
     def _unregister_bundle(
         self, extra, locale, context=None, strict=False, is_global=True
     ):
+        self._locales_i = {}
+
         if is_global:
             bundle = self.bundles.get(locale, {})
             for key in extra:
@@ -5906,7 +6133,7 @@ class App(
             return
 
         scheme = self.request.scheme
-        host = self.request.in_headers.get("Host", None)
+        host = self.request.get_header("Host", None)
 
         if not host:
             return
@@ -6507,6 +6734,49 @@ class App(
             return _locale
         return locale
 
+    def _locale_index(self, locale, context=None, fallback=True):
+        # in case the set of locales changed since the index was built the
+        # cached values are no longer valid (best locale resolution changes)
+        if not self._locales_l is self.locales:
+            self._locales_i = {}
+            self._locales_l = self.locales
+
+        # tries to retrieve the flattened translation dictionary for the
+        # requested locale, context and fallback combination, returning
+        # it immediately in case it has already been computed
+        key = (locale, context, fallback)
+        index = self._locales_i.get(key, None)
+        if not index == None:
+            return index
+
+        # builds the chain of bundles in ascending order of priority, the
+        # default locale ones come first (in case of fallback) followed by
+        # the language bundle and then the locale specific bundle
+        chain = []
+        if fallback:
+            chain.extend(self._locale_chain(self._locale_d, context=context))
+        if locale:
+            chain.extend(self._locale_chain(locale, context=context))
+
+        # merges the complete chain into a single dictionary, ignoring
+        # unset values so that they fallback to lower priority bundles
+        index = dict()
+        for bundle in chain:
+            index.update(
+                (name, value) for name, value in bundle.items() if not value == None
+            )
+        self._locales_i[key] = index
+        return index
+
+    def _locale_chain(self, locale, context=None):
+        if not locale:
+            return []
+        language = locale.split("_", 1)[0]
+        return [
+            self.get_bundle(language, context=context) or {},
+            self.get_bundle(locale, context=context) or {},
+        ]
+
     def _bases(self, cls):
         yield cls
         for direct_base in cls.__bases__:
@@ -38,16 +38,23 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import os
 import pickle
 import traceback
 import threading
 
+from . import ipc
 from . import config
 from . import legacy
 from . import redisdb
 from . import component
 from . import exceptions
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 
 class Bus(component.Component):
     def __init__(self, name="bus", owner=None, *args, **kwargs):
@@ -69,6 +76,22 @@ class Bus(component.Component):
     def trigger(self, name, *args, **kwargs):
         raise exceptions.NotImplementedError()
 
+    def coalesce(self, name, key):
+        """
+        Registers the key function for the events of the provided
+        name, that is used (by the buses that buffer events) to
+        coalesce the events with the same key, where the last
+        triggered event replaces the previous ones.
+
+        :type name: String
+        :param name: The name of the event to set the key for.
+        :type key: Function
+        :param key: The function that receives the arguments of
+        the event and returns its (hashable) key.
+        """
+
+        pass
+
 
 class MemoryBus(Bus):
     def __init__(self, name="memory", owner=None, *args, **kwargs):
@@ -112,6 +135,153 @@ class MemoryBus(Bus):
                 self.bind(name, method)
 
 
+class LocalBus(Bus):
+    """
+    Bus implementation that reaches every process of the local process
+    tree (eg: forked workers) without the need for an external server.
+
+    The process that first loads the bus hosts a broker (thread) that
+    listens on a local (Unix domain) socket, the children processes
+    connect to it once the bus is reloaded (as part of the child
+    process setup) or when they first trigger an event.
+    """
+
+    SERIALIZER = pickle
+    """ The serializer to be used for the values contained in
+    the bus (used on top of the class) """
+
+    def __init__(self, name="local", owner=None, *args, **kwargs):
+        Bus.__init__(self, name=name, owner=owner, *args, **kwargs)
+
+    def bind(self, name, method):
+        methods = self._events.get(name, [])
+        methods.append(method)
+        self._events[name] = methods
+
+    def unbind(self, name, method=None):
+        methods = self._events.get(name, [])
+        if method:
+            methods.remove(method)
+        else:
+            del methods[:]
+
+    def trigger(self, name, *args, **kwargs):
+        data = self._serializer.dumps(dict(args=args, kwargs=kwargs))
+        self._publish(name, data)
+
+    def _load(self, *args, **kwargs):
+        Bus._load(self, *args, **kwargs)
+        self._serializer = kwargs.pop("serializer", self.__class__.SERIALIZER)
+        self._events = dict()
+        self._open()
+
+    def _unload(self, *args, **kwargs):
+        Bus._unload(self, *args, **kwargs)
+        self._events = None
+        self._close()
+
+    def _get_state(self):
+        state = Bus._get_state(self)
+        state.update(_events=self._events)
+        return state
+
+    def _set_state(self, state):
+        Bus._set_state(self, state)
+        _events = state.get("_events", {})
+        for name, methods in legacy.iteritems(_events):
+            for method in methods:
+                self.bind(name, method)
+
+    def _open(self):
+        self._pid = os.getpid()
+        self._broker = get_broker()
+        self._connection = None
+        self._listener = None
+
+        # in case the broker is hosted by the current process the events
+        # are delivered directly (no socket), otherwise a connection to the
+        # broker is established and a listener is started for the events
+        if self._broker.is_owner:
+            self._broker.subscribe(self._tick)
+            return
+
+        self._connection = self._broker.connect()
+        self._send_lock = threading.Lock()
+        self._listener = LocalListener(self)
+        self._listener.start()
+
+    def _close(self):
+        # the state inherited from a parent process (fork) is discarded
+        # as both the connection and the listener belong to the parent
+        if not self._pid == os.getpid():
+            self._connection = None
+            self._listener = None
+            return
+
+        if not self._connection:
+            self._broker.unsubscribe(self._tick)
+            return
+
+        # notifies the broker that the connection is going to be closed
+        # so that it closes its side, unblocking the listener thread
+        try:
+            self._send(None)
+        except Exception:
+            pass
+        self._listener.join()
+        self._connection.close()
+        self._connection = None
+        self._listener = None
+
+    def _publish(self, name, data):
+        if not self._pid == os.getpid():
+            self._close()
+            self._open()
+        if self._connection:
+            self._send((name, data))
+        else:
+            self._broker.publish(name, data)
+
+    def _send(self, message):
+        self._send_lock.acquire()
+        try:
+            self._connection.send(message)
+        finally:
+            self._send_lock.release()
+
+    def _loop(self, safe=True):
+        while True:
+            try:
+                name, data = self._connection.recv()
+            except (EOFError, IOError, OSError):
+                break
+            try:
+                self._tick(name, data, safe=safe)
+            except Exception as exception:
+                self.logger.critical("Unhandled local bus loop exception raised")
+                self.logger.error(exception)
+                lines = traceback.format_exc().splitlines()
+                for line in lines:
+                    self.logger.warning(line)
+
+    def _tick(self, name, data, safe=True):
+        methods = self._events.get(name, []) if self._events else []
+        if not methods:
+            return
+        data = self._serializer.loads(data)
+        for method in methods:
+            if safe:
+                self.owner.schedule(
+                    method,
+                    args=data["args"],
+                    kwargs=data["kwargs"],
+                    timeout=-1,
+                    safe=True,
+                )
+            else:
+                method(*data["args"], **data["kwargs"])
+
+
 class RedisBus(Bus):
     SERIALIZER = pickle
     """ The serializer to be used for the values contained in
@@ -125,6 +295,23 @@ class RedisBus(Bus):
         Bus.__init__(self, name=name, owner=owner, *args, **kwargs)
         self._delay = kwargs.pop("delay", True)
 
+    def flush(self):
+        self._buffer_lock.acquire()
+        try:
+            buffer = self._buffer
+            self._buffer = dict()
+        finally:
+            self._buffer_lock.release()
+
+        if not buffer:
+            return
+
+        pipeline = self._redis.pipeline(transaction=False)
+        for channel, (items, _keys) in legacy.iteritems(buffer):
+            data = self._serializer.dumps(dict(batch=items))
+            pipeline.publish(channel, data)
+        pipeline.execute()
+
     def bind(self, name, method):
         methods = self._events.get(name, [])
         methods.append(method)
@@ -143,9 +330,15 @@ class RedisBus(Bus):
 
     def trigger(self, name, *args, **kwargs):
         channel = self._to_channel(name)
+        if self._batch:
+            self._buffer_event(name, dict(args=args, kwargs=kwargs))
+            return
         data = self._serializer.dumps(dict(args=args, kwargs=kwargs))
         self._redis.publish(channel, data)
 
+    def coalesce(self, name, key):
+        self._keys[name] = key
+
     def _load(self, *args, **kwargs):
         Bus._load(self, *args, **kwargs)
         self._name = config.conf("BUS_NAME", self.owner.name_i)
@@ -155,6 +348,13 @@ class RedisBus(Bus):
         self._global_channel = kwargs.pop(
             "global_channel", self.__class__.GLOBAL_CHANNEL
         )
+        self._batch = config.conf("BUS_BATCH", 0.0, cast=float)
+        self._batch = kwargs.pop("batch", self._batch)
+        self._coalesce = config.conf("BUS_COALESCE", False, cast=bool)
+        self._coalesce = kwargs.pop("coalesce", self._coalesce)
+        self._keys = dict()
+        self._buffer = dict()
+        self._buffer_lock = threading.RLock()
         self._events = dict()
         self._open()
 
@@ -184,13 +384,21 @@ class RedisBus(Bus):
         self._pubsub.subscribe(channel)
         self._listener = RedisListener(self)
         self._listener.start()
+        self._flusher = RedisFlusher(self) if self._batch else None
+        if self._flusher:
+            self._flusher.start()
 
     def _close(self):
+        if self._flusher:
+            self._flusher.stop()
+            self._flusher.join()
+        self.flush()
         self._pubsub.unsubscribe()
         self._listener.join()
         self._redis = None
         self._pubsub = None
         self._listener = None
+        self._flusher = None
 
     def _loop(self, safe=True):
         for item in self._pubsub.listen():
@@ -218,6 +426,9 @@ class RedisBus(Bus):
             name = channel
         data = self._serializer.loads(data)
         methods = self._events.get(name, []) if self._events else []
+        if "batch" in data:
+            self._tick_batch(methods, data["batch"], safe=safe)
+            return
         for method in methods:
             if safe:
                 self.owner.schedule(
@@ -230,6 +441,60 @@ class RedisBus(Bus):
             else:
                 method(*data["args"], **data["kwargs"])
 
+    def _tick_batch(self, methods, items, safe=True):
+        # for a batch of events a single (scheduled) call is used to dispatch
+        # the complete set of events to the complete set of methods
+        if not methods:
+            return
+        if safe:
+            self.owner.schedule(
+                self._dispatch, args=[methods, items], timeout=-1, safe=True
+            )
+        else:
+            self._dispatch(methods, items, safe=False)
+
+    def _dispatch(self, methods, items, safe=True):
+        for item in items:
+            for method in methods:
+                try:
+                    method(*item["args"], **item["kwargs"])
+                except Exception as exception:
+                    if not safe:
+                        raise
+                    self.logger.warning(
+                        "Problem dispatching bus event: %s" % legacy.UNICODE(exception)
+                    )
+
+    def _buffer_event(self, name, item):
+        # in case coalescing is enabled computes the key of the event,
+        # using the key function registered for the event or otherwise
+        # the serialized event (only equal events are coalesced)
+        key = None
+        if self._coalesce:
+            key_f = self._keys.get(name, None)
+            if key_f:
+                key = key_f(*item["args"], **item["kwargs"])
+            else:
+                key = self._serializer.dumps(item)
+
+        channel = self._to_channel(name)
+
+        self._buffer_lock.acquire()
+        try:
+            items, keys = self._buffer.setdefault(channel, ([], dict()))
+
+            # an event with the same key already in the buffer is replaced
+            # by the new one (last write wins), keeping its position
+            index = keys.get(key, None) if self._coalesce else None
+            if index == None:
+                if self._coalesce:
+                    keys[key] = len(items)
+                items.append(item)
+            else:
+                items[index] = item
+        finally:
+            self._buffer_lock.release()
+
     def _to_channel(self, name):
         return self._name + ":" + name
 
@@ -242,3 +507,178 @@ class RedisListener(threading.Thread):
 
     def run(self):
         self._bus._loop()
+
+
+class RedisFlusher(threading.Thread):
+    def __init__(self, bus):
+        threading.Thread.__init__(self, name="RedisFlusher")
+        self.daemon = True
+        self._bus = bus
+        self._event = threading.Event()
+
+    def run(self):
+        while not self._event.is_set():
+            self._event.wait(self._bus._batch)
+            try:
+                self._bus.flush()
+            except Exception as exception:
+                self._bus.logger.warning(
+                    "Problem flushing bus events: %s" % legacy.UNICODE(exception)
+                )
+
+    def stop(self):
+        self._event.set()
+
+
+class LocalListener(threading.Thread):
+    def __init__(self, bus):
+        threading.Thread.__init__(self, name="LocalListener")
+        self.daemon = True
+        self._bus = bus
+
+    def run(self):
+        self._bus._loop()
+
+
+class LocalWriter(threading.Thread):
+    """
+    Writer thread that sends the events relayed by the broker to
+    one of the connected processes, so that a slow (or stalled)
+    process never blocks the publisher nor the other processes.
+
+    The queue of the writer is bounded, once it's full (the process
+    is not keeping up) the new events are dropped and counted.
+    """
+
+    def __init__(self, broker, connection, max_size=None):
+        threading.Thread.__init__(self, name="LocalWriter")
+        self.daemon = True
+        self.broker = broker
+        self.connection = connection
+        self.max_size = (
+            config.conf("BUS_LOCAL_SIZE", 4096, cast=int)
+            if max_size == None
+            else max_size
+        )
+        self.dropped = 0
+        self.queue = queue.Queue(self.max_size)
+        self._dropping = False
+        self._stopped = False
+
+    def run(self):
+        # sends the queued messages until the writer is stopped (invalid
+        # message) or the connection fails, closing the connection at
+        # the end as the writer is the only one that writes to it
+        try:
+            while True:
+                message = self.queue.get()
+                if message == None or self._stopped:
+                    break
+                try:
+                    self.connection.send(message)
+                except (EOFError, IOError, OSError):
+                    self.broker._remove(self.connection)
+                    break
+        finally:
+            self.connection.close()
+
+    def put(self, message):
+        # tries to queue the message without blocking the publisher, in
+        # case the queue is full the message is dropped and a warning is
+        # logged once for each sequence of dropped messages
+        try:
+            self.queue.put(message, block=False)
+        except queue.Full:
+            self.dropped += 1
+            if not self._dropping:
+                self.broker.logger.warning(
+                    "Local bus writer queue is full, dropping events (%d dropped)"
+                    % self.dropped
+                )
+            self._dropping = True
+        else:
+            self._dropping = False
+
+    def stop(self):
+        # wakes the writer up with the sentinel value (after the pending
+        # messages), in case the queue is full the writer is marked as
+        # stopped instead, which is checked on the next message
+        try:
+            self.queue.put(None, block=False)
+        except queue.Full:
+            self._stopped = True
+
+
+class LocalBroker(ipc.LocalServer):
+    """
+    Broker thread that relays the events of the local bus between
+    the processes of the process tree, listening on a local socket
+    (authenticated) for the connections of the children processes.
+
+    Every event published is delivered to the subscribers of the
+    hosting process and queued for every one of the connected
+    processes, that have their own writer thread.
+    """
+
+    def __init__(self):
+        ipc.LocalServer.__init__(self, name="LocalBroker")
+        self._subscribers = []
+        self._writers = dict()
+        self._lock = threading.RLock()
+
+    def on_connection(self, connection):
+        writer = LocalWriter(self, connection)
+        writer.start()
+        self._lock.acquire()
+        try:
+            self._writers[connection] = writer
+        finally:
+            self._lock.release()
+
+    def handle(self, connection):
+        try:
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, IOError, OSError):
+                    break
+                if message == None:
+                    break
+                self.publish(*message)
+        finally:
+            self._remove(connection)
+
+    def subscribe(self, callback):
+        self._lock.acquire()
+        try:
+            self._subscribers.append(callback)
+        finally:
+            self._lock.release()
+
+    def unsubscribe(self, callback):
+        self._lock.acquire()
+        try:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+        finally:
+            self._lock.release()
+
+    def publish(self, name, data):
+        for callback in list(self._subscribers):
+            callback(name, data)
+        for writer in list(self._writers.values()):
+            writer.put((name, data))
+
+    def _remove(self, connection):
+        self._lock.acquire()
+        try:
+            writer = self._writers.pop(connection, None)
+        finally:
+            self._lock.release()
+        if not writer:
+            return
+        writer.stop()
+
+
+def get_broker():
+    return LocalBroker.get_server()
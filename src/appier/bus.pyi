@@ -1,8 +1,11 @@
-from threading import Thread
+from queue import Queue
+from threading import Event, Thread
+from multiprocessing.connection import Connection
 from typing import Any, Callable, Self, Sequence
 
 from .base import App
 from .component import Component
+from .ipc import LocalServer
 
 class Bus(Component):
     def __init__(self, name: str = ..., owner: App = ..., *args, **kwargs): ...
@@ -11,6 +14,7 @@ class Bus(Component):
     def bind(self, name: str, method: Callable) -> None: ...
     def unbind(self, name: str, method: Callable | None = ...) -> None: ...
     def trigger(self, name: str, *args, **kwargs) -> None: ...
+    def coalesce(self, name: str, key: Callable[..., Any]) -> None: ...
 
 class MemoryBus(Bus):
     _events: dict[str, list[Callable]]
@@ -23,6 +27,29 @@ class MemoryBus(Bus):
     def _get_state(self) -> dict[str, Sequence[Callable]]: ...
     def _set_state(self, state: dict[str, Sequence[Callable]]) -> None: ...
 
+class LocalBus(Bus):
+    SERIALIZER: Any
+    _events: dict[str, list[Callable]]
+    _serializer: Any
+    _pid: int
+    _broker: LocalBroker
+    _connection: Connection | None
+    _listener: LocalListener | None
+    def __init__(self, name: str = ..., owner: App = ..., *args, **kwargs): ...
+    def bind(self, name: str, method: Callable) -> None: ...
+    def unbind(self, name: str, method: Callable | None = ...) -> None: ...
+    def trigger(self, name: str, *args, **kwargs) -> None: ...
+    def _load(self, *args, **kwargs) -> None: ...
+    def _unload(self, *args, **kwargs) -> None: ...
+    def _get_state(self) -> dict[str, Sequence[Callable]]: ...
+    def _set_state(self, state: dict[str, Sequence[Callable]]) -> None: ...
+    def _open(self) -> None: ...
+    def _close(self) -> None: ...
+    def _publish(self, name: str, data: bytes) -> None: ...
+    def _send(self, message: tuple[str, bytes] | None) -> None: ...
+    def _loop(self, safe: bool = ...) -> None: ...
+    def _tick(self, name: str, data: bytes, safe: bool = ...) -> None: ...
+
 class RedisBus(Bus):
     SERIALIZER: Any
     GLOBAL_CHANNEL: str
@@ -34,7 +61,13 @@ class RedisBus(Bus):
     _redis: Any
     _pubsub: Any
     _listener: RedisListener
+    _flusher: RedisFlusher | None
+    _batch: float
+    _coalesce: bool
+    _keys: dict[str, Callable[..., Any]]
+    _buffer: dict[str, tuple[list[dict[str, Any]], dict[Any, int]]]
     def __init__(self, name: str = ..., owner: App = ..., *args, **kwargs): ...
+    def flush(self) -> None: ...
     def bind(self, name: str, method: Callable) -> None: ...
     def unbind(self, name: str, method: Callable | None = ...) -> None: ...
     def trigger(self, name: str, *args, **kwargs) -> None: ...
@@ -46,9 +79,53 @@ class RedisBus(Bus):
     def _close(self) -> None: ...
     def _loop(self, safe: bool = ...) -> None: ...
     def _tick(self, item: dict[str, Any], safe: bool = ...) -> None: ...
+    def _tick_batch(
+        self, methods: Sequence[Callable], items: list[dict[str, Any]], safe: bool = ...
+    ) -> None: ...
+    def _dispatch(
+        self, methods: Sequence[Callable], items: list[dict[str, Any]], safe: bool = ...
+    ) -> None: ...
+    def _buffer_event(self, name: str, item: dict[str, Any]) -> None: ...
     def _to_channel(self, name: str) -> str: ...
 
 class RedisListener(Thread):
     _bus: RedisBus
     def __init__(self, bus: RedisBus): ...
     def run(self) -> None: ...
+
+class RedisFlusher(Thread):
+    _bus: RedisBus
+    _event: Event
+    def __init__(self, bus: RedisBus): ...
+    def run(self) -> None: ...
+    def stop(self) -> None: ...
+
+class LocalListener(Thread):
+    _bus: LocalBus
+    def __init__(self, bus: LocalBus): ...
+    def run(self) -> None: ...
+
+class LocalWriter(Thread):
+    broker: LocalBroker
+    connection: Connection
+    max_size: int
+    dropped: int
+    queue: Queue
+    def __init__(
+        self, broker: LocalBroker, connection: Connection, max_size: int | None = ...
+    ): ...
+    def run(self) -> None: ...
+    def put(self, message: tuple[str, bytes]) -> None: ...
+    def stop(self) -> None: ...
+
+class LocalBroker(LocalServer):
+    _writers: dict[Connection, LocalWriter]
+    def __init__(self): ...
+    def on_connection(self, connection: Connection) -> None: ...
+    def handle(self, connection: Connection) -> None: ...
+    def subscribe(self, callback: Callable[[str, bytes], None]) -> None: ...
+    def unsubscribe(self, callback: Callable[[str, bytes], None]) -> None: ...
+    def publish(self, name: str, data: bytes) -> None: ...
+    def _remove(self, connection: Connection) -> None: ...
+
+def get_broker() -> LocalBroker: ...
@@ -97,10 +97,10 @@ class Compress(object):
         self.flag_cache(key, modified, result)
         return (result_size, result_file)
 
-    def compress_jpeg(self, file_path):
-        if self.jinja:
-            return self.compress_jpeg_pil(file_path)
-        return self.compress_fallback(file_path)
+    def compress_jpeg(self, data):
+        if self.pil:
+            return self.compress_jpeg_pil(data)
+        return self.compress_fallback(data)
 
     def compress_jpeg_pil(self, data, quality=80):
         input = legacy.BytesIO(data)
@@ -28,11 +28,14 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
-import array
-
 from . import legacy
+from . import structures
 from . import exceptions
 
+CACHE_SIZE = 64
+""" The maximum number of key scheduled states (per cipher)
+that are kept in cache, avoiding the key scheduling cost """
+
 
 class Cipher(object):
     def __init__(self, key):
@@ -64,54 +67,69 @@ class RC4(Cipher):
     encryption using the RC4 stream cipher.
 
     The implementation of the algorithm follows
-    the typical implementation details.
+    the typical implementation details, with the
+    keystream generated in bulk and the key scheduled
+    state cached per key.
 
     :see: http://en.wikipedia.org/wiki/RC4
     """
 
+    CACHE = structures.LimitedSizeDict(max_size=CACHE_SIZE)
+    """ The cache of key scheduled boxes indexed by key """
+
     def __init__(self, key):
         Cipher.__init__(self, key)
         self._start()
 
     def encrypt(self, data):
-        out = array.array("B", [0] * len(data))
-        self._encrypt(data, out)
-        return legacy.tobytes(out)
+        return xor_bytes(data, self._stream(len(data)))
 
     def decrypt(self, data):
         return self.encrypt(data)
 
     def _encrypt(self, data, out):
-        index = 0
+        stream = self._stream(len(data))
+        for index, char in enumerate(data):
+            out[index] = legacy.ord(char) ^ stream[index]
 
+    def _stream(self, count):
         box = self.box
         i = self.i
         j = self.j
+        out = bytearray(count)
 
-        for char in data:
-            i = (i + 1) % 256
-            j = (j + box[i]) % 256
-
-            box[i], box[j] = box[j], self.box[i]
-            k = box[(box[i] + box[j]) % 256]
-
-            ciph = legacy.ord(char) ^ k
-            out[index] = ciph
-            index += 1
+        for index in range(count):
+            i = (i + 1) & 0xFF
+            a = box[i]
+            j = (j + a) & 0xFF
+            b = box[j]
+            box[i] = b
+            box[j] = a
+            out[index] = box[(a + b) & 0xFF]
 
         self.i = i
         self.j = j
+        return out
 
     def _start(self):
-        self.box = legacy.range(256)
         self.i = 0
         self.j = 0
 
+        cls = self.__class__
+        box = cls.CACHE.get(self.key, None)
+        if box:
+            self.box = list(box)
+            return
+
+        self.box = list(range(256))
+
         x = 0
         for i in range(256):
             x = (x + self.box[i] + legacy.ord(self.key[i % len(self.key)])) % 256
             self.box[i], self.box[x] = self.box[x], self.box[i]
 
+        cls.CACHE[self.key] = list(self.box)
+
 
 class Spritz(Cipher):
     """
@@ -120,34 +138,47 @@ class Spritz(Cipher):
     a variation of the original RC4 cipher.
 
     The implementation of the algorithm follows
-    the typical implementation details.
+    the typical implementation details, with the
+    keystream generated in bulk and the state after
+    the absorption of the key cached per key.
 
     :see: http://en.wikipedia.org/wiki/RC4#Spritz
     """
 
+    CACHE = structures.LimitedSizeDict(max_size=CACHE_SIZE)
+    """ The cache of the states (after the absorption of the key
+    and after the first shuffle) indexed by key """
+
     def __init__(self, key):
         Cipher.__init__(self, key)
         self._start()
-        self.absorb(self.key)
+        self._restore()
 
     def encrypt(self, data):
-        data = bytearray(data)
-        sequezing = self.squeeze(len(data))
-        out = bytearray(self._add(b1, b2) for b1, b2 in zip(data, sequezing))
-        return bytes(out)
+        return add_bytes(data, self.squeeze(len(data)))
 
     def decrypt(self, data):
-        data = bytearray(data)
-        sequezing = self.squeeze(len(data))
-        out = bytearray(self._add(b1, -b2) for b1, b2 in zip(data, sequezing))
-        return bytes(out)
+        return add_bytes(data, self.squeeze(len(data)), subtract=True)
 
     def absorb(self, data):
+        self._pristine = False
         data = bytearray(data)
         for byte in data:
             self._absorb_byte(byte)
 
     def shuffle(self):
+        # in case the state is still the one that resulted from the
+        # absorption of the key only, the shuffled state is the same
+        # for the same key and can be retrieved from the cache, any
+        # other operation over the state invalidates such condition
+        pristine = self._pristine
+        self._pristine = False
+        if pristine:
+            states = self.__class__.CACHE.get(self.key, None)
+            if states and states[1]:
+                self._set(states[1])
+                return
+
         self.whip(512)
         self.crush()
         self.whip(512)
@@ -155,12 +186,25 @@ class Spritz(Cipher):
         self.whip(512)
         self.a = 0
 
+        if pristine:
+            states = self.__class__.CACHE.get(self.key, None)
+            if states:
+                states[1] = self._get()
+
     def whip(self, r):
+        self._pristine = False
+        S = self.S
+        i, j, k, w = self.i, self.j, self.k, self.w
         for _ in range(r):
-            self._update()
+            i = (i + w) & 0xFF
+            j = (k + S[(j + S[i]) & 0xFF]) & 0xFF
+            k = (i + k + S[j]) & 0xFF
+            S[i], S[j] = S[j], S[i]
+        self.i, self.j, self.k = i, j, k
         self.w = self._add(self.w, 2)
 
     def crush(self):
+        self._pristine = False
         for v in range(128):
             if self.S[v] <= self.S[255 - v]:
                 continue
@@ -169,11 +213,27 @@ class Spritz(Cipher):
     def squeeze(self, r):
         if self.a > 0:
             self.shuffle()
-        return bytearray([self.drip() for _ in range(r)])
+        self._pristine = False
+
+        S = self.S
+        i, j, k, z, w = self.i, self.j, self.k, self.z, self.w
+        out = bytearray(r)
+
+        for index in range(r):
+            i = (i + w) & 0xFF
+            j = (k + S[(j + S[i]) & 0xFF]) & 0xFF
+            k = (i + k + S[j]) & 0xFF
+            S[i], S[j] = S[j], S[i]
+            z = S[(j + S[(i + S[(z + k) & 0xFF]) & 0xFF]) & 0xFF]
+            out[index] = z
+
+        self.i, self.j, self.k, self.z = i, j, k, z
+        return out
 
     def drip(self):
         if self.a > 0:
             self.shuffle()
+        self._pristine = False
         self._update()
         return self._output()
 
@@ -205,6 +265,24 @@ class Spritz(Cipher):
         self.a = 0
         self.w = 1
         self.S = bytearray(range(256))
+        self._pristine = False
+
+    def _restore(self):
+        cls = self.__class__
+        states = cls.CACHE.get(self.key, None)
+        if states:
+            self._set(states[0])
+        else:
+            self.absorb(self.key)
+            cls.CACHE[self.key] = [self._get(), None]
+        self._pristine = True
+
+    def _get(self):
+        return (self.i, self.j, self.k, self.z, self.a, self.w, bytes(self.S))
+
+    def _set(self, state):
+        self.i, self.j, self.k, self.z, self.a, self.w, S = state
+        self.S = bytearray(S)
 
     def _absorb_byte(self, byte):
         self._absorb_nibble(byte & 0xF)
@@ -215,3 +293,73 @@ class Spritz(Cipher):
             self.shuffle()
         self._swap(self.a, 128 + nibble)
         self.a = self._add(self.a, 1)
+
+
+def xor_bytes(data, stream):
+    """
+    Combines the provided data with the keystream using the
+    exclusive or operation (byte by byte), using a big integer
+    based operation (single pass in native code) when possible.
+
+    :type data: String
+    :param data: The data (bytes) to be combined with the stream.
+    :type stream: bytearray
+    :param stream: The keystream with at least the size of the data.
+    :rtype: String
+    :return: The resulting bytes of the combination.
+    """
+
+    count = len(data)
+    if not count:
+        return b""
+    if len(stream) > count:
+        stream = stream[:count]
+    if not hasattr(int, "from_bytes"):
+        data = bytearray(data)
+        return bytes(bytearray(b1 ^ b2 for b1, b2 in zip(data, stream)))
+    value = int.from_bytes(data, "little") ^ int.from_bytes(stream, "little")
+    return value.to_bytes(count, "little")
+
+
+def add_bytes(data, stream, subtract=False):
+    """
+    Combines the provided data with the keystream using the
+    (modulo 256) sum or subtraction of each pair of bytes.
+
+    When possible the operation is done in a single pass using big
+    integers, with the per byte (carry-less) sum computed as a SWAR
+    (SIMD within a register) operation.
+
+    :type data: String
+    :param data: The data (bytes) to be combined with the stream.
+    :type stream: bytearray
+    :param stream: The keystream with at least the size of the data.
+    :type subtract: bool
+    :param subtract: If the stream bytes should be subtracted from
+    the data bytes instead of added.
+    :rtype: String
+    :return: The resulting bytes of the combination.
+    """
+
+    count = len(data)
+    if not count:
+        return b""
+    if not hasattr(int, "from_bytes"):
+        data = bytearray(data)
+        sign = -1 if subtract else 1
+        return bytes(bytearray((b1 + sign * b2) % 256 for b1, b2 in zip(data, stream)))
+
+    high = int.from_bytes(b"\x80" * count, "little")
+    low = high ^ int.from_bytes(b"\xff" * count, "little")
+
+    a = int.from_bytes(data, "little")
+    b = int.from_bytes(stream[:count], "little")
+
+    # the subtraction is done through the sum with the (byte by byte)
+    # two's complement of the stream, computed as its negation plus one
+    if subtract:
+        b ^= high | low
+        b = ((b & low) + (int.from_bytes(b"\x01" * count, "little") & low)) ^ (b & high)
+
+    value = ((a & low) + (b & low)) ^ ((a ^ b) & high)
+    return value.to_bytes(count, "little")
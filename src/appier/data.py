@@ -34,6 +34,7 @@ import struct
 import socket
 import hashlib
 import binascii
+import functools
 import threading
 
 from . import mongo
@@ -42,6 +43,42 @@ from . import config
 from . import legacy
 from . import exceptions
 
+TIMED = threading.local()
+""" The thread local storage used to track the nesting of the
+timed operations, only the outermost one is profiled """
+
+
+def timed(function):
+    name = function.__name__
+
+    @functools.wraps(function)
+    def interceptor(self, *args, **kwargs):
+        # in case there's already a timed operation running in the
+        # current thread (eg: an update inside a find and modify) the
+        # operation is not profiled, avoiding double accounting
+        if getattr(TIMED, "running", False):
+            return function(self, *args, **kwargs)
+
+        result = None
+        stime = legacy.perf_counter()
+        TIMED.running = True
+        try:
+            result = function(self, *args, **kwargs)
+            return result
+        finally:
+            TIMED.running = False
+            duration = legacy.perf_counter() - stime
+
+            # profiles the operation making sure that no problem in the
+            # profiling is ever raised, as it would mask the result (or
+            # the exception) of the operation itself
+            try:
+                self.profile(name, args, kwargs, result, duration)
+            except Exception:
+                pass
+
+    return interceptor
+
 
 class DataAdapter(object):
     def __init__(self, *args, **kwargs):
@@ -267,6 +304,27 @@ class Collection(object):
             % (self.owner.name, operation, self.name, str(extra)[:2046])
         )
 
+    def profile(self, operation, args, kwargs, result, duration):
+        # retrieves the currently running application and the request that
+        # is being handled, accounting the time spent in the query
+        app = common.base().get_app()
+        if not app:
+            return
+        request = app.get_request()
+        if not request:
+            return
+        request.timing("data", duration)
+
+        # in case the query profiler is enabled records the query on it, so
+        # that the query is accounted for the collection and for the request
+        query_profiler = getattr(app, "query_profiler", None)
+        if not query_profiler:
+            return
+        filter = args[0] if args else kwargs.get("filter", None)
+        query_profiler.record(
+            self.name, operation, filter, result, duration, queries=request.queries
+        )
+
     def _id(self, *args, **kwargs):
         return self.owner._id(*args, **kwargs)
 
@@ -276,38 +334,47 @@ class MongoCollection(Collection):
         Collection.__init__(self, owner, name)
         self._base = base
 
+    @timed
     def find(self, *args, **kwargs):
         self.log("find", *args, **kwargs)
         return self._base.find(*args, **kwargs)
 
+    @timed
     def find_one(self, *args, **kwargs):
         self.log("find_one", *args, **kwargs)
         return self._base.find_one(*args, **kwargs)
 
+    @timed
     def find_and_modify(self, *args, **kwargs):
         self.log("find_and_modify", *args, **kwargs)
         return mongo._store_find_and_modify(self._base, *args, **kwargs)
 
+    @timed
     def insert(self, *args, **kwargs):
         self.log("insert", *args, **kwargs)
         return mongo._store_insert(self._base, *args, **kwargs)
 
+    @timed
     def update(self, *args, **kwargs):
         self.log("update", *args, **kwargs)
         return mongo._store_update(self._base, *args, **kwargs)
 
+    @timed
     def remove(self, *args, **kwargs):
         self.log("remove", *args, **kwargs)
         return mongo._store_remove(self._base, *args, **kwargs)
 
+    @timed
     def count(self, *args, **kwargs):
         self.log("count", *args, **kwargs)
         return mongo._count(self._base, *args, **kwargs)
 
+    @timed
     def count_documents(self, *args, **kwargs):
         self.log("count_documents", *args, **kwargs)
         return mongo._count_documents(self._base, *args, **kwargs)
 
+    @timed
     def ensure_index(self, *args, **kwargs):
         self.log("ensure_index", *args, **kwargs)
         direction = kwargs.pop("direction", True)
@@ -337,6 +404,7 @@ class MongoCollection(Collection):
         else:
             return mongo._store_ensure_index_many(self._base, *args, **kwargs)
 
+    @timed
     def drop_indexes(self, *args, **kwargs):
         self.log("drop_indexes", *args, **kwargs)
         return self._base.drop_indexes()
@@ -347,6 +415,7 @@ class TinyCollection(Collection):
         Collection.__init__(self, owner, name)
         self._base = base
 
+    @timed
     def find(self, *args, **kwargs):
         self.log("find", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
@@ -354,6 +423,7 @@ class TinyCollection(Collection):
         results = self._base.search(condition)
         return self._to_results(results, kwargs)
 
+    @timed
     def find_one(self, *args, **kwargs):
         self.log("find_one", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
@@ -362,6 +432,7 @@ class TinyCollection(Collection):
         results = self._to_results(results, kwargs)
         return results[0] if results else None
 
+    @timed
     def find_and_modify(self, *args, **kwargs):
         self.log("find_and_modify", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
@@ -381,6 +452,7 @@ class TinyCollection(Collection):
             self.insert(object)
         return dict(object)
 
+    @timed
     def insert(self, *args, **kwargs):
         self.log("insert", *args, **kwargs)
         object = args[0] if len(args) > 0 else dict()
@@ -390,6 +462,7 @@ class TinyCollection(Collection):
         self._base.insert(object)
         return object
 
+    @timed
     def update(self, *args, **kwargs):
         self.log("update", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
@@ -398,21 +471,25 @@ class TinyCollection(Collection):
         object = updater.get("$set", dict())
         return self._base.update(object, condition)
 
+    @timed
     def remove(self, *args, **kwargs):
         self.log("remove", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
         condition = self._to_condition(filter)
         return self._base.remove(condition)
 
+    @timed
     def count(self, *args, **kwargs):
         self.log("count", *args, **kwargs)
         filter = args[0] if len(args) > 0 else dict()
         condition = self._to_condition(filter)
         return self._base.count(condition)
 
+    @timed
     def ensure_index(self, *args, **kwargs):
         self.log("ensure_index", *args, **kwargs)
 
+    @timed
     def drop_indexes(self, *args, **kwargs):
         self.log("drop_indexes", *args, **kwargs)
 
@@ -30,11 +30,15 @@ __license__ = "Apache License, Version 2.0"
 
 import os
 import sys
+import copy
 import gzip
+import threading
 
 from . import http
 from . import util
+from . import config
 from . import legacy
+from . import structures
 
 
 class GeoResolver(object):
@@ -64,46 +68,153 @@ class GeoResolver(object):
     search for the GeoIP database file, the order in which
     they are defined as they are search from the beginning """
 
+    CACHE_SIZE = 4096
+    """ The default maximum number of simplified results that
+    are kept in the LRU cache, the cache is keyed by address
+    or by network prefix (for IPv4 networks up to /24) """
+
     _db = None
     """ The reference to the internal database reference object
     that is going to be used in the GeoIP resolution """
 
+    _cache = None
+    """ The LRU cache of simplified results, lazily created
+    according to the currently defined cache size """
+
+    _lock = threading.RLock()
+    """ The lock that controls the access to both the cache
+    and the database loading operations """
+
     @classmethod
     def resolve(cls, address, simplified=True):
         db = cls._get_db()
         if not db:
             return None
-        result = db.get(address)
-        if simplified:
-            result = cls._simplify(result)
-        return result
+        if not simplified:
+            return db.get(address)
+        return cls._resolve(db, address)
+
+    @classmethod
+    def resolve_many(cls, addresses, simplified=True):
+        db = cls._get_db()
+        if not db:
+            return [None for _address in addresses]
+        results = dict()
+        for address in addresses:
+            if address in results:
+                continue
+            results[address] = (
+                cls._resolve(db, address) if simplified else db.get(address)
+            )
+        return [results[address] for address in addresses]
+
+    @classmethod
+    def load(cls, path=None):
+        # retrieves the reference to the maxminddb module (installing it
+        # on demand if required) and in case the path is not provided
+        # tries to find it on the file system (or download it)
+        maxminddb = util.import_pip("maxminddb")
+        if not maxminddb:
+            return None
+        path = path or cls._try_all()
+        if not path:
+            return None
+
+        # opens the database explicitly in memory-mapped mode, preferring
+        # the C extension and falling back to the pure Python one, as the
+        # cache is going to be re-created its reset by the unload
+        cls.unload()
+        try:
+            db = maxminddb.open_database(path, mode=maxminddb.MODE_MMAP_EXT)
+        except (ImportError, ValueError):
+            db = maxminddb.open_database(path, mode=maxminddb.MODE_MMAP)
+        cls._db = db
+        return db
+
+    @classmethod
+    def unload(cls):
+        cls._lock.acquire()
+        try:
+            if cls._db:
+                cls._db.close()
+            cls._db = None
+            cls._cache = None
+        finally:
+            cls._lock.release()
+
+    @classmethod
+    def _resolve(cls, db, address):
+        # determines the prefix key for the address (only for IPv4) and
+        # then tries to find the result in the cache, first by address
+        # and then by prefix, returning it immediately if found (as a copy
+        # so that changes made by the caller never reach the cache)
+        is_ipv4 = "." in address and not ":" in address
+        prefix = address.rsplit(".", 1)[0] + "/24" if is_ipv4 else None
+        cache = cls._get_cache()
+        cls._lock.acquire()
+        try:
+            if address in cache:
+                return copy.deepcopy(cache[address])
+            if prefix and prefix in cache:
+                return copy.deepcopy(cache[prefix])
+        finally:
+            cls._lock.release()
+
+        # runs the lookup in the database and simplifies the result, in case
+        # the network of the result contains the complete prefix the result
+        # is cached for the prefix, otherwise it's cached for the address
+        if hasattr(db, "get_with_prefix_len"):
+            result, prefix_len = db.get_with_prefix_len(address)
+        else:
+            result, prefix_len = db.get(address), None
+        result = cls._simplify(result)
+        key = prefix if prefix and prefix_len and prefix_len <= 24 else address
+        cls._lock.acquire()
+        try:
+            cache[key] = result
+        finally:
+            cls._lock.release()
+        return copy.deepcopy(result)
 
     @classmethod
     def _simplify(cls, result, locale="en", valid=VALID):
         if not result:
             return result
-        for name, value in legacy.items(result):
-            if not name in valid:
-                del result[name]
-            if not "names" in value:
+        simplified = dict()
+        for name in valid:
+            value = result.get(name, None)
+            if value == None:
                 continue
-            names = value["names"]
-            value["name"] = names.get(locale, None)
-            del value["names"]
-        return result
+            if "names" in value:
+                names = value["names"]
+                value = dict(
+                    (key, _value)
+                    for key, _value in legacy.iteritems(value)
+                    if not key == "names"
+                )
+                value["name"] = names.get(locale, None)
+            simplified[name] = value
+        return simplified
 
     @classmethod
     def _get_db(cls):
         if cls._db:
             return cls._db
-        maxminddb = util.import_pip("maxminddb")
-        if not maxminddb:
-            return None
-        path = cls._try_all()
-        if not path:
-            return None
-        cls._db = maxminddb.open_database(path)
-        return cls._db
+        cls._lock.acquire()
+        try:
+            if cls._db:
+                return cls._db
+            return cls.load()
+        finally:
+            cls._lock.release()
+
+    @classmethod
+    def _get_cache(cls):
+        if not cls._cache == None:
+            return cls._cache
+        cache_size = config.conf("GEO_CACHE_SIZE", cls.CACHE_SIZE, cast=int)
+        cls._cache = structures.LRUDict(max_size=cache_size)
+        return cls._cache
 
     @classmethod
     def _try_all(cls, prefixes=PREFIXES):
@@ -28,20 +28,33 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import heapq
+import itertools
+
 from . import defines
-from . import queuing
+from . import structures
 
 
 class Graph(object):
     """
     Graph structure and associated algorithms. Made up by a dictionary of
-    sources to destinations and costs (weighted edges).
+    sources to dictionaries of destinations and costs (weighted edges).
     Edges are unidirectional by default.
     Costs default to a unit.
+
+    The shortest path trees computed for a source are cached until the
+    graph is changed (through the edge adding methods), notice that any
+    direct change to the edges dictionary must be followed by a call to
+    the invalidate method.
     """
 
+    CACHE_SIZE = 16
+    """ The maximum number of single source shortest path trees
+    that are kept in the cache of each graph """
+
     def __init__(self, *args):
         self.edges = dict()
+        self._trees = structures.LimitedSizeDict(max_size=self.CACHE_SIZE)
         if len(args) > 0 and isinstance(args[0], list):
             self.add_edges(args[0])
 
@@ -74,23 +87,51 @@ class Graph(object):
             self.add_edge(src, dst, cost=cost, bidirectional=bidirectional)
 
     def add_edge(self, src, dst, cost=1, bidirectional=False):
-        if not src in self.edges:
-            self.edges[src] = []
-        self.edges[src].append((dst, cost))
+        edges = self.edges.get(src, None)
+        if edges == None:
+            edges = dict()
+            self.edges[src] = edges
+
+        # in case there's an already existing edge for the same destination
+        # only the cheapest of both is kept, avoiding duplicated edges
+        _cost = edges.get(dst, None)
+        if _cost == None or cost < _cost:
+            edges[dst] = cost
+
+        self.invalidate()
 
         if bidirectional:
             self.add_edge(dst, src, cost=cost, bidirectional=False)
 
+    def invalidate(self):
+        """
+        Invalidates the complete set of cached shortest path trees,
+        should be called whenever the edges of the graph are changed.
+        """
+
+        if not self._trees:
+            return
+        self._trees.clear()
+
     def dijkstra(self, src, dst):
         """
-        Dijkstra's algorithm with priority queue implementation
-        using the Appier's memory queue.
+        Dijkstra's algorithm with a binary heap based priority queue
+        and a visited set, stopping as soon as the destination node is
+        settled (early exit).
+
+        In case the shortest path tree for the source has already been
+        computed (and cached) it's used instead, and in case the search
+        settles the complete component of the source (no early exit) the
+        resulting tree is cached for the next queries.
 
         :type src: Object
         :param src: The initial node from which a node path to
         the destination should be found.
         :type dst: Object
         :param dst: The destination node to find the path to.
+        :rtype: Tuple
+        :return: The path (list of nodes) and the cost of it, in case
+        there's no path an empty list and infinite cost are returned.
         :see: https://en.wikipedia.org/wiki/Dijkstra%27s_algorithm
         """
 
@@ -98,26 +139,116 @@ class Graph(object):
             return [src], 0
 
         cls = self.__class__
-        dist, prev = dict(), dict()
-        dist[src] = 0
 
-        queue = queuing.MemoryQueue()
-        queue.push(src, priority=0)
+        tree = self._trees.get(src, None)
+        if tree:
+            dist, prev = tree
+        else:
+            dist, prev, complete = self._search(src, dst=dst)
+            if complete:
+                self._trees[src] = (dist, prev)
 
-        while queue.length() > 0:
-            _, _, top = queue.pop(full=True)
-            dist[top] = dist[top] if top in dist else defines.INFINITY
+        path = cls._build_path(prev, src, dst)
+        cost = dist[dst] if dst in dist else defines.INFINITY
+        return path, cost
 
-            edges = self.edges[top] if top in self.edges else []
-            for nxt, cost in edges:
-                dist[nxt] = dist[nxt] if nxt in dist else defines.INFINITY
+    def astar(self, src, dst, heuristic):
+        """
+        A* search algorithm, uses the provided heuristic callback to
+        estimate the remaining cost from a node to the destination
+        guiding the search towards it.
 
-                alt = dist[top] + cost
-                if alt < dist[nxt]:
-                    dist[nxt] = alt
-                    prev[nxt] = top
-                    queue.push(nxt, priority=dist[nxt])
+        The heuristic should be consistent (never overestimating the
+        cost of an edge) for the returned path to be the shortest one.
+
+        :type src: Object
+        :param src: The initial node from which a node path to
+        the destination should be found.
+        :type dst: Object
+        :param dst: The destination node to find the path to.
+        :type heuristic: Function
+        :param heuristic: The callback that receives a node and the
+        destination node and returns the estimated cost between them.
+        :rtype: Tuple
+        :return: The path (list of nodes) and the cost of it, in case
+        there's no path an empty list and infinite cost are returned.
+        :see: https://en.wikipedia.org/wiki/A*_search_algorithm
+        """
+
+        if src == dst:
+            return [src], 0
+
+        cls = self.__class__
+        edges = self.edges
+        counter = itertools.count()
+        dist, prev, visited = {src: 0}, dict(), set()
+        heap = [(heuristic(src, dst), next(counter), src)]
+
+        while heap:
+            _, _, top = heapq.heappop(heap)
+            if top in visited:
+                continue
+            if top == dst:
+                break
+            visited.add(top)
+
+            base = dist[top]
+            for nxt, cost in edges.get(top, {}).items():
+                alt = base + cost
+                if nxt in dist and alt >= dist[nxt]:
+                    continue
+                dist[nxt] = alt
+                prev[nxt] = top
+                heapq.heappush(heap, (alt + heuristic(nxt, dst), next(counter), nxt))
 
         path = cls._build_path(prev, src, dst)
         cost = dist[dst] if dst in dist else defines.INFINITY
         return path, cost
+
+    def tree(self, src):
+        """
+        Retrieves the (complete) single source shortest path tree for
+        the provided source node, as a tuple with the map of distances
+        and the map of previous nodes.
+
+        The tree is cached until the graph is changed, meaning that
+        subsequent path queries from the same source are immediate.
+
+        :type src: Object
+        :param src: The source node of the shortest path tree.
+        :rtype: Tuple
+        :return: Tuple with both the map of distances and the map
+        of previous nodes (for path building) for the source.
+        """
+
+        tree = self._trees.get(src, None)
+        if tree:
+            return tree
+        dist, prev, _complete = self._search(src)
+        tree = (dist, prev)
+        self._trees[src] = tree
+        return tree
+
+    def _search(self, src, dst=None):
+        edges = self.edges
+        counter = itertools.count()
+        dist, prev, visited = {src: 0}, dict(), set()
+        heap = [(0, next(counter), src)]
+
+        while heap:
+            base, _, top = heapq.heappop(heap)
+            if top in visited:
+                continue
+            if top == dst:
+                return dist, prev, False
+            visited.add(top)
+
+            for nxt, cost in edges.get(top, {}).items():
+                alt = base + cost
+                if nxt in dist and alt >= dist[nxt]:
+                    continue
+                dist[nxt] = alt
+                prev[nxt] = top
+                heapq.heappush(heap, (alt, next(counter), nxt))
+
+        return dist, prev, True
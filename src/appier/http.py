@@ -39,7 +39,9 @@ __license__ = "Apache License, Version 2.0"
 
 import os
 import json
+import time
 import base64
+import socket
 import string
 import random
 import logging
@@ -67,6 +69,31 @@ SEQUENCE_TYPES = (list, tuple)
 """ The sequence defining the various types that are
 considered to be sequence based for python """
 
+POOL_SIZE = 32
+""" The default maximum number of connections (both idle and
+in use) that the connection pool keeps for each of the hosts,
+may be changed on a per host basis using configuration """
+
+POOL_IDLE = 60.0
+""" The amount of time in seconds an idle connection is kept
+in the pool before being evicted (closed), should be lower than
+the keep-alive timeout of the typical upstream servers """
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+""" The set of HTTP status codes that are considered to be
+redirection related and that are followed automatically by
+the pool based client (for bodyless methods) """
+
+CHUNK_SIZE = 40960
+""" The default size in bytes of the chunks that are going to be
+read from the body of a streamed response, should be a balance
+between memory usage and number of read operations """
+
+RETRY_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE", "DELETE")
+""" The set of HTTP methods that are considered to be safe to be
+sent again (idempotent) when a re-used connection fails, other
+methods are only retried when the caller explicitly requests it """
+
 AUTH_ERRORS = (401, 403, 440, 499)
 """ The sequence that defines the various HTTP errors
 considered to be authentication related and for which a
@@ -76,6 +103,10 @@ ACCESS_LOCK = threading.RLock()
 """ Global access lock used for locking global operations
 that require thread safety under the HTTP infra-structure """
 
+REQUESTS_METRICS = dict(hits=0, misses=0, waits=0, wait_time=0.0)
+""" The metrics of the connection pools of the requests session,
+updated by the metered connection pool classes of urllib3 """
+
 logger = log.get_logger("appier-http")
 """ The logger instance to be used for logging in contexts
 outside the Appier app execution """
@@ -254,6 +285,58 @@ def patch(
     )
 
 
+def pool_stats():
+    """
+    Retrieves the metrics of the global HTTP connection pool used
+    by the pool based client, including the number of hits (re-used
+    connections), misses (new connections) and waits, the metrics of
+    the requests session pools are included under the requests key.
+
+    :rtype: Dictionary
+    :return: The map containing the various metrics of the pool and
+    the number of idle and active connections per host.
+    """
+
+    pool = globals().get("_http_pool", None)
+    session = globals().get("_requests_session", None)
+    stats = pool.stats() if pool else dict()
+    if session:
+        ACCESS_LOCK.acquire()
+        try:
+            stats["requests"] = dict(REQUESTS_METRICS)
+        finally:
+            ACCESS_LOCK.release()
+    return stats
+
+
+def reset_pools():
+    """
+    Closes and discards the complete set of pooled HTTP connections
+    (both the pool and the requests session), should be called before
+    forking the process so that no sockets are shared with children.
+    """
+
+    global _http_pool, _requests_session
+
+    ACCESS_LOCK.acquire()
+    try:
+        pool = globals().pop("_http_pool", None)
+        session = globals().pop("_requests_session", None)
+    finally:
+        ACCESS_LOCK.release()
+
+    if pool:
+        pool.close()
+    if session:
+        session.close()
+
+    ACCESS_LOCK.acquire()
+    try:
+        REQUESTS_METRICS.update(hits=0, misses=0, waits=0, wait_time=0.0)
+    finally:
+        ACCESS_LOCK.release()
+
+
 def basic_auth(username, password=None):
     if not password:
         password = username
@@ -450,6 +533,7 @@ def _method_empty(
     if timeout == None:
         timeout = config.conf("HTTP_TIMEOUT", TIMEOUT, cast=int)
     values = params or dict()
+    stream = kwargs.get("stream", False)
 
     values_s = " with '%s'" % str(values) if values else ""
     if not silent:
@@ -484,16 +568,25 @@ def _method_empty(
     if isinstance(file, tuple):
         return file
 
-    try:
-        result = file.read()
-    finally:
-        file.close()
+    # in case the stream mode is requested the body is not read and
+    # the (streamed) response object is returned as the result, so that
+    # it's possible to iterate over its contents in bounded memory
+    if stream:
+        file = _stream(file)
+        result = file
+    else:
+        try:
+            result = file.read()
+        finally:
+            file.close()
 
     code = file.getcode()
     info = file.info()
 
     location = info.get("Location", None) if redirect else None
     if location:
+        if stream:
+            file.close()
         return _redirect(
             location,
             scheme,
@@ -508,7 +601,7 @@ def _method_empty(
     if not silent:
         logging.debug("%s %s returned '%d'" % (name, url, code))
 
-    result = _result(result, info)
+    result = result if stream else _result(result, info)
     return (result, file) if handle else result
 
 
@@ -536,6 +629,7 @@ def _method_payload(
     if timeout == None:
         timeout = config.conf("HTTP_TIMEOUT", TIMEOUT, cast=int)
     values = params or dict()
+    stream = kwargs.get("stream", False)
 
     values_s = " with '%s'" % str(values) if values else ""
     if not silent:
@@ -588,16 +682,25 @@ def _method_payload(
     if file == None:
         return file
 
-    try:
-        result = file.read()
-    finally:
-        file.close()
+    # in case the stream mode is requested the body is not read and
+    # the (streamed) response object is returned as the result, so that
+    # it's possible to iterate over its contents in bounded memory
+    if stream:
+        file = _stream(file)
+        result = file
+    else:
+        try:
+            result = file.read()
+        finally:
+            file.close()
 
     code = file.getcode()
     info = file.info()
 
     location = info.get("Location", None) if redirect else None
     if location:
+        if stream:
+            file.close()
         return _redirect(
             location,
             scheme,
@@ -606,12 +709,13 @@ def _method_payload(
             silent=silent,
             redirect=redirect,
             timeout=timeout,
+            stream=stream,
         )
 
     if not silent:
         logging.debug("%s %s returned '%d'" % (name, url, code))
 
-    result = _result(result, info)
+    result = result if stream else _result(result, info)
     return (result, file) if handle else result
 
 
@@ -707,11 +811,205 @@ def _resolve(*args, **kwargs):
 
 
 def _resolve_legacy(url, method, headers, data, silent, timeout, **kwargs):
+    # in case the pool is explicitly enabled for the legacy client and the
+    # re-use of connections is requested the pool based client is used, as
+    # the legacy opener is not able to keep connections alive, notice that
+    # this is opt-in as the pool does not honour the proxy settings and the
+    # conversion of redirected POST requests into GET ones (as urllib does)
+    legacy_pool = config.conf("HTTP_LEGACY_POOL", False, cast=bool)
+    reuse = kwargs.get("reuse", True)
+    if legacy_pool and reuse:
+        return _resolve_pool(url, method, headers, data, silent, timeout, **kwargs)
+
     # retrieves the various dynamic parameters for the HTTP client
-    # usage under the legacy infra-structure
+    # usage under the legacy infra-structure, notice that the stream
+    # mode is natively supported as the body is read on demand
     _retry = kwargs.pop("retry", 1)
     _reuse = kwargs.pop("reuse", True)
+    _stream = kwargs.pop("stream", False)
 
+    data = _data_bytes(url, method, data)
+    opener = legacy.build_opener(legacy.HTTPHandler)
+    request = legacy.Request(url, data=data, headers=headers)
+    request.get_method = lambda: method
+    logger.trace("Legacy %s %s timeout=%s", method, url, timeout)
+    return opener.open(request, timeout=timeout)
+
+
+def _resolve_pool(url, method, headers, data, silent, timeout, **kwargs):
+    # retrieves the various dynamic parameters for the HTTP client
+    # usage under the pool based infra-structure
+    uuid = kwargs.pop("uuid", None)
+    retry = kwargs.pop("retry", 1)
+    reuse = kwargs.pop("reuse", True)
+    stream = kwargs.pop("stream", False)
+    redirects = kwargs.pop("redirects", 10)
+    idempotent = kwargs.pop("idempotent", method in RETRY_METHODS)
+    rid = uuid[:8] if uuid else None
+
+    # makes sure that the payload is represented as a simple byte buffer
+    # and then builds the key that identifies the target of the request
+    # (connections are only re-used for the same scheme, host and port)
+    data = _data_bytes(url, method, data)
+    parse = legacy.urlparse(url)
+    secure = parse.scheme == "https"
+    port = parse.port or (443 if secure else 80)
+    key = (parse.scheme, parse.hostname, port)
+    path = parse.path or "/"
+    if parse.query:
+        path += "?" + parse.query
+
+    # acquires a connection from the pool (blocking in case the maximum
+    # number of connections for the host has been reached) and runs the
+    # request retrieving the response (status line and headers)
+    pool = _pool_http()
+    connection, reused = pool.acquire(key, timeout=timeout)
+    logger.trace(
+        "Pool [%s] %s %s reused=%s timeout=%s", rid, method, url, reused, timeout
+    )
+    sent = False
+    try:
+        connection.request(method, path, body=data, headers=headers)
+        sent = True
+        result = connection.getresponse()
+    except (socket.error, legacy.HTTPException) as exception:
+        # discards the (possibly broken) connection and in case it was a
+        # re-used one (most probably closed by the server in the meantime)
+        # retries the request using a new connection, idle connections
+        # for the same host are also cleared as they're probably stale,
+        # notice that timeouts are never retried and that the request is
+        # only retried if it failed while being sent or if the server closed
+        # the connection without replying, and only for idempotent methods
+        pool.discard(key, connection)
+        is_timeout = isinstance(exception, socket.timeout)
+        is_closed = isinstance(exception, legacy.BadStatusLine)
+        is_retry = reused and retry > 0 and idempotent and not is_timeout
+        is_retry = is_retry and (not sent or is_closed)
+        if not is_retry:
+            raise
+        logger.trace(
+            "Pool connection failed, retrying [%s] %s %s (retry=%d)",
+            rid,
+            method,
+            url,
+            retry - 1,
+        )
+        pool.clear(key)
+        kwargs.update(
+            uuid=uuid,
+            retry=retry - 1,
+            reuse=reuse,
+            stream=stream,
+            redirects=redirects,
+            idempotent=idempotent,
+        )
+        return _resolve_pool(url, method, headers, data, silent, timeout, **kwargs)
+
+    # determines if the response is an error or a redirection that is
+    # going to be followed (in a transparent manner) for the bodyless
+    # methods, as done by the other clients
+    code = result.status
+    location = result.getheader("Location", None)
+    is_redirect = code in REDIRECT_CODES and location and method in ("GET", "HEAD")
+    is_follow = is_redirect and redirects > 0
+    is_error = _is_error(code)
+
+    # in case the stream mode is requested the body is not read, and the
+    # connection is only returned to the pool once the stream is closed,
+    # if the body was not completely read the connection is discarded
+    if stream and not is_follow and not is_error:
+
+        def release(response):
+            complete = result.isclosed()
+            result.close()
+            if complete:
+                pool.release(key, connection, reuse=reuse and not result.will_close)
+            else:
+                pool.discard(key, connection)
+
+        return HTTPStreamResponse(
+            result,
+            code=code,
+            status=result.reason,
+            headers=result.msg,
+            callback=release,
+        )
+
+    # reads the complete response body, so that the connection is ready
+    # to be used for a new request and then returns the connection to
+    # the pool (for re-usage) unless the server requested its closing
+    try:
+        body = result.read()
+    except (socket.error, legacy.HTTPException):
+        pool.discard(key, connection)
+        raise
+    pool.release(key, connection, reuse=reuse and not result.will_close)
+
+    response = HTTPResponse(
+        data=body, code=code, status=result.reason, headers=result.msg
+    )
+
+    # follows the redirection making sure that the host header is
+    # re-computed for the new location (not the original one)
+    if is_follow:
+        location = legacy.urljoin(url, location)
+        logger.trace("Pool [%s] %s %s redirected to %s", rid, method, url, location)
+        headers = dict(
+            (name, value) for name, value in headers.items() if not name == "Host"
+        )
+        kwargs.update(
+            uuid=uuid,
+            retry=retry,
+            reuse=reuse,
+            stream=stream,
+            redirects=redirects - 1,
+            idempotent=idempotent,
+        )
+        return _resolve_pool(location, method, headers, None, silent, timeout, **kwargs)
+
+    # verifies if the response code represents an error, if that's the case
+    # raises an error exception to the upper layers to break the current
+    # execution logic properly (as done by the remaining clients)
+    logger.trace("Pool [%s] %s %s returned %s", rid, method, url, code)
+    if is_error:
+        raise legacy.HTTPError(url, code, "HTTP retrieval problem", None, response)
+
+    return response
+
+
+def _pool_http():
+    global _http_pool
+
+    # retrieves the global pool reference and verifies that it has been
+    # created by the current process, a pool inherited from a parent
+    # process (fork) is discarded as its sockets are shared with it
+    ACCESS_LOCK.acquire()
+    try:
+        pool = globals().get("_http_pool", None)
+        if pool and pool.pid == os.getpid():
+            return pool
+        size = config.conf("HTTP_POOL_SIZE", POOL_SIZE, cast=int)
+        idle = config.conf("HTTP_POOL_IDLE", POOL_IDLE, cast=float)
+        sizes = _pool_sizes()
+        logger.trace("Creating HTTP pool with %d connections per host", size)
+        _http_pool = HTTPPool(size=size, sizes=sizes, idle=idle)
+        return _http_pool
+    finally:
+        ACCESS_LOCK.release()
+
+
+def _pool_sizes():
+    # parses the per host pool sizes configuration that should be
+    # defined as a sequence of host and size pairs (eg: host.com:64)
+    sizes = dict()
+    hosts = config.conf("HTTP_POOL_HOSTS", [], cast=list)
+    for host in hosts:
+        host, size = host.rsplit(":", 1)
+        sizes[host] = int(size)
+    return sizes
+
+
+def _data_bytes(url, method, data):
     is_generator = not data == None and legacy.is_generator(data)
     if is_generator:
         logger.trace("Consuming generator data for %s %s", method, url)
@@ -721,11 +1019,7 @@ def _resolve_legacy(url, method, headers, data, silent, timeout, **kwargs):
     if is_file:
         logger.trace("Reading file data for %s %s", method, url)
         data = data.read()
-    opener = legacy.build_opener(legacy.HTTPHandler)
-    request = legacy.Request(url, data=data, headers=headers)
-    request.get_method = lambda: method
-    logger.trace("Legacy %s %s timeout=%s", method, url, timeout)
-    return opener.open(request, timeout=timeout)
+    return data
 
 
 def _resolve_requests(url, method, headers, data, silent, timeout, **kwargs):
@@ -739,6 +1033,7 @@ def _resolve_requests(url, method, headers, data, silent, timeout, **kwargs):
     uuid = kwargs.pop("uuid", None)
     _retry = kwargs.pop("retry", 1)
     reuse = kwargs.pop("reuse", True)
+    stream = kwargs.pop("stream", False)
     connections = kwargs.pop("connections", 256)
     rid = uuid[:8] if uuid else None
 
@@ -752,16 +1047,26 @@ def _resolve_requests(url, method, headers, data, silent, timeout, **kwargs):
         data = structures.GeneratorFile(data)
 
     # verifies if the session for the requests infra-structure is
-    # already created and if that's not the case and the re-use
-    # flag is sets creates a new session for the requested settings
-    registered = "_requests_session" in globals()
+    # already created (by the current process, as sessions inherited
+    # from a forked parent must not be used) and if that's not the case
+    # and the re-use flag is sets creates a new session for the requested
+    # settings, mounting specific adapters for hosts with custom sizes
+    session = globals().get("_requests_session", None)
+    registered = session and session._pid == os.getpid()
     if not registered and reuse:
-        logger.trace("Creating requests session with %d connections", connections)
+        size = config.conf("HTTP_POOL_SIZE", connections, cast=int)
+        block = config.conf("HTTP_POOL_BLOCK", False, cast=bool)
+        logger.trace("Creating requests session with %d connections", size)
         _requests_session = requests.Session()
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=connections, pool_maxsize=connections
+        _requests_session._pid = os.getpid()
+        adapter = _requests_adapter(
+            requests, pool_connections=connections, pool_maxsize=size, pool_block=block
         )
         _requests_session.mount("", adapter)
+        for host, size in _pool_sizes().items():
+            adapter = _requests_adapter(requests, pool_maxsize=size, pool_block=block)
+            _requests_session.mount("http://" + host, adapter)
+            _requests_session.mount("https://" + host, adapter)
 
     # determines the based object from which the concrete methods
     # are going to be loaded by inspecting the re-use flag
@@ -786,7 +1091,20 @@ def _resolve_requests(url, method, headers, data, silent, timeout, **kwargs):
         reuse,
         timeout,
     )
-    result = caller(url, headers=headers, data=data, timeout=timeout)
+    result = caller(url, headers=headers, data=data, timeout=timeout, stream=stream)
+
+    # in case the stream mode is requested and the response is not an
+    # error one, returns the response with the raw (decoded) body file
+    # so that the contents are read on demand (bounded memory usage)
+    if stream and not _is_error(result.status_code):
+        result.raw.decode_content = True
+        return HTTPStreamResponse(
+            result.raw,
+            code=result.status_code,
+            headers=result.headers,
+            callback=lambda response: result.close(),
+        )
+
     response = HTTPResponse(
         data=result.content, code=result.status_code, headers=result.headers
     )
@@ -805,6 +1123,46 @@ def _resolve_requests(url, method, headers, data, silent, timeout, **kwargs):
     return response
 
 
+def _requests_adapter(requests, **kwargs):
+    # creates the adapter for the requests session and replaces the
+    # connection pool classes of its manager with metered ones, so that
+    # the hits, misses and waits are accounted (as in the pool client)
+    adapter = requests.adapters.HTTPAdapter(**kwargs)
+    manager = adapter.poolmanager
+    manager.pool_classes_by_scheme = dict(
+        (scheme, _requests_metered(pool_c))
+        for scheme, pool_c in manager.pool_classes_by_scheme.items()
+    )
+    return adapter
+
+
+def _requests_metered(pool_c):
+    class MeteredPool(pool_c):
+        def _get_conn(self, timeout=None):
+            # determines if there's no connection available in the pool, if
+            # that's the case and the pool is blocking the operation waits
+            # for a connection, then verifies if a new one has been created
+            empty = self.pool.empty() if self.pool else False
+            count = self.num_connections
+            start = time.time()
+            connection = pool_c._get_conn(self, timeout=timeout)
+            is_wait = empty and self.block
+            is_hit = self.num_connections == count
+
+            ACCESS_LOCK.acquire()
+            try:
+                REQUESTS_METRICS["hits" if is_hit else "misses"] += 1
+                if is_wait:
+                    REQUESTS_METRICS["waits"] += 1
+                    REQUESTS_METRICS["wait_time"] += time.time() - start
+            finally:
+                ACCESS_LOCK.release()
+
+            return connection
+
+    return MeteredPool
+
+
 def _resolve_netius(url, method, headers, data, silent, timeout, **kwargs):
     util.ensure_pip("netius")
     import netius.clients
@@ -833,6 +1191,7 @@ def _resolve_netius(url, method, headers, data, silent, timeout, **kwargs):
     asynchronous = kwargs.pop("async", False)
     asynchronous = kwargs.pop("asynchronous", asynchronous)
     use_file = kwargs.pop("use_file", False)
+    stream = kwargs.pop("stream", False)
     callback = kwargs.pop("callback", None)
     callback_init = kwargs.pop("callback_init", None)
     callback_open = kwargs.pop("callback_open", None)
@@ -846,6 +1205,10 @@ def _resolve_netius(url, method, headers, data, silent, timeout, **kwargs):
     # to re-use the HTTP client as it would create issues
     retry, reuse = (0, False) if asynchronous else (retry, reuse)
 
+    # for the stream mode the body is spooled into a temporary file
+    # (instead of memory) that is then read on demand by the caller
+    use_file = use_file or stream
+
     # creates the proper set of extra parameters to be sent to the
     # HTTP client taking into account a possible async method request
     extra = (
@@ -914,6 +1277,8 @@ def _resolve_netius(url, method, headers, data, silent, timeout, **kwargs):
             retry - 1,
         )
         kwargs["retry"] = retry - 1
+        kwargs["use_file"] = use_file
+        kwargs["stream"] = stream
         return _resolve_netius(url, method, headers, data, silent, timeout, **kwargs)
 
     # converts the netius specific result map into a response compatible
@@ -940,6 +1305,16 @@ def _resolve_netius(url, method, headers, data, silent, timeout, **kwargs):
             response,
         )
 
+    # in case the stream mode is requested wraps the temporary file
+    # containing the body in a streamed response object
+    if stream:
+        return HTTPStreamResponse(
+            result["data"],
+            code=code,
+            status=result.get("status", None),
+            headers=result.get("headers", None),
+        )
+
     # returns the final response object to the upper layers, this object
     # may be used freely under the compatibility interface it provides
     return response
@@ -1053,6 +1428,24 @@ def _cleanup_netius():
     del _netius_clients
 
 
+def _stream(file):
+    # in case the provided file is already a streamed response returns
+    # it immediately, otherwise wraps the (file like) response object
+    # or the already read data of a compatibility response object
+    if isinstance(file, HTTPStreamResponse):
+        return file
+    if isinstance(file, HTTPResponse):
+        data = file.data
+        data = data if hasattr(data, "read") else legacy.BytesIO(data or b"")
+        status = file.status
+    else:
+        data = file
+        status = None
+    return HTTPStreamResponse(
+        data, code=file.getcode(), status=status, headers=file.info()
+    )
+
+
 def _parse_url(url):
     parse = legacy.urlparse(url)
     scheme = parse.scheme
@@ -1361,3 +1754,261 @@ class HTTPResponse(object):
 
     def info(self):
         return self.headers
+
+
+class HTTPStreamResponse(HTTPResponse):
+    """
+    Streamed version of the compatibility response object, that
+    reads the body on demand from the underlying file like object
+    instead of holding it completely in memory.
+
+    Iterating over the response yields the body in chunks and the
+    response should always be closed after usage.
+    """
+
+    def __init__(
+        self,
+        file,
+        code=200,
+        status=None,
+        headers=None,
+        callback=None,
+        chunk_size=CHUNK_SIZE,
+    ):
+        HTTPResponse.__init__(self, code=code, status=status, headers=headers)
+        self.file = file
+        self.callback = callback
+        self.chunk_size = chunk_size
+        self.closed = False
+        self._buffer = b""
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def read(self, size=-1):
+        if self.closed:
+            return b""
+
+        # in case there's data pending from a previous line read it's
+        # consumed first, and only the remaining is read from the file
+        buffer, self._buffer = self._buffer, b""
+        if size == None or size < 0:
+            return buffer + self.file.read()
+        if len(buffer) >= size:
+            self._buffer = buffer[size:]
+            return buffer[:size]
+        return buffer + self.file.read(size - len(buffer))
+
+    def readline(self):
+        if self.closed:
+            return b""
+
+        # reads chunks from the file until a newline character is found
+        # (or the end of file is reached), keeping the data after the
+        # newline in the buffer for the next read operations
+        buffer = self._buffer
+        while not b"\n" in buffer:
+            data = self.file.read(self.chunk_size)
+            if not data:
+                break
+            buffer += data
+        index = buffer.find(b"\n") + 1 or len(buffer)
+        self._buffer = buffer[index:]
+        return buffer[:index]
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.callback:
+            self.callback(self)
+        elif hasattr(self.file, "close"):
+            self.file.close()
+
+    def iter_chunks(self, chunk_size=None):
+        chunk_size = chunk_size or self.chunk_size
+        try:
+            while True:
+                data = self.read(chunk_size)
+                if not data:
+                    break
+                yield data
+        finally:
+            self.close()
+
+    def generator(self, chunk_size=None):
+        """
+        Builds a generator compatible with the generator based response
+        protocol of appier, where the first value is the size of the
+        message (or -1 if unknown) followed by the chunks of the body.
+
+        :type chunk_size: int
+        :param chunk_size: The size of the chunks that are going to be
+        read from the body (defaults to the response chunk size).
+        :rtype: Generator
+        :return: The generator that yields the size followed by the
+        complete set of body chunks.
+        """
+
+        yield self.length
+        for data in self.iter_chunks(chunk_size=chunk_size):
+            yield data
+
+    @property
+    def length(self):
+        headers = self.headers or dict()
+        encoding = headers.get("Content-Encoding", None)
+        if encoding and not encoding == "identity":
+            return -1
+        length = headers.get("Content-Length", None)
+        return int(length) if length else -1
+
+
+class HTTPPool(object):
+    """
+    Thread safe pool of persistent (keep-alive) HTTP connections
+    indexed by scheme, host and port, that limits the number of
+    connections per host and evicts the ones that are idle.
+
+    Keeps a set of metrics (hits, misses and waits) that may be
+    used to properly tune the size of the pool.
+    """
+
+    def __init__(self, size=POOL_SIZE, sizes=None, idle=POOL_IDLE):
+        self.size = size
+        self.sizes = sizes or dict()
+        self.idle = idle
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.connections = dict()
+        self.counts = dict()
+        self.metrics = dict(
+            hits=0, misses=0, waits=0, wait_time=0.0, evictions=0, discards=0
+        )
+
+    def acquire(self, key, timeout=None):
+        size = self.sizes.get(key[1], self.size)
+        start = None
+
+        self.condition.acquire()
+        try:
+            while True:
+                # removes the connections that have been idle for too long
+                # and then tries to re-use the most recently used connection
+                # (the one with the most chances of still being alive)
+                self._evict(key)
+                idle = self.connections.get(key, None)
+                if idle:
+                    connection, _timestamp = idle.pop()
+                    self.metrics["hits"] += 1
+                    return connection, True
+
+                # in case there's still room for a new connection for the
+                # host, reserves a slot for it (to be created outside lock)
+                count = self.counts.get(key, 0)
+                if count < size:
+                    self.counts[key] = count + 1
+                    self.metrics["misses"] += 1
+                    break
+
+                # otherwise waits until a connection is released, taking
+                # into account the (optional) timeout of the operation
+                if start == None:
+                    start = time.time()
+                    self.metrics["waits"] += 1
+                remaining = timeout - (time.time() - start) if timeout else None
+                if not remaining == None and remaining <= 0:
+                    raise exceptions.OperationalError(
+                        message="Timeout waiting for HTTP connection to '%s'" % key[1]
+                    )
+                self.condition.wait(remaining)
+        finally:
+            if not start == None:
+                self.metrics["wait_time"] += time.time() - start
+            self.condition.release()
+
+        try:
+            connection = self._create(key, timeout=timeout)
+        except Exception:
+            self._free(key)
+            raise
+
+        return connection, False
+
+    def release(self, key, connection, reuse=True):
+        if not reuse or not self.idle > 0:
+            connection.close()
+            self._free(key)
+            return
+
+        self.condition.acquire()
+        try:
+            idle = self.connections.setdefault(key, [])
+            idle.append((connection, time.time()))
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def discard(self, key, connection):
+        connection.close()
+        self._free(key, discard=True)
+
+    def clear(self, key=None):
+        self.condition.acquire()
+        try:
+            keys = [key] if key else list(self.connections.keys())
+            for key in keys:
+                idle = self.connections.pop(key, [])
+                for connection, _timestamp in idle:
+                    connection.close()
+                self.counts[key] = self.counts.get(key, 0) - len(idle)
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def close(self):
+        self.clear()
+
+    def stats(self):
+        self.condition.acquire()
+        try:
+            hosts = dict()
+            for key, count in self.counts.items():
+                idle = len(self.connections.get(key, []))
+                name = "%s://%s:%d" % key
+                hosts[name] = dict(idle=idle, active=count - idle)
+            stats = dict(self.metrics)
+            stats["hosts"] = hosts
+            return stats
+        finally:
+            self.condition.release()
+
+    def _create(self, key, timeout=None):
+        scheme, host, port = key
+        if scheme == "https":
+            return legacy.HTTPSConnection(host, port, timeout=timeout)
+        return legacy.HTTPConnection(host, port, timeout=timeout)
+
+    def _free(self, key, discard=False):
+        self.condition.acquire()
+        try:
+            self.counts[key] = self.counts.get(key, 0) - 1
+            if discard:
+                self.metrics["discards"] += 1
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def _evict(self, key):
+        # iterates over the idle connections from the oldest to the
+        # newest closing the ones that have expired, should be called
+        # with the lock already acquired
+        idle = self.connections.get(key, None)
+        if not idle:
+            return
+        limit = time.time() - self.idle
+        while idle and idle[0][1] < limit:
+            connection, _timestamp = idle.pop(0)
+            connection.close()
+            self.counts[key] -= 1
+            self.metrics["evictions"] += 1
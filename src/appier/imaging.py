@@ -0,0 +1,279 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+import os
+import hashlib
+import threading
+
+from . import config
+from . import structures
+
+try:
+    import concurrent.futures
+except ImportError:
+    concurrent = None
+
+WORKERS = 4
+""" The default number of worker threads to be used by the image
+pipeline for the processing (eg: resize, compress) of images """
+
+CACHE_SIZE = 64
+""" The default maximum number of derived images that are kept
+in the (in memory) cache of the image pipeline """
+
+CACHE_LIMIT = 1048576
+""" The default maximum size in bytes of a derived image for it
+to be kept in the cache of the image pipeline """
+
+_pipeline = None
+""" The global image pipeline shared by the complete set of image
+operations of the current process, lazily created on first use """
+
+_pipeline_pid = None
+""" The identifier of the process that created the global pipeline,
+used to re-create it after a fork (threads are not inherited) """
+
+_pipeline_lock = threading.Lock()
+""" The lock that controls the creation of the global pipeline """
+
+
+def digest(data):
+    """
+    Computes the digest (hexadecimal SHA-256) of the provided data
+    to be used as the source part of the keys of the pipeline.
+
+    :type data: String
+    :param data: The (image) data to compute the digest for.
+    :rtype: String
+    :return: The hexadecimal digest of the data.
+    """
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def submit(key, method, *args, **kwargs):
+    pipeline = get_pipeline()
+    return pipeline.submit(key, method, *args, **kwargs)
+
+
+def run(key, method, *args, **kwargs):
+    pipeline = get_pipeline()
+    return pipeline.run(key, method, *args, **kwargs)
+
+
+def get_pipeline():
+    global _pipeline, _pipeline_pid
+    pid = os.getpid()
+    if _pipeline and _pipeline_pid == pid:
+        return _pipeline
+    _pipeline_lock.acquire()
+    try:
+        if _pipeline and _pipeline_pid == pid:
+            return _pipeline
+        _pipeline = Pipeline()
+        _pipeline_pid = pid
+    finally:
+        _pipeline_lock.release()
+    return _pipeline
+
+
+def reset_pipeline():
+    global _pipeline, _pipeline_pid
+    _pipeline_lock.acquire()
+    try:
+        if _pipeline and _pipeline_pid == os.getpid():
+            _pipeline.close()
+        _pipeline = None
+        _pipeline_pid = None
+    finally:
+        _pipeline_lock.release()
+
+
+def pipeline_stats():
+    if not _pipeline:
+        return dict()
+    return _pipeline.stats()
+
+
+class Pipeline(object):
+    """
+    Processing pipeline for the derivation of images (eg: resized
+    variants, compressed versions) that runs the operations in a
+    bounded pool of worker threads and caches their results.
+
+    The results are keyed by a tuple that should contain the digest
+    of the source image and the parameters of the derivation (eg:
+    width, height, format) so that a derivative is generated only
+    once, concurrent requests for the same key share the same job.
+    """
+
+    def __init__(self, workers=None, cache_size=None, cache_limit=None):
+        self.workers = workers or config.conf("IMAGE_WORKERS", WORKERS, cast=int)
+        self.cache_size = cache_size or config.conf("IMAGE_CACHE", CACHE_SIZE, cast=int)
+        self.cache_limit = cache_limit or config.conf(
+            "IMAGE_CACHE_LIMIT", CACHE_LIMIT, cast=int
+        )
+        self.cache = structures.LimitedSizeDict(max_size=self.cache_size)
+        self.pending = dict()
+        self.executor = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.lock = threading.RLock()
+
+    def submit(self, key, method, *args, **kwargs):
+        """
+        Submits the derivation operation for the provided key to the
+        pool of workers, returning a future for its result.
+
+        In case the result is already cached or there's a job already
+        running for the key no new job is created.
+
+        :type key: Tuple
+        :param key: The (hashable) key that uniquely identifies the
+        result of the operation (eg: digest, width, height, format).
+        :type method: Function
+        :param method: The function that runs the derivation, called
+        with the remaining positional and keyword arguments.
+        :rtype: Future
+        :return: The future for the result of the operation.
+        """
+
+        self.lock.acquire()
+        try:
+            if self.cache_size and key in self.cache:
+                self.hits += 1
+                return self._done(self.cache[key])
+            future = self.pending.get(key, None)
+            if future:
+                self.coalesced += 1
+                return future
+            self.misses += 1
+            executor = self._executor()
+            if executor:
+                future = executor.submit(self._call, key, method, *args, **kwargs)
+                self.pending[key] = future
+        finally:
+            self.lock.release()
+
+        # in case there's no pool of workers available (no support for
+        # futures) runs the operation in the current thread (fallback)
+        if not future:
+            result = method(*args, **kwargs)
+            self._store(key, result)
+            return self._done(result)
+
+        return future
+
+    def run(self, key, method, *args, **kwargs):
+        future = self.submit(key, method, *args, **kwargs)
+        return future.result()
+
+    def clear(self):
+        self.lock.acquire()
+        try:
+            self.cache.clear()
+        finally:
+            self.lock.release()
+
+    def close(self):
+        self.clear()
+        if not self.executor:
+            return
+        self.executor.shutdown(wait=False)
+        self.executor = None
+
+    def stats(self):
+        return dict(
+            workers=self.workers,
+            cached=len(self.cache),
+            pending=len(self.pending),
+            hits=self.hits,
+            misses=self.misses,
+            coalesced=self.coalesced,
+        )
+
+    def _executor(self):
+        if self.executor:
+            return self.executor
+        if not concurrent or self.workers <= 1:
+            return None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def _store(self, key, result):
+        if not self.cache_size:
+            return
+        size = len(result) if hasattr(result, "__len__") else 0
+        if size > self.cache_limit:
+            return
+        self.lock.acquire()
+        try:
+            self.cache[key] = result
+        finally:
+            self.lock.release()
+
+    def _done(self, result):
+        if concurrent:
+            future = concurrent.futures.Future()
+            future.set_result(result)
+            return future
+        return _Result(result)
+
+    def _call(self, key, method, *args, **kwargs):
+        # runs the operation (in the worker thread) storing the result
+        # in the cache before removing the job from the pending map so
+        # that no request for the key is missed in between
+        try:
+            result = method(*args, **kwargs)
+            self._store(key, result)
+        finally:
+            self.lock.acquire()
+            try:
+                self.pending.pop(key, None)
+            finally:
+                self.lock.release()
+        return result
+
+
+class _Result(object):
+    """
+    Minimal (already completed) future like object used when there's
+    no support for the futures module (eg: Python 2 without backport).
+    """
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self, timeout=None):
+        return self._result
+
+    def done(self):
+        return True
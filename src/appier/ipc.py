@@ -0,0 +1,203 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+import os
+import errno
+import logging
+import threading
+
+import multiprocessing.connection
+
+from . import exceptions
+
+INSTANCES = dict()
+""" The map that associates each local server class with its
+running instance, this map is inherited by forked processes
+that then act as clients of the instances of the parent """
+
+INSTANCES_LOCK = threading.RLock()
+""" The lock that controls the (lazy) creation of the instances,
+avoiding the creation of multiple servers by concurrent threads """
+
+
+class LocalServer(threading.Thread):
+    """
+    Base server thread for the services that are shared by the
+    complete local process tree (eg: the local bus broker and the
+    multiprocess queues), hosted by the process that creates it.
+
+    The server listens on a local socket authenticated with a
+    random key and handles each of the accepted connections in
+    a dedicated thread (running the handle method).
+    """
+
+    CLOSED_ERRORS = (None, errno.EBADF, errno.EINVAL, errno.ENOTSOCK)
+    """ The error codes of the accept operation that indicate that
+    the listener has been closed (or is broken), stopping the server """
+
+    HANDLER_NAME = "LocalHandler"
+    """ The name of the threads that handle the connections
+    accepted by the server """
+
+    def __init__(self, name="LocalServer"):
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+        self.pid = os.getpid()
+        self.authkey = os.urandom(32)
+        self.listener = multiprocessing.connection.Listener(authkey=self.authkey)
+        self.address = self.listener.address
+        self._running = False
+
+    @classmethod
+    def get_server(cls):
+        """
+        Retrieves the (single) running instance of the server class,
+        creating and starting it in case it does not exist yet.
+
+        Processes forked after the creation of the server inherit
+        the instance and should use it as clients (connecting to it).
+
+        :rtype: LocalServer
+        :return: The running instance of the server class.
+        """
+
+        server = INSTANCES.get(cls, None)
+        if server:
+            return server
+        INSTANCES_LOCK.acquire()
+        try:
+            server = INSTANCES.get(cls, None)
+            if server:
+                return server
+            server = cls()
+            server.start()
+            INSTANCES[cls] = server
+        finally:
+            INSTANCES_LOCK.release()
+        return server
+
+    def run(self):
+        self._running = True
+        try:
+            while self._running:
+                try:
+                    connection = self.listener.accept()
+                except (EOFError, multiprocessing.AuthenticationError):
+                    continue
+                except (IOError, OSError) as exception:
+                    if not self._running:
+                        break
+                    if exception.errno in self.__class__.CLOSED_ERRORS:
+                        break
+                    self.logger.warning(
+                        "Error accepting connection in %s: %s" % (self.name, exception)
+                    )
+                    continue
+
+                # in case the server has been stopped in the meantime the
+                # connection is the one used to wake it up, ignores it
+                if not self._running:
+                    connection.close()
+                    break
+
+                self.on_connection(connection)
+                thread = threading.Thread(
+                    target=self.handle,
+                    args=(connection,),
+                    name=self.__class__.HANDLER_NAME,
+                )
+                thread.daemon = True
+                thread.start()
+        finally:
+            self._running = False
+            self._close()
+
+    def stop(self, timeout=None):
+        """
+        Stops the server (only in the owner process), closing the
+        listener and removing its socket file, so that the instance
+        is re-created on the next retrieval of the server.
+
+        :type timeout: float
+        :param timeout: The maximum time (in seconds) to wait for the
+        server thread to finish, waits indefinitely if not provided.
+        """
+
+        if not self.is_owner:
+            return
+
+        # unsets the running flag and wakes up the (blocked) accept
+        # operation with a connection, so that the thread finishes
+        if self._running and self.is_alive():
+            self._running = False
+            try:
+                self.connect().close()
+            except Exception:
+                pass
+            self.join(timeout)
+
+        self._close()
+
+        INSTANCES_LOCK.acquire()
+        try:
+            if INSTANCES.get(self.__class__, None) is self:
+                del INSTANCES[self.__class__]
+        finally:
+            INSTANCES_LOCK.release()
+
+    def connect(self):
+        return multiprocessing.connection.Client(self.address, authkey=self.authkey)
+
+    def handle(self, connection):
+        raise exceptions.NotImplementedError()
+
+    def on_connection(self, connection):
+        pass
+
+    @property
+    def is_owner(self):
+        return self.pid == os.getpid()
+
+    @property
+    def logger(self):
+        return logging.getLogger()
+
+    def _close(self):
+        # closes the listener (an idempotent operation) and makes sure
+        # that the (unix) socket file is removed from the file system
+        self.listener.close()
+        if not isinstance(self.address, str):
+            return
+        if not os.path.exists(self.address):
+            return
+        try:
+            os.remove(self.address)
+        except OSError:
+            pass
@@ -0,0 +1,28 @@
+from logging import Logger
+from threading import RLock, Thread
+from multiprocessing.connection import Connection, Listener
+from typing import Any, Self
+
+INSTANCES: dict[type[LocalServer], LocalServer]
+INSTANCES_LOCK: RLock
+
+class LocalServer(Thread):
+    CLOSED_ERRORS: tuple[int | None, ...]
+    HANDLER_NAME: str
+    pid: int
+    authkey: bytes
+    listener: Listener
+    address: Any
+    def __init__(self, name: str = ...): ...
+    @classmethod
+    def get_server(cls) -> Self: ...
+    def run(self) -> None: ...
+    def stop(self, timeout: float | None = ...) -> None: ...
+    def connect(self) -> Connection: ...
+    def handle(self, connection: Connection) -> None: ...
+    def on_connection(self, connection: Connection) -> None: ...
+    @property
+    def is_owner(self) -> bool: ...
+    @property
+    def logger(self) -> Logger: ...
+    def _close(self) -> None: ...
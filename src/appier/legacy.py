@@ -30,6 +30,7 @@ __license__ = "Apache License, Version 2.0"
 
 import os
 import sys
+import time
 import inspect
 import calendar
 import datetime
@@ -257,6 +258,16 @@ if PYTHON_3:
 else:
     HTTPSConnection = httplib.HTTPSConnection
 
+if PYTHON_3:
+    HTTPException = http.client.HTTPException  # @UndefinedVariable
+else:
+    HTTPException = httplib.HTTPException
+
+if PYTHON_3:
+    BadStatusLine = http.client.BadStatusLine  # @UndefinedVariable
+else:
+    BadStatusLine = httplib.BadStatusLine
+
 try:
     _execfile = execfile  # @UndefinedVariable
 except Exception:
@@ -277,6 +288,11 @@ try:
 except Exception:
     _unichr = None
 
+try:
+    perf_counter = time.perf_counter
+except AttributeError:
+    perf_counter = time.time
+
 
 def with_meta(meta, *bases):
     return meta("Class", bases, {})
@@ -579,6 +595,10 @@ def urlunparse(*args, **kwargs):
     return _urlparse.urlunparse(*args, **kwargs)
 
 
+def urljoin(*args, **kwargs):
+    return _urlparse.urljoin(*args, **kwargs)
+
+
 def parse_qs(*args, **kwargs):
     return _urlparse.parse_qs(*args, **kwargs)
 
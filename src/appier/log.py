@@ -28,7 +28,9 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import os
 import sys
+import copy
 import json
 import socket
 import inspect
@@ -41,6 +43,11 @@ from . import common
 from . import config
 from . import legacy
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 LOGGING_FORMAT_T = "%%(asctime)s [%%(levelname)s] %s%%(message)s"
 """ The format to be used for the logging operation in
 the app, these operations are going to be handled by
@@ -78,6 +85,21 @@ memory until they are discarded, avoid a very large
 number for this value or else a large amount of memory
 may be used for logging purposes """
 
+MAX_SIZE = 16777216
+""" The maximum size (in bytes, UTF-8 encoded) of the messages
+that are kept in memory, after this budget is exceeded the oldest
+messages are discarded (even below the maximum length) """
+
+QUEUE_SIZE = 10000
+""" The default maximum number of records that may be pending
+in the asynchronous logging queue, after this limit is reached
+the overload policy of the handler is applied """
+
+QUEUE_POLICIES = ("block", "drop")
+""" The sequence of valid policies for the asynchronous
+logging queue when it overflows, either blocking the
+caller until there's space or dropping the record """
+
 SILENT = logging.CRITICAL + 1
 """ The "artificial" silent level used to silent a logger
 or an handler, this is used as an utility for debugging
@@ -113,6 +135,14 @@ LOGGERS = {}
 """ Dictionary of loggers that have already been initialized,
 used to ensure singleton-based initialization of named loggers """
 
+HOSTNAME = None
+""" The cached hostname of the current machine, to be used in
+the log records, avoids one system call per log record """
+
+HOSTNAME_PID = None
+""" The identifier of the process for which the hostname has
+been cached, a different one (fork) forces its refresh """
+
 LOGGING_FORMAT = LOGGING_FORMAT_T % LOGGING_EXTRA
 LOGGING_FORMAT_TID = LOGGING_FORMAT_TID_T % LOGGING_EXTRA
 LOGGING_FORMAT_TRACE = LOGGING_FORMAT_TRACE_T % LOGGING_EXTRA
@@ -124,13 +154,21 @@ class MemoryHandler(logging.Handler):
     Logging handler that is used to store information in
     memory so that anyone else may consult it latter as
     long as the execution session is the same.
+
+    The messages are stored only once in a ring buffer (bounded
+    both by number of entries and by size) with per-level index
+    rings referencing the same entries.
     """
 
-    def __init__(self, level=logging.NOTSET, max_length=MAX_LENGTH):
+    def __init__(self, level=logging.NOTSET, max_length=MAX_LENGTH, max_size=None):
         logging.Handler.__init__(self, level=level)
         self.max_length = max_length
-        self.messages = collections.deque()
-        self.messages_l = dict()
+        self.max_size = (
+            config.conf("MEMORY_LOG_SIZE", MAX_SIZE, cast=int)
+            if max_size == None
+            else max_size
+        )
+        self.clear()
 
         format = config.conf("LOGGING_FORMAT", None)
         format_base = format or LOGGING_FORMAT
@@ -140,36 +178,37 @@ class MemoryHandler(logging.Handler):
         formatter.set_tid(format_tid)
         self.setFormatter(formatter)
 
-    def get_messages_l(self, level):
-        # in case the level is not found in the list of levels
-        # it's not considered valid and so an empty list is returned
+    @property
+    def messages(self):
+        # builds a read only snapshot of the complete set of stored
+        # messages (newest first) from the entries in the ring buffer
+        self.acquire()
         try:
-            index = LEVELS.index(level)
-        except Exception:
-            return collections.deque()
-
-        # retrieves the complete set of levels that are considered
-        # equal or more severe than the requested one
-        levels = LEVELS[: index + 1]
-
-        # creates the list that will hold the various message
-        # lists associated with the current severity level
-        messages_l = collections.deque()
-
-        # iterates over the complete set of levels considered
-        # equal or less sever to add the respective messages
-        # list to the list of message lists
-        for level in levels:
-            _messages_l = self.messages_l.get(level, None)
-            if _messages_l == None:
-                _messages_l = collections.deque()
-            self.messages_l[level] = _messages_l
-            messages_l.append(_messages_l)
-
-        # returns the complete set of messages lists that
-        # have a level equal or less severe that the one
-        # that has been requested by argument
-        return messages_l
+            return collections.deque(message for _level, message, _size in self.entries)
+        finally:
+            self.release()
+
+    @property
+    def messages_l(self):
+        # builds a read only snapshot of the messages (newest first) of
+        # each of the levels, taken from their index rings
+        self.acquire()
+        try:
+            return dict(
+                (
+                    level,
+                    collections.deque(message for _level, message, _size in entries),
+                )
+                for level, entries in self.entries_l.items()
+            )
+        finally:
+            self.release()
+
+    def get_rings(self, level):
+        # returns the complete set of index rings that are going to
+        # reference records of the provided level, meaning the rings
+        # of the levels equal or less severe than the record one
+        return self._rings.get(level, ())
 
     def emit(self, record):
         # formats the current record according to the defined
@@ -177,34 +216,36 @@ class MemoryHandler(logging.Handler):
         # for any logging purposes
         message = self.format(record)
 
-        # retrieves the level (as a string) associated with
-        # the current record to emit and uses it to retrieve
-        # the associated messages list
+        # creates the entry (level, message and its encoded size) that is
+        # going to be stored (only once) in the ring buffer and referenced
+        # by the index rings of the levels equal or less severe than it
         level = record.levelname
-        messages_l = self.get_messages_l(level)
-
-        # inserts the message into the messages queue and in
-        # case the current length of the message queue overflows
-        # the one defined as maximum must pop message from queue
-        self.messages.appendleft(message)
-        messages_s = len(self.messages)
-        if messages_s > self.max_length:
-            self.messages.pop()
-
-        # iterates over all the messages list included in the retrieve
-        # messages list to add the logging message to each of them
-        for _messages_l in messages_l:
-            # inserts the message into the proper level specific queue
-            # and in case it overflows runs the same pop operation as
-            # specified also for the more general queue
-            _messages_l.appendleft(message)
-            messages_s = len(_messages_l)
-            if messages_s > self.max_length:
-                _messages_l.pop()
+        size = len(legacy.bytes(message, "utf-8", force=True))
+        entry = (level, message, size)
+        self.entries.appendleft(entry)
+        for ring in self.get_rings(level):
+            ring.appendleft(entry)
+        self.size += size
+
+        # evicts the oldest entries while the ring buffer is above its
+        # limits, notice that the newest entry is always kept
+        while len(self.entries) > self.max_length or (
+            self.size > self.max_size and len(self.entries) > 1
+        ):
+            self._evict()
 
     def clear(self):
-        self.messages = collections.deque()
-        self.messages_l = dict()
+        self.acquire()
+        try:
+            self.size = 0
+            self.entries = collections.deque()
+            self.entries_l = dict((level, collections.deque()) for level in LEVELS)
+            self._rings = dict(
+                (level, tuple(self.entries_l[_level] for _level in LEVELS[: index + 1]))
+                for index, level in enumerate(LEVELS)
+            )
+        finally:
+            self.release()
 
     def get_latest(self, count=None, level=None):
         count = count or 100
@@ -213,20 +254,22 @@ class MemoryHandler(logging.Handler):
             level = logging.getLevelName(level)
         level = level.upper() if level else level
         level = LEVEL_ALIAS.get(level, level)
-        messages = self.messages_l.get(level, []) if level else self.messages
-        slice = itertools.islice(messages, 0, count)
-        return list(slice)
+        self.acquire()
+        try:
+            entries = self.entries_l.get(level, ()) if level else self.entries
+            slice = itertools.islice(entries, 0, count)
+            return [message for _level, message, _size in slice]
+        finally:
+            self.release()
 
     def flush_to_file(self, path, count=None, level=None, reverse=True, clear=True):
         messages = self.get_latest(level=level, count=count or 65536)
         if not messages:
             return
-        if reverse:
-            messages.reverse()
         is_path = isinstance(path, legacy.STRINGS)
         file = open(path, "wb") if is_path else path
         try:
-            for message in messages:
+            for message in reversed(messages) if reverse else messages:
                 message = legacy.bytes(message, "utf-8", force=True)
                 file.write(message + b"\n")
         finally:
@@ -235,6 +278,195 @@ class MemoryHandler(logging.Handler):
         if clear:
             self.clear()
 
+    def _evict(self):
+        # removes the oldest entry from the ring buffer and from the
+        # index rings that reference it (it must be their oldest too)
+        entry = self.entries.pop()
+        level, _message, size = entry
+        for ring in self.get_rings(level):
+            if ring and ring[-1] is entry:
+                ring.pop()
+        self.size -= size
+
+
+class QueueHandler(logging.Handler):
+    """
+    Asynchronous logging handler that pushes the records into
+    a bounded in-memory queue, so that the (possibly slow) real
+    handlers are only called from a dedicated listener thread.
+
+    Under overload the records are either dropped (and counted)
+    or the caller is blocked until there's space in the queue,
+    according to the currently defined policy.
+    """
+
+    def __init__(self, handlers, level=logging.NOTSET, max_size=None, policy=None):
+        logging.Handler.__init__(self, level=level)
+        self.handlers = handlers
+        self.max_size = (
+            config.conf("LOGGING_QUEUE_SIZE", QUEUE_SIZE, cast=int)
+            if max_size == None
+            else max_size
+        )
+        self.policy = policy or config.conf("LOGGING_QUEUE_POLICY", "block")
+        self.dropped = 0
+        self.dropped_l = dict()
+        self.listener = None
+        self._formatter = logging.Formatter()
+        self._pid = os.getpid()
+        self.queue = queue.Queue(self.max_size)
+        if not self.policy in QUEUE_POLICIES:
+            raise ValueError("Invalid queue policy '%s'" % self.policy)
+
+    def start(self):
+        if self.is_running():
+            return
+        self.listener = QueueListener(self)
+        self.listener.start()
+
+    def stop(self):
+        # in case the listener is not running there's nothing
+        # remaining to be stopped, returns immediately
+        if not self.is_running():
+            return
+
+        # sends the sentinel value to the listener thread so that
+        # it stops after the pending records and then waits for it
+        self.queue.put(None)
+        self.listener.join()
+        self.listener = None
+
+        # dispatches any record that may have been added in the
+        # meantime so that no information is lost on stop
+        self.drain()
+
+    def close(self):
+        self.stop()
+        logging.Handler.close(self)
+
+    def flush(self):
+        # waits until the complete set of pending records has been
+        # handled by the listener (or handles them in the current
+        # thread in case there's no listener running)
+        if self.is_running() and not self.is_listener():
+            self.queue.join()
+        else:
+            self.drain()
+
+        # flushes the complete set of underlying handlers so that
+        # their own buffers are also written to the target
+        for handler in self.handlers:
+            handler.flush()
+
+    def emit(self, record):
+        try:
+            # in case the current process is not the one that created
+            # the queue (forked) the state is re-created as the listener
+            # thread is not carried to the child process
+            if not self._pid == os.getpid():
+                self._reset()
+
+            # in case there's no listener running or the record has been
+            # created by the listener itself (eg: handler logging) the
+            # record is dispatched directly, avoiding possible deadlocks
+            if not self.is_running() or self.is_listener():
+                self.dispatch(record)
+                return
+
+            # prepares the record for the cross thread usage and then
+            # adds it to the queue according to the overload policy
+            record = self.prepare(record)
+            if self.policy == "drop":
+                self.queue.put_nowait(record)
+            else:
+                self.queue.put(record)
+        except queue.Full:
+            level = record.levelname
+            self.dropped += 1
+            self.dropped_l[level] = self.dropped_l.get(level, 0) + 1
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record):
+        # creates a copy of the record so that other handlers are not
+        # affected and then "freezes" the message and the exception
+        # information, as their (mutable) sources may change meanwhile
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def dispatch(self, record):
+        for handler in self.handlers:
+            if record.levelno < handler.level:
+                continue
+            handler.handle(record)
+
+    def drain(self):
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if not record == None:
+                    self.dispatch(record)
+            finally:
+                self.queue.task_done()
+
+    def is_running(self):
+        return True if self.listener and self.listener.is_alive() else False
+
+    def is_listener(self):
+        return threading.current_thread() == self.listener
+
+    def get_stats(self):
+        return dict(
+            pending=self.queue.qsize(),
+            dropped=self.dropped,
+            dropped_l=dict(self.dropped_l),
+            policy=self.policy,
+            max_size=self.max_size,
+        )
+
+    def _reset(self):
+        running = True if self.listener else False
+        self._pid = os.getpid()
+        self.queue = queue.Queue(self.max_size)
+        self.listener = None
+        if running:
+            self.start()
+
+
+class QueueListener(threading.Thread):
+    """
+    Thread that consumes the records pending in the queue of
+    an asynchronous logging handler and fans them out to the
+    real handlers, until the sentinel value is received.
+    """
+
+    def __init__(self, handler):
+        threading.Thread.__init__(self, name="QueueListener")
+        self.handler = handler
+        self.queue = handler.queue
+        self.daemon = True
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record == None:
+                    break
+                self.handler.dispatch(record)
+            except Exception:
+                self.handler.handleError(record)
+            finally:
+                self.queue.task_done()
+
 
 class BaseFormatter(logging.Formatter):
     """
@@ -251,24 +483,12 @@ class BaseFormatter(logging.Formatter):
 
     @classmethod
     def _wrap_record(cls, record):
-        if hasattr(record, "_wrapped"):
-            return
-        record.hostname = socket.gethostname()
-        record.json = json.dumps(
-            dict(
-                message=str(record.msg),
-                hostname=record.hostname,
-                lineno=record.lineno,
-                module=record.module,
-                callable=record.funcName,
-                level=record.levelname,
-                thread=record.thread,
-                process=record.process,
-                logger=record.name,
-                meta=getattr(record, "meta", None),
-            )
-        )
-        record._wrapped = True
+        # adds the extra fields to the record, notice that the hostname
+        # is cached and that the JSON value is only rendered when used
+        if not hasattr(record, "hostname"):
+            record.hostname = get_hostname()
+        if not hasattr(record, "json"):
+            record.json = RecordJSON(record)
 
     def format(self, record):
         # runs the wrapping operation on the record so that more
@@ -294,19 +514,19 @@ class ThreadFormatter(BaseFormatter):
         self._tidfmt = BaseFormatter(*args, **kwargs)
 
     def format(self, record):
+        # verifies if the record has been created in the current process
+        # main thread (the record is used instead of the current thread as
+        # formatting may occur in a listener thread) and then selects the
+        # appropriate formatter taking that into account
+        is_main = record.threadName == "MainThread"
+        formatter = self._basefmt if is_main else self._tidfmt
+
         # runs the wrapping operation on the record so that more
         # information becomes available in it (as expected)
         if self._wrap:
             self.__class__._wrap_record(record)
 
-        # retrieves the reference to the current thread and verifies
-        # if it represent the current process main thread, then selects
-        # the appropriate formating string taking that into account
-        current = threading.current_thread()
-        is_main = current.name == "MainThread"
-        if not is_main:
-            return self._tidfmt.format(record)
-        return self._basefmt.format(record)
+        return formatter.format(record)
 
     def set_base(self, value, *args, **kwargs):
         self._basefmt = BaseFormatter(value, *args, **kwargs)
@@ -315,6 +535,83 @@ class ThreadFormatter(BaseFormatter):
         self._tidfmt = BaseFormatter(value, *args, **kwargs)
 
 
+class RecordJSON(object):
+    """
+    Deferred JSON representation of a log record, the (costly)
+    serialization only takes place when the value is converted
+    into a string (eg: by a format string that uses it).
+
+    The object behaves as the string value, so that handlers and
+    filters reading the value are able to use it as such.
+    """
+
+    def __init__(self, record):
+        self.record = record
+        self._value = None
+
+    def __str__(self):
+        if self._value == None:
+            self._value = self.render()
+        return self._value
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __unicode__(self):
+        return legacy.u(self.__str__())
+
+    def __eq__(self, other):
+        return self.__str__() == other
+
+    def __ne__(self, other):
+        return not self.__str__() == other
+
+    def __hash__(self):
+        return hash(self.__str__())
+
+    def __len__(self):
+        return len(self.__str__())
+
+    def __iter__(self):
+        return iter(self.__str__())
+
+    def __contains__(self, value):
+        return value in self.__str__()
+
+    def __getitem__(self, key):
+        return self.__str__()[key]
+
+    def __add__(self, other):
+        return self.__str__() + other
+
+    def __radd__(self, other):
+        return other + self.__str__()
+
+    def __getattr__(self, name):
+        # delegates the access to the (string) methods to the rendered
+        # value, the private names are not delegated to avoid recursion
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.__str__(), name)
+
+    def render(self):
+        record = self.record
+        return json.dumps(
+            dict(
+                message=str(record.msg),
+                hostname=getattr(record, "hostname", None) or get_hostname(),
+                lineno=record.lineno,
+                module=record.module,
+                callable=record.funcName,
+                level=record.levelname,
+                thread=record.thread,
+                process=record.process,
+                logger=record.name,
+                meta=getattr(record, "meta", None),
+            )
+        )
+
+
 class DummyLogger(object):
     def trace(self, object):
         pass
@@ -353,6 +650,19 @@ def reload_format(app=None):
     LOGGING_FORMAT_TRACE_TID = LOGGING_FORMAT_TRACE_TID_T % extra
 
 
+def get_hostname():
+    global HOSTNAME
+    global HOSTNAME_PID
+
+    pid = os.getpid()
+    if HOSTNAME and HOSTNAME_PID == pid:
+        return HOSTNAME
+
+    HOSTNAME = socket.gethostname()
+    HOSTNAME_PID = pid
+    return HOSTNAME
+
+
 def rotating_handler(
     path="appier.log", max_bytes=1048576, max_log=5, encoding=None, delay=False
 ):
@@ -0,0 +1,720 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+import sys
+import math
+import time
+import random
+import threading
+import collections
+
+SUB_BITS = 7
+""" The number of significant bits kept for each of the values
+recorded in the histogram, this controls the precision of the
+buckets (relative error bellow 1 / 2 ** (SUB_BITS - 1)) """
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+""" The sequence of percentiles that are exported by default
+in the dictionary representation of an histogram """
+
+NESTED = dict(template=["action"], data=["before", "action", "template", "after"])
+""" The phases of the request handling that run inside other
+phases (and so are also accounted in them), the phase times
+should not be summed as they are not disjoint """
+
+UNMATCHED = "unmatched"
+""" The name of the (pseudo) route under which the requests
+that have not been matched against any route are recorded """
+
+SLOW_THRESHOLD = 0.1
+""" The default duration (in seconds) above which a query is
+considered to be slow and is logged and kept for inspection """
+
+REPEAT_THRESHOLD = 10
+""" The default number of queries with the same shape (same
+collection, operation and filter structure) in one request
+from which a N+1 query pattern is considered to exist """
+
+SLOW_SIZE = 100
+""" The maximum number of slow queries that are kept in memory
+for inspection, older entries are discarded first """
+
+INTERVAL = 0.005
+""" The default interval (in seconds) between each of the stack
+samples taken by the sampling profiler for a profiled request """
+
+MAX_STACKS = 10000
+""" The maximum number of distinct (collapsed) stacks that are kept
+in memory, samples of new stacks above this limit are dropped """
+
+MAX_DEPTH = 256
+""" The maximum number of frames of a stack that are considered, the
+frames closer to the root of the stack are discarded first """
+
+
+class Histogram(object):
+    """
+    Sparse log-linear histogram inspired by the HDR histogram,
+    values are grouped in buckets that keep a fixed number of
+    significant bits so that the relative error is bounded
+    independently of the magnitude of the recorded value.
+
+    Values are expected to be non negative integers (eg: the
+    number of microseconds of a certain operation) and only
+    the buckets that are effectively used are stored.
+    """
+
+    def __init__(self, sub_bits=SUB_BITS):
+        self.sub_bits = sub_bits
+        self.reset()
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        self.buckets = dict()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value, count=1):
+        value = int(value) if value > 0 else 0
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        if self.min == None or value < self.min:
+            self.min = value
+        if self.max == None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min != None and (self.min == None or other.min < self.min):
+            self.min = other.min
+        if other.max != None and (self.max == None or other.max > self.max):
+            self.max = other.max
+
+    def mean(self):
+        if not self.count:
+            return None
+        return float(self.total) / float(self.count)
+
+    def percentile(self, percentile):
+        """
+        Retrieves the value at the provided percentile, the value
+        is the highest one that is equivalent (same bucket) to the
+        one at the percentile, bounded by the maximum value.
+
+        :type percentile: float
+        :param percentile: The percentile (from 0 to 100) for which
+        the equivalent value is going to be retrieved.
+        :rtype: int
+        :return: The (highest equivalent) value at the percentile or
+        an invalid value in case there are no recorded values.
+        """
+
+        if not self.count:
+            return None
+        target = int(math.ceil(self.count * percentile / 100.0))
+        target = max(target, 1)
+        current = 0
+        for index in sorted(self.buckets):
+            current += self.buckets[index]
+            if current >= target:
+                return min(max(self._upper(index), self.min), self.max)
+        return self.max
+
+    def to_dict(self, scale=1.0, percentiles=PERCENTILES):
+        convert = lambda value: None if value == None else value / scale
+        result = dict(
+            count=self.count,
+            min=convert(self.min),
+            max=convert(self.max),
+            mean=convert(self.mean()),
+        )
+        for percentile in percentiles:
+            name = "p" + ("%g" % percentile).replace(".", "")
+            result[name] = convert(self.percentile(percentile))
+        return result
+
+    def _index(self, value):
+        # determines the number of bits that have to be discarded from
+        # the value so that only the significant ones remain, notice that
+        # the frexp based approach is used for compatibility with older
+        # Python versions (no bit length method available)
+        shift = math.frexp(value)[1] - self.sub_bits
+        if shift <= 0:
+            return value
+        return (shift << self.sub_bits) | (value >> shift)
+
+    def _upper(self, index):
+        shift = index >> self.sub_bits
+        mantissa = index & ((1 << self.sub_bits) - 1)
+        return ((mantissa + 1) << shift) - 1 if shift else mantissa
+
+
+class RouteMetrics(object):
+    """
+    The set of counters and histograms associated with a single
+    route, including the total latency and the time spent in
+    each of the (named) phases of the request handling.
+
+    Some of the phases are nested inside others (see `NESTED`),
+    eg: the template rendering is also part of the action time.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.codes = dict()
+        self.latency = Histogram()
+        self.phases = dict()
+
+    def record(self, duration, code=200, timings=None):
+        self.count += 1
+        if code >= 500:
+            self.errors += 1
+        code_s = "%dxx" % (code // 100)
+        self.codes[code_s] = self.codes.get(code_s, 0) + 1
+        self.latency.record(duration * 1000000.0)
+        if not timings:
+            return
+        for name, value in timings.items():
+            histogram = self.phases.get(name, None)
+            if histogram == None:
+                histogram = Histogram()
+                self.phases[name] = histogram
+            histogram.record(value * 1000000.0)
+
+    def to_dict(self):
+        return dict(
+            count=self.count,
+            errors=self.errors,
+            codes=dict(self.codes),
+            latency=self.latency.to_dict(scale=1000.0),
+            phases=dict(
+                (name, histogram.to_dict(scale=1000.0))
+                for name, histogram in self.phases.items()
+            ),
+        )
+
+
+class Metrics(object):
+    """
+    Registry of the per route metrics of an application, meant
+    to be cheap enough to be kept enabled in production.
+
+    Latency values are recorded in microseconds and exported
+    in milliseconds in the dictionary representation.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.lock.acquire()
+        try:
+            self.stime = time.time()
+            self.total = RouteMetrics("*")
+            self.routes = dict()
+        finally:
+            self.lock.release()
+
+    def record(self, name, duration, code=200, timings=None):
+        name = name or UNMATCHED
+        self.lock.acquire()
+        try:
+            route = self.routes.get(name, None)
+            if route == None:
+                route = RouteMetrics(name)
+                self.routes[name] = route
+            route.record(duration, code=code, timings=timings)
+            self.total.record(duration, code=code, timings=timings)
+        finally:
+            self.lock.release()
+
+    def get(self, name):
+        return self.routes.get(name or UNMATCHED, None)
+
+    def to_dict(self):
+        self.lock.acquire()
+        try:
+            return dict(
+                uptime=time.time() - self.stime,
+                nested=NESTED,
+                total=self.total.to_dict(),
+                routes=dict(
+                    (name, route.to_dict()) for name, route in self.routes.items()
+                ),
+            )
+        finally:
+            self.lock.release()
+
+
+class CollectionMetrics(object):
+    """
+    The set of counters and histograms associated with the
+    queries of a single data collection (model).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.slow = 0
+        self.documents = 0
+        self.latency = Histogram()
+        self.operations = dict()
+
+    def record(self, operation, duration, size=None, slow=False):
+        self.count += 1
+        if slow:
+            self.slow += 1
+        if size:
+            self.documents += size
+        self.latency.record(duration * 1000000.0)
+        histogram = self.operations.get(operation, None)
+        if histogram == None:
+            histogram = Histogram()
+            self.operations[operation] = histogram
+        histogram.record(duration * 1000000.0)
+
+    def to_dict(self):
+        return dict(
+            count=self.count,
+            slow=self.slow,
+            documents=self.documents,
+            latency=self.latency.to_dict(scale=1000.0),
+            operations=dict(
+                (name, histogram.to_dict(scale=1000.0))
+                for name, histogram in self.operations.items()
+            ),
+        )
+
+
+class QueryProfiler(object):
+    """
+    Profiler for the queries executed against the data collections,
+    aggregating their duration per collection and per route, keeping
+    the most recent slow queries and detecting N+1 query patterns
+    (many queries with the same shape in a single request).
+
+    The shape of a query is its filter with every value replaced by
+    a placeholder, so that queries differing only on values match.
+    """
+
+    def __init__(
+        self,
+        threshold=SLOW_THRESHOLD,
+        repeat=REPEAT_THRESHOLD,
+        slow_size=SLOW_SIZE,
+        logger=None,
+    ):
+        self.threshold = threshold
+        self.repeat = repeat
+        self.slow_size = slow_size
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.lock.acquire()
+        try:
+            self.stime = time.time()
+            self.collections = dict()
+            self.routes = dict()
+            self.repeated = dict()
+            self.slow = collections.deque(maxlen=self.slow_size)
+        finally:
+            self.lock.release()
+
+    def record(self, collection, operation, filter, result, duration, queries=None):
+        """
+        Records a query executed against the provided collection,
+        the shape of the filter is only computed when required.
+
+        :type collection: String
+        :param collection: The name of the collection (model) that
+        has been the target of the query.
+        :type operation: String
+        :param operation: The name of the operation (eg: find).
+        :type filter: Dictionary
+        :param filter: The filter (or document) used in the query.
+        :type result: Object
+        :param result: The result of the query, used to determine
+        the number of documents that have been returned.
+        :type duration: float
+        :param duration: The duration of the query in seconds.
+        :type queries: List
+        :param queries: The list of queries of the current request
+        to which the query is going to be added, if any.
+        """
+
+        is_slow = duration >= self.threshold
+        size_i = _size(result)
+        shape_s = shape(filter) if is_slow or not queries == None else None
+        if not queries == None:
+            queries.append((collection, operation, shape_s, duration, size_i))
+
+        self.lock.acquire()
+        try:
+            metrics = self.collections.get(collection, None)
+            if metrics == None:
+                metrics = CollectionMetrics(collection)
+                self.collections[collection] = metrics
+            metrics.record(operation, duration, size=size_i, slow=is_slow)
+            if is_slow:
+                self.slow.append(
+                    dict(
+                        timestamp=time.time(),
+                        collection=collection,
+                        operation=operation,
+                        shape=shape_s,
+                        duration=duration * 1000.0,
+                        size=size_i,
+                    )
+                )
+        finally:
+            self.lock.release()
+
+        if is_slow and self.logger:
+            self.logger.warning(
+                "Slow query %s.%s %s took %.2fms"
+                % (collection, operation, shape_s, duration * 1000.0)
+            )
+
+    def record_request(self, route, queries):
+        route = route or UNMATCHED
+
+        # groups the queries of the request by their shape, accumulating
+        # the total time spent in queries by the request at the same time
+        counts = dict()
+        total = 0.0
+        for collection, operation, shape_s, duration, _count in queries:
+            key = (collection, operation, shape_s)
+            counts[key] = counts.get(key, 0) + 1
+            total += duration
+
+        # filters the shapes that have been repeated more times than the
+        # threshold, these are the ones considered to be N+1 patterns
+        repeated = [
+            (key, count) for key, count in counts.items() if count >= self.repeat
+        ]
+
+        self.lock.acquire()
+        try:
+            stats = self.routes.get(route, None)
+            if stats == None:
+                stats = dict(requests=0, queries=Histogram(), duration=Histogram())
+                self.routes[route] = stats
+            stats["requests"] += 1
+            stats["queries"].record(len(queries))
+            stats["duration"].record(total * 1000000.0)
+            for key, count in repeated:
+                entry = self.repeated.get((route,) + key, None)
+                if entry == None:
+                    entry = dict(requests=0, max=0)
+                    self.repeated[(route,) + key] = entry
+                entry["requests"] += 1
+                entry["max"] = max(entry["max"], count)
+        finally:
+            self.lock.release()
+
+        if not self.logger:
+            return
+        for (collection, operation, shape_s), count in repeated:
+            self.logger.warning(
+                "Possible N+1 queries in %s, %d x %s.%s %s"
+                % (route, count, collection, operation, shape_s)
+            )
+
+    def to_dict(self):
+        self.lock.acquire()
+        try:
+            return dict(
+                uptime=time.time() - self.stime,
+                collections=dict(
+                    (name, metrics.to_dict())
+                    for name, metrics in self.collections.items()
+                ),
+                routes=dict(
+                    (
+                        name,
+                        dict(
+                            requests=stats["requests"],
+                            queries=stats["queries"].to_dict(),
+                            duration=stats["duration"].to_dict(scale=1000.0),
+                        ),
+                    )
+                    for name, stats in self.routes.items()
+                ),
+                repeated=[
+                    dict(
+                        route=key[0],
+                        collection=key[1],
+                        operation=key[2],
+                        shape=key[3],
+                        **entry
+                    )
+                    for key, entry in self.repeated.items()
+                ],
+                slow=list(self.slow),
+            )
+        finally:
+            self.lock.release()
+
+
+class SamplingProfiler(object):
+    """
+    Sampling based CPU profiler that periodically captures the stack
+    of the threads handling the profiled requests, aggregating the
+    stacks in memory in a collapsed (flamegraph compatible) format.
+
+    The sampling is performed by a background thread that is only
+    active while there are requests being profiled, so that there's
+    no overhead for the requests that are not profiled.
+    """
+
+    def __init__(
+        self,
+        interval=INTERVAL,
+        sample=0.0,
+        token=None,
+        acl=None,
+        max_stacks=MAX_STACKS,
+        max_depth=MAX_DEPTH,
+    ):
+        self.interval = interval
+        self.sample = sample
+        self.token = token
+        self.acl = acl
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.targets = dict()
+        self.names = dict()
+        self.sampler = None
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.reset()
+
+    def reset(self):
+        self.lock.acquire()
+        try:
+            self.stime = time.time()
+            self.stacks = dict()
+            self.requests = 0
+            self.samples = 0
+            self.dropped = 0
+        finally:
+            self.lock.release()
+
+    def start(self):
+        if self.is_running():
+            return
+        self.sampler = Sampler(self)
+        self.sampler.start()
+
+    def stop(self):
+        sampler = self.sampler
+        if not sampler:
+            return
+        sampler.running = False
+        self.event.set()
+        sampler.join()
+        self.sampler = None
+
+    def is_running(self):
+        return True if self.sampler and self.sampler.is_alive() else False
+
+    def is_sampled(self):
+        return self.sample > 0.0 and random.random() < self.sample
+
+    def begin(self, target, tid=None):
+        """
+        Starts the sampling of the thread that is handling the provided
+        target (request), from this point on the stack of the thread is
+        sampled until the end operation is called for it.
+
+        :type target: Request
+        :param target: The request that is going to be profiled, its
+        route name is used as the root frame of the collapsed stacks.
+        :type tid: int
+        :param tid: The identifier of the thread handling the target,
+        if not provided the current thread is used.
+        """
+
+        tid = tid or threading.current_thread().ident
+        self.start()
+        self.lock.acquire()
+        try:
+            self.targets[tid] = target
+            self.requests += 1
+            self.event.set()
+        finally:
+            self.lock.release()
+
+    def end(self, tid=None):
+        tid = tid or threading.current_thread().ident
+        if not tid in self.targets:
+            return
+        self.lock.acquire()
+        try:
+            self.targets.pop(tid, None)
+            if not self.targets:
+                self.event.clear()
+        finally:
+            self.lock.release()
+
+    def sample_all(self):
+        frames = sys._current_frames()
+        self.lock.acquire()
+        try:
+            for tid, target in self.targets.items():
+                frame = frames.get(tid, None)
+                if frame == None:
+                    continue
+                name = getattr(target, "route_name", None) or UNMATCHED
+                stack = self._collapse(frame, name)
+                self.samples += 1
+                if stack in self.stacks:
+                    self.stacks[stack] += 1
+                elif len(self.stacks) < self.max_stacks:
+                    self.stacks[stack] = 1
+                else:
+                    self.dropped += 1
+        finally:
+            self.lock.release()
+
+    def collapsed(self):
+        self.lock.acquire()
+        try:
+            lines = ["%s %d" % (stack, count) for stack, count in self.stacks.items()]
+        finally:
+            self.lock.release()
+        lines.sort()
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def to_dict(self):
+        return dict(
+            uptime=time.time() - self.stime,
+            running=self.is_running(),
+            interval=self.interval * 1000.0,
+            sample=self.sample,
+            requests=self.requests,
+            samples=self.samples,
+            dropped=self.dropped,
+            stacks=len(self.stacks),
+        )
+
+    def _collapse(self, frame, name):
+        # walks the stack from the current frame to the root one, resolving
+        # the name of each frame using the names cache (per code object)
+        # so that the cost of the string formatting is paid only once
+        names = []
+        while frame and len(names) < self.max_depth:
+            code = frame.f_code
+            frame_name = self.names.get(code, None)
+            if frame_name == None:
+                frame_name = "%s (%s:%d)" % (
+                    code.co_name,
+                    code.co_filename,
+                    code.co_firstlineno,
+                )
+                self.names[code] = frame_name
+            names.append(frame_name)
+            frame = frame.f_back
+        names.append(name)
+        names.reverse()
+        return ";".join(names)
+
+
+class Sampler(threading.Thread):
+    """
+    Background thread that takes the stack samples for the sampling
+    profiler, waiting (idle) while there are no profiled requests.
+    """
+
+    def __init__(self, profiler):
+        threading.Thread.__init__(self, name="Sampler")
+        self.profiler = profiler
+        self.running = True
+        self.daemon = True
+
+    def run(self):
+        while self.running:
+            self.profiler.event.wait()
+            if not self.running:
+                break
+            self.profiler.sample_all()
+            time.sleep(self.profiler.interval)
+
+
+def shape(value):
+    """
+    Retrieves the shape of the provided query filter, that is
+    its structure with every (leaf) value replaced by a placeholder.
+
+    :type value: Object
+    :param value: The filter value for which the shape is going to
+    be retrieved, may be a dictionary, a sequence or a leaf value.
+    :rtype: String
+    :return: The string representation of the shape of the value.
+    """
+
+    if value == None:
+        return "{}"
+    if isinstance(value, dict):
+        items = ["%s: %s" % (key, _shape(value[key])) for key in sorted(value)]
+        return "{" + ", ".join(items) + "}"
+    return _shape(value)
+
+
+def _shape(value):
+    if isinstance(value, dict):
+        return shape(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(sorted(set(_shape(item) for item in value))) + "]"
+    return "?"
+
+
+def _size(result):
+    if result == None:
+        return 0
+    if isinstance(result, dict):
+        return 1
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return None
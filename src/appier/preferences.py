@@ -29,16 +29,27 @@ __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
 import os
+import copy
+import time
 import shelve
 import pickle
+import struct
+import threading
 
+from . import bus
 from . import util
 from . import common
 from . import config
+from . import legacy
 from . import redisdb
 from . import component
 from . import exceptions
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 
 class Preferences(component.Component):
     def __init__(self, name="preferences", owner=None, *args, **kwargs):
@@ -126,6 +137,10 @@ class MemoryPreferences(Preferences):
 
 
 class FilePreferences(Preferences):
+    FILE_NAME = "preferences.shelve"
+    """ The default name of the file that is going to be used
+    to store the preferences (relative to the app path) """
+
     def __init__(self, name="file", owner=None, *args, **kwargs):
         Preferences.__init__(self, name=name, owner=owner, *args, **kwargs)
 
@@ -173,7 +188,7 @@ class FilePreferences(Preferences):
             return
         app_path = common.base().get_base_path()
         util.verify(not app_path == None, message="No app path available")
-        preferences_path = os.path.join(app_path, "preferences.shelve")
+        preferences_path = os.path.join(app_path, self.__class__.FILE_NAME)
         preferences_path = config.conf("PREFERENCES_PATH", preferences_path)
         preferences_path = os.path.expanduser(preferences_path)
         preferences_path = os.path.abspath(preferences_path)
@@ -198,6 +213,321 @@ class FilePreferences(Preferences):
         return shelve_dbm
 
 
+class LogPreferences(FilePreferences):
+    """
+    File based preferences engine that stores the changes to the
+    preferences in an append only log, with the complete set of
+    preferences being kept in memory (reads never touch the disk).
+
+    Writes are batched and appended to the log by a background
+    flusher thread, once the log grows much larger than the number
+    of preferences it's compacted into a new file (atomic rename).
+
+    Multiple processes (eg: forked workers) can share the same log,
+    each one of them picks up the changes appended by the others
+    (from time to time) and detects compactions by the inode change.
+    """
+
+    FILE_NAME = "preferences.log"
+    """ The default name of the file that is going to be used
+    to store the preferences log (relative to the app path) """
+
+    HEADER = struct.Struct("<I")
+    """ The structure of the header of each record in the log,
+    containing the length of the (pickled) record payload """
+
+    def __init__(self, name="log", owner=None, *args, **kwargs):
+        FilePreferences.__init__(self, name=name, owner=owner, *args, **kwargs)
+
+    def _load(self, *args, **kwargs):
+        self.interval = kwargs.pop("interval", None)
+        self.refresh = kwargs.pop("refresh", None)
+        self.compact = kwargs.pop("compact", None)
+        if self.interval == None:
+            self.interval = config.conf("PREFERENCES_INTERVAL", 1.0, cast=float)
+        if self.refresh == None:
+            self.refresh = config.conf("PREFERENCES_REFRESH", 1.0, cast=float)
+        if self.compact == None:
+            self.compact = config.conf("PREFERENCES_COMPACT", 1024, cast=int)
+        FilePreferences._load(self, *args, **kwargs)
+
+    def _get(self, name, default=None, strict=False, *args, **kwargs):
+        self._fork()
+        self._refresh()
+        if strict:
+            return self._values[name]
+        return self._values.get(name, default)
+
+    def _set(self, name, value, *args, **kwargs):
+        self._append(("set", name, value))
+
+    def _delete(self, name, *args, **kwargs):
+        if not name in self._values:
+            raise KeyError(name)
+        self._append(("delete", name, None))
+
+    def _flush(self, *args, **kwargs):
+        force = kwargs.get("force", False)
+        if not force:
+            return
+        self._write()
+
+    def _clear(self, *args, **kwargs):
+        self._fork()
+        self._lock.acquire()
+        try:
+            lock = self._acquire()
+            try:
+                self._pending = []
+                self._replace([])
+                self._reload()
+            finally:
+                self._release(lock)
+        finally:
+            self._lock.release()
+
+    def _open(self):
+        self._ensure_path()
+        self._values = dict()
+        self._pending = []
+        self._offset = 0
+        self._inode = None
+        self._records = 0
+        self._checked = 0.0
+        self._lock = threading.RLock()
+        self._reload()
+        self._start()
+
+    def _close(self):
+        self._stop()
+        self._write()
+        self._values = dict()
+
+    def _append(self, record):
+        self._fork()
+
+        # encodes the record right away so that a record that can't be
+        # pickled is dropped (and logged) instead of failing every flush
+        try:
+            data = self._encode(record)
+        except Exception as exception:
+            self.logger.warning(
+                "Dropping preferences record for '%s': %s"
+                % (record[1], legacy.UNICODE(exception))
+            )
+            return
+
+        self._lock.acquire()
+        try:
+            self._pending.append((record, data))
+            self._apply(self._values, record)
+        finally:
+            self._lock.release()
+
+    def _fork(self):
+        # in case the current process is not the one that started the
+        # flusher (process forked) the lock is re-created (it may have been
+        # held by a thread of the parent at fork time), the pending records
+        # belong to the parent process (it will write them) and a new
+        # flusher is started for the current process
+        if self._pid == os.getpid():
+            return
+        self._lock = threading.RLock()
+        self._pending = []
+        self._start()
+
+    def _write(self):
+        # the pending records of a process other than the current one
+        # (forked process that has not changed any preference) belong to
+        # the parent process, that's responsible for their writing
+        if not self._pid == os.getpid():
+            return
+
+        self._lock.acquire()
+        try:
+            if not self._pending:
+                return
+            data = b"".join(data for _record, data in self._pending)
+            lock = self._acquire()
+            try:
+                fd = os.open(
+                    self.preferences_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+                )
+                try:
+                    while data:
+                        data = data[os.write(fd, data) :]
+                finally:
+                    os.close(fd)
+                self._pending = []
+                self._refresh(force=True)
+                if self._records > max(self.compact, len(self._values) * 2):
+                    self._replace(
+                        [("set", key, value) for key, value in self._values.items()]
+                    )
+                    self._reload()
+            finally:
+                self._release(lock)
+        finally:
+            self._lock.release()
+
+    def _reload(self):
+        self._lock.acquire()
+        try:
+            records, offset, inode = self._read(0)
+            values = dict()
+            for record in records:
+                self._apply(values, record)
+            for record, _data in self._pending:
+                self._apply(values, record)
+            self._values = values
+            self._offset = offset
+            self._inode = inode
+            self._records = len(records)
+            self._checked = time.time()
+        finally:
+            self._lock.release()
+
+    def _refresh(self, force=False):
+        # verifies if enough time has passed since the last check of the
+        # log for changes, avoiding a system call in every read operation
+        if not force and time.time() - self._checked < self.refresh:
+            return
+
+        self._lock.acquire()
+        try:
+            self._checked = time.time()
+            try:
+                stat = os.stat(self.preferences_path)
+            except OSError:
+                stat = None
+
+            # in case the log has been replaced (compaction) or truncated
+            # the complete set of preferences must be loaded again
+            if (
+                stat == None
+                or not stat.st_ino == self._inode
+                or stat.st_size < self._offset
+            ):
+                self._reload()
+                return
+
+            if stat.st_size == self._offset:
+                return
+
+            records, offset, inode = self._read(self._offset)
+            if not inode == self._inode:
+                self._reload()
+                return
+
+            for record in records:
+                self._apply(self._values, record)
+            for record, _data in self._pending:
+                self._apply(self._values, record)
+            self._offset = offset
+            self._records += len(records)
+        finally:
+            self._lock.release()
+
+    def _read(self, offset):
+        try:
+            file = open(self.preferences_path, "rb")
+        except IOError:
+            return [], 0, None
+
+        try:
+            inode = os.fstat(file.fileno()).st_ino
+            file.seek(offset)
+            data = file.read()
+        finally:
+            file.close()
+
+        # iterates over the complete set of (complete) records in the
+        # data, notice that a partial record at the end of the data is
+        # left to be read on a latter operation (write in progress)
+        records = []
+        position = 0
+        header_size = self.HEADER.size
+        while position + header_size <= len(data):
+            (length,) = self.HEADER.unpack_from(data, position)
+            end = position + header_size + length
+            if end > len(data):
+                break
+            try:
+                records.append(pickle.loads(data[position + header_size : end]))
+            except Exception:
+                break
+            position = end
+
+        return records, offset + position, inode
+
+    def _replace(self, records):
+        temp_path = self.preferences_path + ".%d.tmp" % os.getpid()
+        file = open(temp_path, "wb")
+        try:
+            for record in records:
+                file.write(self._encode(record))
+        finally:
+            file.close()
+        replace = getattr(os, "replace", None)
+        if replace:
+            replace(temp_path, self.preferences_path)
+            return
+        if os.path.exists(self.preferences_path):
+            os.remove(self.preferences_path)
+        os.rename(temp_path, self.preferences_path)
+
+    def _encode(self, record):
+        payload = pickle.dumps(record, protocol=2)
+        return self.HEADER.pack(len(payload)) + payload
+
+    def _apply(self, values, record):
+        operation, name, value = record
+        if operation == "set":
+            values[name] = value
+        elif operation == "delete":
+            values.pop(name, None)
+
+    def _acquire(self):
+        if not fcntl:
+            return None
+        lock = open(self.preferences_path + ".lock", "a")
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        return lock
+
+    def _release(self, lock):
+        if not lock:
+            return
+        fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+        lock.close()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._running = True
+        self._event = threading.Event()
+        self._flusher = threading.Thread(target=self._run, name="PreferencesFlusher")
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    def _stop(self):
+        self._running = False
+        if not self._flusher:
+            return
+        self._event.set()
+        if self._pid == os.getpid():
+            self._flusher.join()
+        self._flusher = None
+
+    def _run(self):
+        while self._running:
+            self._event.wait(self.interval)
+            try:
+                self._write()
+            except Exception as exception:
+                self.logger.warning(
+                    "Problem writing preferences log: %s" % legacy.UNICODE(exception)
+                )
+
+
 class RedisPreferences(Preferences):
     SERIALIZER = pickle
     """ The serializer to be used for the values contained in
@@ -257,3 +587,189 @@ class RedisPreferences(Preferences):
 
     def _fqn(self, name):
         return self._prefix + name
+
+
+class RedisCachedPreferences(RedisPreferences):
+    """
+    Redis based preferences engine that keeps a local (in-process)
+    copy of the complete set of preferences, meaning that reading
+    a preference never requires a round trip to the Redis server.
+
+    The local copy is loaded at once (scan and multiple get) and then
+    kept up-to-date by invalidation events sent through the owner's
+    bus, that must be a cross-process one (Redis or local), as
+    otherwise the local copy would become stale for changes made
+    by other processes and so the reads fallback to Redis.
+
+    Every write increments a per key version counter (stored in a
+    Redis hash) so that out of order invalidations are never able
+    to replace a newer value with a stale one.
+    """
+
+    EVENT = "preferences"
+    """ The name of the bus event used to notify the other
+    instances of a change in one of the preferences """
+
+    SHARED_BUSES = (bus.LocalBus, bus.RedisBus)
+    """ The bus classes that are able to deliver the invalidation
+    events across processes, required for the local copy """
+
+    def __init__(self, name="redis_cached", owner=None, *args, **kwargs):
+        RedisPreferences.__init__(self, name=name, owner=owner, *args, **kwargs)
+
+    def _load(self, *args, **kwargs):
+        self._values = dict()
+        self._versions = dict()
+        self._lock = threading.RLock()
+        self._bus = kwargs.pop("bus", None)
+        self._cached = False
+        RedisPreferences._load(self, *args, **kwargs)
+        self._versions_key = self._prefix.rstrip("_") + ":versions"
+        self._bind()
+        if not self._cached:
+            return
+        self._reload()
+
+    def _unload(self, *args, **kwargs):
+        self._unbind()
+        RedisPreferences._unload(self, *args, **kwargs)
+        self._values = None
+        self._versions = None
+
+    def _get(self, name, default=None, strict=False, *args, **kwargs):
+        if not self._cached:
+            return RedisPreferences._get(
+                self, name, default=default, strict=strict, *args, **kwargs
+            )
+        # returns a copy of the (shared) local value so that changes made
+        # by the caller are not visible to the other readers
+        if strict:
+            return copy.deepcopy(self._values[name])
+        return copy.deepcopy(self._values.get(name, default))
+
+    def _set(self, name, value, *args, **kwargs):
+        pipeline = self._redis.pipeline()
+        pipeline.set(self._fqn(name), self._serializer.dumps(value))
+        pipeline.hincrby(self._versions_key, name, 1)
+        _result, version = pipeline.execute()
+        self._store(name, value, version)
+        self._notify(name, version)
+
+    def _delete(self, name, *args, **kwargs):
+        pipeline = self._redis.pipeline()
+        pipeline.delete(self._fqn(name))
+        pipeline.hincrby(self._versions_key, name, 1)
+        _result, version = pipeline.execute()
+        self._store(name, None, version, exists=False)
+        self._notify(name, version)
+
+    def _clear(self, *args, **kwargs):
+        RedisPreferences._clear(self, *args, **kwargs)
+        if not self._cached:
+            return
+        self._reload()
+        self._notify(None, None)
+
+    def _reload(self):
+        # retrieves the complete set of keys for the current prefix and then
+        # gathers both their values and versions in a single round trip each
+        keys = [key for key in self._redis.scan_iter(match=self._prefix + "*")]
+        values = self._redis.mget(keys) if keys else []
+        versions = self._redis.hgetall(self._versions_key)
+
+        _values = dict()
+        _versions = dict()
+
+        for key, value in zip(keys, values):
+            if value == None:
+                continue
+            name = legacy.str(key)[len(self._prefix) :]
+            try:
+                _values[name] = self._serializer.loads(value)
+            except Exception:
+                continue
+
+        for name, version in legacy.iteritems(versions):
+            _versions[legacy.str(name)] = int(version)
+
+        self._lock.acquire()
+        try:
+            self._values = _values
+            self._versions = _versions
+        finally:
+            self._lock.release()
+
+    def _refresh(self, name):
+        pipeline = self._redis.pipeline()
+        pipeline.get(self._fqn(name))
+        pipeline.hget(self._versions_key, name)
+        value, version = pipeline.execute()
+        version = int(version) if version else 0
+        if value == None:
+            self._store(name, None, version, exists=False)
+            return
+        try:
+            value = self._serializer.loads(value)
+        except Exception:
+            return
+        self._store(name, value, version)
+
+    def _store(self, name, value, version, exists=True):
+        self._lock.acquire()
+        try:
+            if version < self._versions.get(name, 0):
+                return False
+            self._versions[name] = version
+            if exists:
+                self._values[name] = value
+            else:
+                self._values.pop(name, None)
+        finally:
+            self._lock.release()
+        return True
+
+    def _notify(self, name, version):
+        if not self._bus:
+            return
+        self._bus.trigger(self.__class__.EVENT, self._prefix, name, version)
+
+    def _bind(self):
+        # retrieves the bus to be used for the invalidation events and in
+        # case it's not able to deliver them across processes (eg: memory
+        # bus) the local copy is disabled, as it would become stale
+        if not self._bus and self.owner:
+            self._bus = getattr(self.owner, "bus_d", None)
+        if not isinstance(self._bus, self.__class__.SHARED_BUSES):
+            self.logger.warning(
+                "No cross-process bus for cached preferences (%s), reading from Redis"
+                % (self._bus.__class__.__name__ if self._bus else "none")
+            )
+            self._bus = None
+            return
+        self._bus.bind(self.__class__.EVENT, self._on_change)
+        self._bus.coalesce(self.__class__.EVENT, self._event_key)
+        self._cached = True
+
+    def _unbind(self):
+        self._cached = False
+        if not self._bus:
+            return
+        self._bus.unbind(self.__class__.EVENT, self._on_change)
+        self._bus = None
+
+    def _event_key(self, prefix, name, version):
+        # the changes to the same preference are coalesced (only the
+        # latest one is sent) as the version is checked on receive
+        return (prefix, name)
+
+    def _on_change(self, prefix, name, version):
+        if not self.loaded:
+            return
+        if not prefix == self._prefix:
+            return
+        if name == None:
+            self._reload()
+            return
+        if version <= self._versions.get(name, 0):
+            return
+        self._refresh(name)
@@ -3,4 +3,6 @@ from .component import Component
 class Preferences(Component): ...
 class MemoryPreferences(Preferences): ...
 class FilePreferences(Preferences): ...
+class LogPreferences(FilePreferences): ...
 class RedisPreferences(Preferences): ...
+class RedisCachedPreferences(RedisPreferences): ...
@@ -28,15 +28,30 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import os
 import json
+import time
 import uuid
 import heapq
 import functools
+import threading
 
+from . import ipc
 from . import amqp
+from . import config
 from . import legacy
 from . import exceptions
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 
 class Queue(object):
     def length(self):
@@ -51,6 +66,17 @@ class Queue(object):
     def pop(self, block=True, full=False):
         raise exceptions.NotImplementedError()
 
+    def push_many(self, values, priority=None, identify=False):
+        return [
+            self.push(value, priority=priority, identify=identify) for value in values
+        ]
+
+    def pop_many(self, count, full=False):
+        values = []
+        while len(values) < count and self.length() > 0:
+            values.append(self.pop(block=False, full=full))
+        return values
+
     def subscribe(self, callback, full=False):
         raise exceptions.NotImplementedError()
 
@@ -103,35 +129,230 @@ class MemoryQueue(Queue):
 
 
 class MultiprocessQueue(Queue):
-    def __init__(self):
-        try:
-            import queue
-        except ImportError:
-            import Queue as queue
+    """
+    Priority queue that is shared by the complete process tree
+    created from the process where the queue has been created,
+    meaning that forked processes (eg: workers) are able to push
+    and pop values from the same queue.
+
+    The queue is hosted by the process that created it (through a
+    server thread) and the remaining processes access it using a
+    local socket connection, which means that the queue should be
+    created before the fork operation takes place.
+
+    In case a maximum size is defined the push operations block
+    (backpressure) until there's space available in the queue.
+    """
+
+    def __init__(self, name=None, maxsize=None):
         Queue.__init__(self)
-        self._queue = queue.PriorityQueue()
+        self.name = name or str(uuid.uuid4())
+        self.maxsize = (
+            config.conf("QUEUE_SIZE", 0, cast=int) if maxsize == None else maxsize
+        )
+        self._server = get_server()
 
     def length(self):
-        return self._queue.qsize()
+        return self._call("qsize")
 
     def clear(self):
-        try:
-            import queue
-        except ImportError:
-            import Queue as queue
-        self._queue = queue.PriorityQueue()
+        self._call("clear")
 
-    def push(self, value, priority=None, identify=False):
+    def push(self, value, priority=None, identify=False, block=True, timeout=None):
         value, identifier = self.build_value(
             value, priority=priority, identify=identify, reverse=True
         )
-        self._queue.put(value)
+        self._call("put_many", [value], block, timeout)
         return identifier
 
-    def pop(self, block=True, full=False):
-        priority, identifier, value = self._queue.get(block)
+    def pop(self, block=True, full=False, timeout=None):
+        values = self._call("get_many", 1, block, timeout)
+        if not values:
+            raise queue.Empty()
+        priority, identifier, value = values[0]
         return (priority, identifier, value) if full else value
 
+    def push_many(
+        self, values, priority=None, identify=False, block=True, timeout=None
+    ):
+        items = []
+        identifiers = []
+
+        for value in values:
+            value, identifier = self.build_value(
+                value, priority=priority, identify=identify, reverse=True
+            )
+            items.append(value)
+            identifiers.append(identifier)
+
+        self._call("put_many", items, block, timeout)
+
+        return identifiers
+
+    def pop_many(self, count, full=False, block=False, timeout=None):
+        values = self._call("get_many", count, block, timeout)
+        return [value if full else value[2] for value in values]
+
+    def _call(self, method, *args):
+        return self._server.call(self.name, self.maxsize, method, args)
+
+
+class SharedQueue(object):
+    """
+    The underlying (thread safe) priority queue structure that
+    is hosted by the queue server, every operation is performed
+    in batch so that a single round trip is required.
+
+    Values with the same priority are retrieved in insertion order.
+    """
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self._heap = []
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    def qsize(self):
+        self._lock.acquire()
+        try:
+            return len(self._heap)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            del self._heap[:]
+            self._not_full.notify_all()
+        finally:
+            self._lock.release()
+
+    def put_many(self, values, block=True, timeout=None):
+        deadline = None if timeout == None else time.time() + timeout
+        self._lock.acquire()
+        try:
+            for value in values:
+                while self.maxsize > 0 and len(self._heap) >= self.maxsize:
+                    if not self._wait(self._not_full, block, deadline):
+                        raise queue.Full()
+                self._counter += 1
+                heapq.heappush(self._heap, (value[0] or 0, self._counter, value))
+                self._not_empty.notify()
+        finally:
+            self._lock.release()
+
+    def get_many(self, count, block=True, timeout=None):
+        deadline = None if timeout == None else time.time() + timeout
+        self._lock.acquire()
+        try:
+            while not self._heap:
+                if not self._wait(self._not_empty, block, deadline):
+                    return []
+            values = []
+            while self._heap and len(values) < count:
+                values.append(heapq.heappop(self._heap)[2])
+            self._not_full.notify(len(values))
+            return values
+        finally:
+            self._lock.release()
+
+    def _wait(self, condition, block, deadline):
+        if not block:
+            return False
+        if deadline == None:
+            condition.wait()
+            return True
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        condition.wait(remaining)
+        return True
+
+
+class QueueServer(ipc.LocalServer):
+    """
+    Server thread that hosts the shared queues for the process
+    that created it, listening on a local socket (authenticated)
+    for the requests coming from the child processes.
+
+    Requests coming from the owner process are handled directly
+    (no socket round trip) against the shared queue.
+    """
+
+    HANDLER_NAME = "QueueHandler"
+    """ The name of the threads that handle the connections
+    accepted by the server """
+
+    def __init__(self):
+        ipc.LocalServer.__init__(self, name="QueueServer")
+        self._queues = dict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def handle(self, connection):
+        try:
+            while True:
+                try:
+                    name, maxsize, method, args = connection.recv()
+                except (EOFError, IOError, OSError):
+                    break
+                try:
+                    result = self.call_l(name, maxsize, method, args)
+                except Exception as exception:
+                    connection.send(("error", exception))
+                else:
+                    connection.send(("ok", result))
+        finally:
+            connection.close()
+
+    def call(self, name, maxsize, method, args):
+        if self.is_owner:
+            return self.call_l(name, maxsize, method, args)
+        connection = self._get_connection()
+        connection.send((name, maxsize, method, args))
+        status, result = connection.recv()
+        if status == "error":
+            raise result
+        return result
+
+    def call_l(self, name, maxsize, method, args):
+        shared = self.get_queue(name, maxsize)
+        return getattr(shared, method)(*args)
+
+    def get_queue(self, name, maxsize=0):
+        shared = self._queues.get(name, None)
+        if shared:
+            return shared
+        self._lock.acquire()
+        try:
+            shared = self._queues.get(name, None)
+            if shared:
+                return shared
+            shared = SharedQueue(maxsize=maxsize)
+            self._queues[name] = shared
+        finally:
+            self._lock.release()
+        return shared
+
+    def _get_connection(self):
+        # the connection is cached per thread and process (pid) so that
+        # connections inherited from a parent process are never re-used
+        # by the child process, as that would corrupt the stream
+        pid = os.getpid()
+        connection = getattr(self._local, "connection", None)
+        if connection and self._local.pid == pid:
+            return connection
+        connection = self.connect()
+        self._local.connection = connection
+        self._local.pid = pid
+        return connection
+
+
+def get_server():
+    return QueueServer.get_server()
+
 
 class AMQPQueue(Queue):
     def __init__(
@@ -143,6 +364,9 @@ class AMQPQueue(Queue):
         encoder="pickle",
         protocol=2,
         encoding="utf-8",
+        prefetch=None,
+        confirm=False,
+        timeout=None,
         amqp=None,
     ):
         self.url = url
@@ -152,7 +376,11 @@ class AMQPQueue(Queue):
         self.encoder = encoder
         self.protocol = protocol
         self.encoding = encoding
+        self.prefetch = prefetch or config.conf("AMQP_PREFETCH", 1, cast=int)
+        self.confirm = confirm
+        self.timeout = timeout or config.conf("AMQP_TIMEOUT", 30.0, cast=float)
         self.amqp = amqp
+        self._properties = dict()
         self._build()
 
     def clear(self):
@@ -164,16 +392,25 @@ class AMQPQueue(Queue):
         )
         body = self._dump(value)
 
-        self._add_callback(
-            self.channel.basic_publish,
-            exchange="",
-            routing_key=self.name,
-            body=body,
-            properties=amqp.properties(delivery_mode=2, priority=value[0] or 0),
-        )
+        self._publish([(body, value[0] or 0)])
 
         return identifier
 
+    def push_many(self, values, priority=None, identify=False):
+        messages = []
+        identifiers = []
+
+        for value in values:
+            value, identifier = self.build_value(
+                value, priority=priority, identify=identify, reverse=False
+            )
+            messages.append((self._dump(value), value[0] or 0))
+            identifiers.append(identifier)
+
+        self._publish(messages)
+
+        return identifiers
+
     def pop(self, block=True, full=False):
         _method, _properties, body = self.channel.basic_get(
             queue=self.name, auto_ack=False
@@ -181,6 +418,35 @@ class AMQPQueue(Queue):
         priority, identifier, value = self._load(body)
         return (priority, identifier, value) if full else value
 
+    def pop_many(self, count, full=False, ack=True):
+        # retrieves the messages one by one (one round trip per message)
+        # as the blocking channel has no batched get, only the ack of the
+        # messages is batched (a single multiple ack for the complete set),
+        # in case no ack is requested the delivery tags of the messages are
+        # returned so that the caller is able to ack them latter
+        values = []
+        delivery_tags = []
+        delivery_tag = None
+
+        while len(values) < count:
+            method, _properties, body = self.channel.basic_get(
+                queue=self.name, auto_ack=False
+            )
+            if not method:
+                break
+            delivery_tag = method.delivery_tag
+            delivery_tags.append(delivery_tag)
+            priority, identifier, value = self._load(body)
+            values.append((priority, identifier, value) if full else value)
+
+        if not ack:
+            return values, delivery_tags
+
+        if not delivery_tag == None:
+            self.channel.basic_ack(delivery_tag=delivery_tag, multiple=True)
+
+        return values
+
     def subscribe(
         self,
         callback,
@@ -189,7 +455,11 @@ class AMQPQueue(Queue):
         exclusive=False,
         consumer_tag=None,
         arguments=None,
+        prefetch=None,
     ):
+        if prefetch:
+            self.channel.basic_qos(prefetch_count=prefetch)
+
         def handler(channel, method, properties, body):
             priority, identifier, value = self._load(body)
             result = (priority, identifier, value) if full else value
@@ -206,8 +476,8 @@ class AMQPQueue(Queue):
             arguments=arguments,
         )
 
-    def ack(self, delivery_tag=None):
-        self.channel.basic_ack(delivery_tag=delivery_tag)
+    def ack(self, delivery_tag=None, multiple=False):
+        self.channel.basic_ack(delivery_tag=delivery_tag, multiple=multiple)
 
     def nack(self, delivery_tag=None):
         self.channel.basic_nack(delivery_tag=delivery_tag)
@@ -225,9 +495,12 @@ class AMQPQueue(Queue):
         return legacy.cPickle.dumps(value, protocol=self.protocol)
 
     def _dump_json(self, value):
-        body = json.dumps(value)
+        body = json.dumps(value, separators=(",", ":"))
         return legacy.bytes(body, encoding=self.encoding)
 
+    def _dump_msgpack(self, value):
+        return msgpack.packb(value, use_bin_type=True)
+
     def _load(self, body):
         return self._loader(body)
 
@@ -243,20 +516,66 @@ class AMQPQueue(Queue):
             body = body.decode(self.encoding)
         return json.loads(body)
 
+    def _load_msgpack(self, body):
+        return msgpack.unpackb(body, raw=False)
+
     def _build(self):
         if not self.amqp:
             self.amqp = amqp.AMQP(url=self.url)
         self.connection = self.amqp.get_connection()
         self.channel = self.connection.channel()
-        self.channel.basic_qos(prefetch_count=1)
+        self.channel.basic_qos(prefetch_count=self.prefetch)
+        self.publisher = self.connection.channel() if self.confirm else None
+        if self.publisher:
+            self.publisher.tx_select()
+        self._tid = threading.current_thread().ident
         self.queue = self.channel.queue_declare(
             queue=self.name,
             durable=self.durable,
             arguments={"x-max-priority": self.max_priority},
         )
+        if self.encoder == "msgpack" and not msgpack:
+            raise exceptions.OperationalError(message="No msgpack library available")
         self._dumper = getattr(self, "_dump_" + self.encoder)
         self._loader = getattr(self, "_load_" + self.encoder)
 
+    def _publish(self, messages):
+        # in case the confirmation of the publishing is requested the messages
+        # are published and committed in a transaction (one round trip for
+        # the complete batch) and any failure is raised to the caller, as
+        # otherwise the publishing is asynchronous (fire and forget)
+        if self.confirm:
+            self._call(self._publish_tx, messages)
+        else:
+            self._add_callback(self._publish_many, messages)
+
+    def _publish_many(self, messages, channel=None):
+        channel = channel or self.channel
+        for body, priority in messages:
+            channel.basic_publish(
+                exchange="",
+                routing_key=self.name,
+                body=body,
+                properties=self._get_properties(priority),
+            )
+
+    def _publish_tx(self, messages):
+        try:
+            self._publish_many(messages, channel=self.publisher)
+            self.publisher.tx_commit()
+        except Exception:
+            if self.publisher.is_open:
+                self.publisher.tx_rollback()
+            raise
+
+    def _get_properties(self, priority):
+        properties = self._properties.get(priority, None)
+        if properties:
+            return properties
+        properties = amqp.properties(delivery_mode=2, priority=priority)
+        self._properties[priority] = properties
+        return properties
+
     def _add_callback(self, callback, *args, **kwargs):
         if hasattr(self.connection, "add_callback_threadsafe"):
             self.connection.add_callback_threadsafe(
@@ -264,3 +583,34 @@ class AMQPQueue(Queue):
             )
         else:
             callback(*args, **kwargs)
+
+    def _call(self, callback, *args, **kwargs):
+        # in case the current thread is the one that owns the connection
+        # (or no thread safe scheduling is available) the callback is called
+        # immediately, otherwise it's scheduled in the connection's thread
+        # and the result (or the exception) is waited for (up to the timeout)
+        # and returned
+        is_owner = threading.current_thread().ident == self._tid
+        if is_owner or not hasattr(self.connection, "add_callback_threadsafe"):
+            return callback(*args, **kwargs)
+
+        result = dict()
+        event = threading.Event()
+
+        def handler():
+            try:
+                result["value"] = callback(*args, **kwargs)
+            except Exception as exception:
+                result["exception"] = exception
+            finally:
+                event.set()
+
+        self.connection.add_callback_threadsafe(handler)
+        event.wait(self.timeout)
+        if not event.is_set():
+            raise exceptions.OperationalError(
+                message="Timeout waiting for the AMQP connection thread"
+            )
+        if "exception" in result:
+            raise result["exception"]
+        return result.get("value", None)
@@ -116,6 +116,11 @@ class Request(object):
         environ={},
         session_c=session.FileSession,
     ):
+        self._pending = set()
+        self._failed = dict()
+        self._input = None
+        self._length = -1
+        self._aliased = False
         self.owner = owner
         self.method = method
         self.path = path
@@ -133,6 +138,10 @@ class Request(object):
         self.etime = None
         self.context = None
         self.method_i = None
+        self.route_name = None
+        self.timings = None
+        self.ptime = None
+        self.queries = None
         self.exception = None
         self.stacktrace = None
         self.json = False
@@ -220,6 +229,9 @@ class Request(object):
         self.out_headers = None
         self.warnings = None
         self.properties = None
+        self._pending = set()
+        self._failed = dict()
+        self._input = None
         self._closed = True
         self._params = None
 
@@ -303,6 +315,11 @@ class Request(object):
 
         self.warnings.append(message)
 
+    def timing(self, name, duration):
+        if self.timings == None:
+            return
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+
     def get_params(self):
         if self._params:
             return self._params
@@ -340,6 +357,28 @@ class Request(object):
     def set_data(self, data):
         self.data = data
 
+    def set_input(self, input, length=-1):
+        """
+        Sets the input stream (file like object) from which the
+        payload of the request is going to be read, note that the
+        read operation is deferred until the data is first accessed.
+
+        This avoids the reading of the payload for requests whose
+        handlers never access the data (eg: health checks).
+
+        :type input: File
+        :param input: The file like object (eg: WSGI input) from
+        which the request payload is going to be read.
+        :type length: int
+        :param length: The number of bytes to be read from the input
+        stream, in case the value is negative the stream is read
+        until its end.
+        """
+
+        self.data = None
+        self._input = input
+        self._length = length
+
     def get_json(self):
         return self.data_j
 
@@ -365,9 +404,9 @@ class Request(object):
         is_dict = isinstance(args, dict)
         args = args.items() if is_dict else args
         for key, value in args:
-            _value = self.args.get(key, [])
+            _value = self._args.get(key, [])
             _value.extend(value)
-            self.args[key] = _value
+            self._args[key] = _value
 
     def get_encoding(self):
         return self.encoding
@@ -404,6 +443,9 @@ class Request(object):
     def get_header(self, name, default=None, normalize=True):
         if normalize:
             name = name.title()
+        if "headers" in self._pending and name == name.title():
+            key = "HTTP_" + name.upper().replace("-", "_")
+            return self.environ.get(key, default)
         return self.in_headers.get(name, default)
 
     def set_header(self, name, value, normalize=False, replace=True):
@@ -429,6 +471,9 @@ class Request(object):
     def has_header_in(self, name, insensitive=True):
         if insensitive:
             name = name.title()
+        if "headers" in self._pending and name == name.title():
+            key = "HTTP_" + name.upper().replace("-", "_")
+            return key in self.environ
         return name in self.in_headers
 
     def has_header_out(self, name, insensitive=True):
@@ -521,10 +566,14 @@ class Request(object):
         self.prefixes = prefixes
 
     def load_base(self):
-        self.load_data()
-        self.load_form()
-        self.load_authorization()
-        self.load_headers()
+        # marks the data, form, authorization, headers and cookies as
+        # pending so that they are only loaded (parsed) on first access
+        # to the associated attributes, avoiding the parsing overhead for
+        # the requests that never access them (eg: health checks)
+        self._pending.update(("data", "form", "authorization", "headers", "cookies"))
+
+        # the session is still loaded eagerly as it's required for
+        # the locale resolution and for secret parameters resolution
         self.load_session()
 
     def load_data(self):
@@ -562,6 +611,13 @@ class Request(object):
             post, files, ordered = util.parse_multipart(self.data, boundary)
             self.set_multipart(post, files, ordered)
 
+        # in case the alias values have already been set for the request
+        # (deferred loading) the ones coming from the payload must also
+        # be set so that they are coherent with the eager loading
+        if self._aliased:
+            self._set_alias(self._post)
+            self._set_alias(self._args)
+
     def load_form(self):
         self.params_s = util.load_form(self.params)
         self.post_s = util.load_form(self.post)
@@ -597,7 +653,8 @@ class Request(object):
 
     def load_session(self):
         self.load_mock()
-        self.load_cookies()
+        if not "cookies" in self._pending:
+            self.load_cookies()
         self.set_alias()
         self.set_session()
 
@@ -678,7 +735,7 @@ class Request(object):
         # gathers the value of the accept language header and in case
         # it's not defined returns immediately as no language can be
         # determined using the currently provided headers
-        accept_language = self.in_headers.get("Accept-Language", None)
+        accept_language = self.get_header("Accept-Language", None)
         if not accept_language:
             return ()
 
@@ -709,29 +766,28 @@ class Request(object):
         return langs
 
     def set_alias(self):
-        for alias in Request.ALIAS:
-            if not alias in self.params:
-                continue
-            self.params["sid"] = self.params[alias]
+        self._aliased = True
 
-        for alias in Request.ALIAS:
-            if not alias in self.post:
-                continue
-            self.post["sid"] = self.post[alias]
+        self._set_alias(self.params)
 
-        for alias in Request.ALIAS:
-            if not alias in self.args:
-                continue
-            self.args["sid"] = self.args[alias]
+        # in case the payload of the request is still pending to be
+        # loaded returns immediately, the alias values for both the
+        # post and the arguments are going to be set on loading
+        if "data" in self._pending:
+            return
+
+        self._set_alias(self.post)
+        self._set_alias(self.args)
 
     def set_session(self, create=False):
         # tries to retrieves the session id (SID) from all the
         # possible sources so that something may be used in the
         # identification of the current request
         sid = self.cookies.get("sid", None)
-        sid = self.post.get("sid", (None,))[0] or sid
+        if self._has_form():
+            sid = self.post.get("sid", (None,))[0] or sid
         sid = self.params.get("sid", (None,))[0] or sid
-        sid = self.in_headers.get("X-Session-Id", None) or sid
+        sid = self.get_header("X-Session-Id", None) or sid
 
         # in case the data type of the currently provided session
         # identifier is not unicode based converts it into a string
@@ -881,6 +937,8 @@ class Request(object):
 
     @property
     def in_length(self):
+        if not self._input == None and self._length >= 0:
+            return self._length
         data = self.get_data()
         if not data:
             return 0
@@ -903,6 +961,170 @@ class Request(object):
         user_agent = self.get_header("User-Agent")
         return util.browser_info(user_agent)
 
+    @property
+    def data(self):
+        if self._input == None:
+            return self._data
+        input, self._input = self._input, None
+        self._data = input.read(self._length)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._input = None
+
+    @property
+    def data_j(self):
+        self._ensure("data")
+        return self._data_j
+
+    @data_j.setter
+    def data_j(self, value):
+        self._pending.discard("data")
+        self._data_j = value
+
+    @property
+    def post(self):
+        self._ensure("data")
+        return self._post
+
+    @post.setter
+    def post(self, value):
+        self._pending.discard("data")
+        self._post = value
+
+    @property
+    def files(self):
+        self._ensure("data")
+        return self._files
+
+    @files.setter
+    def files(self, value):
+        self._pending.discard("data")
+        self._files = value
+
+    @property
+    def args(self):
+        self._ensure("data")
+        return self._args
+
+    @args.setter
+    def args(self, value):
+        self._args = value
+
+    @property
+    def params_s(self):
+        self._ensure("form")
+        return self._params_s
+
+    @params_s.setter
+    def params_s(self, value):
+        self._pending.discard("form")
+        self._params_s = value
+
+    @property
+    def post_s(self):
+        self._ensure("form")
+        return self._post_s
+
+    @post_s.setter
+    def post_s(self, value):
+        self._pending.discard("form")
+        self._post_s = value
+
+    @property
+    def files_s(self):
+        self._ensure("form")
+        return self._files_s
+
+    @files_s.setter
+    def files_s(self, value):
+        self._pending.discard("form")
+        self._files_s = value
+
+    @property
+    def authorization(self):
+        self._ensure("authorization")
+        return self._authorization
+
+    @authorization.setter
+    def authorization(self, value):
+        self._pending.discard("authorization")
+        self._authorization = value
+
+    @property
+    def in_headers(self):
+        self._ensure("headers")
+        return self._in_headers
+
+    @in_headers.setter
+    def in_headers(self, value):
+        self._pending.discard("headers")
+        self._in_headers = value
+
+    @property
+    def cookies(self):
+        self._ensure("cookies")
+        return self._cookies
+
+    @cookies.setter
+    def cookies(self, value):
+        self._pending.discard("cookies")
+        self._cookies = value
+
+    def _ensure(self, name):
+        """
+        Makes sure that the (lazy) part of the request with the
+        provided name is loaded, running the associated loader
+        method (eg: `load_data`) in case it's still pending.
+
+        In case the loader fails the exception is kept and raised
+        again on every subsequent access to the part, instead of
+        considering it loaded (with empty values).
+
+        :type name: String
+        :param name: The name of the part of the request that is
+        going to be loaded, if pending (eg: data, form, headers).
+        """
+
+        if not name in self._pending:
+            return
+        if name in self._failed:
+            raise self._failed[name]
+        self._pending.discard(name)
+        method = getattr(self, "load_" + name)
+        try:
+            method()
+        except Exception as exception:
+            self._failed[name] = exception
+            self._pending.add(name)
+            raise
+
+    def _has_form(self):
+        """
+        Determines if the post (form) values of the request may be
+        non empty, avoiding the loading of the payload for the cases
+        where it's not form encoded (eg: JSON).
+
+        :rtype: bool
+        :return: If the post values should be inspected for the
+        current request.
+        """
+
+        if not "data" in self._pending:
+            return True
+        content_type = self.environ.get("CONTENT_TYPE", "application/json")
+        content_type = self.environ.get("HTTP_CONTENT_TYPE", content_type)
+        mime_type = content_type.split(";", 1)[0].strip()
+        return mime_type in ("application/x-www-form-urlencoded", "multipart/form-data")
+
+    def _set_alias(self, values):
+        for alias in Request.ALIAS:
+            if not alias in values:
+                continue
+            values["sid"] = values[alias]
+
     def _resolve_p(self, params):
         secret = self.session.get("secret", None)
         if not secret:
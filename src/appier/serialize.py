@@ -29,13 +29,76 @@ __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
 import csv
+import json
 import uuid
+import codecs
+import datetime
+import itertools
 
+from . import mongo
 from . import model
+from . import config
 from . import legacy
 from . import typesf
 from . import exceptions
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+BUFFER_SIZE = 32768
+""" The default (approximate) size of each of the chunks
+yielded by the streaming serialization functions """
+
+ICS_EVENT = "BEGIN:VEVENT\r\n\
+UID:%s\r\n\
+TZID:%s\r\n\
+DTSTART:%s\r\n\
+DTEND:%s\r\n\
+DTSTAMP:%s\r\n\
+SUMMARY:%s\r\n\
+LOCATION:%s\r\n\
+END:VEVENT\r\n"
+""" The template to be used for each of the events of
+an ICS file, pre-built so that a single write is used """
+
+JSON_ENGINES = ("orjson", "ujson", "json")
+""" The sequence of JSON engines (backends) that are supported,
+in the order of preference used for automatic selection """
+
+JSON_ENGINE = None
+""" The name of the JSON engine currently in use, lazily
+resolved from the configuration on first usage """
+
+JSON_PERMISSIVE = True
+""" If the non native values should be converted by the default
+hook (permissive), otherwise they raise an error as in the standard
+library, disabled by the application when JSON patching is off """
+
+JSON_TYPES = {
+    datetime.datetime: str,
+    datetime.date: str,
+    datetime.time: str,
+    uuid.UUID: str,
+}
+""" Map associating the type of a non native JSON value with the
+function that converts it, populated on demand by the default hook
+so that a single lookup is required for each (repeated) type """
+
+JSON_BATCH = 64
+""" The number of items that are encoded at once (as a single
+array) by the streaming JSON array encoder """
+
+JSON_ENCODERS = {}
+""" The cache of standard library JSON encoders, one for each
+of the combinations of formatting options used """
+
 
 def serialize(obj):
     if isinstance(obj, model.Model):
@@ -48,85 +111,275 @@ def serialize(obj):
 
 
 def serialize_csv(
-    items, encoding="utf-8", errors="strict", delimiter=";", strict=False
+    items,
+    encoding="utf-8",
+    errors="strict",
+    delimiter=";",
+    strict=False,
+    keys=None,
+    encoders=None,
+):
+    # runs the complete (streaming) serialization of the items and
+    # joins the resulting chunks into a single string value
+    chunks = _serialize_csv(
+        items,
+        encoding=encoding,
+        errors=errors,
+        delimiter=delimiter,
+        strict=strict,
+        keys=keys,
+        encoders=encoders,
+    )
+    return str().join(chunks)
+
+
+def serialize_csv_g(
+    items,
+    encoding="utf-8",
+    errors="strict",
+    delimiter=";",
+    strict=False,
+    keys=None,
+    encoders=None,
+    sized=False,
+    buffer_size=BUFFER_SIZE,
+):
+    chunks = _serialize_csv(
+        items,
+        encoding=encoding,
+        errors=errors,
+        delimiter=delimiter,
+        strict=strict,
+        keys=keys,
+        encoders=encoders,
+        buffer_size=buffer_size,
+    )
+    for chunk in _stream(chunks, encoding, errors, sized=sized):
+        yield chunk
+
+
+def serialize_ics(items, encoding="utf-8", errors="strict"):
+    chunks = _serialize_ics(items, encoding=encoding, errors=errors)
+    return str().join(chunks)
+
+
+def serialize_ics_g(
+    items, encoding="utf-8", errors="strict", sized=False, buffer_size=BUFFER_SIZE
+):
+    chunks = _serialize_ics(
+        items, encoding=encoding, errors=errors, buffer_size=buffer_size
+    )
+    for chunk in _stream(chunks, encoding, errors, sized=sized):
+        yield chunk
+
+
+def build_encoder(encoding, errors="strict"):
+    if legacy.PYTHON_3:
+        return lambda v: v
+    else:
+        return lambda v: v if v == None else v.encode(encoding, errors=errors)
+
+
+def dumps_json(
+    value, sort_keys=False, indent=None, separators=None, ensure_ascii=None, **kwargs
+):
+    result = _dumps_json(
+        value,
+        sort_keys=sort_keys,
+        indent=indent,
+        separators=separators,
+        ensure_ascii=ensure_ascii,
+        **kwargs
+    )
+    if isinstance(result, legacy.BYTES) and legacy.PYTHON_3:
+        result = result.decode("utf-8")
+    return result
+
+
+def dumps_json_b(
+    value,
+    encoding="utf-8",
+    sort_keys=False,
+    indent=None,
+    separators=None,
+    ensure_ascii=None,
+    **kwargs
+):
+    # in case the encoding is not UTF-8 (the one used by the native
+    # engines) the standard library engine is forced, as it's the only
+    # one that is able to produce the proper (escaped) output
+    is_utf8 = encoding.lower().replace("-", "") == "utf8"
+    result = _dumps_json(
+        value,
+        sort_keys=sort_keys,
+        indent=indent,
+        separators=separators,
+        ensure_ascii=ensure_ascii,
+        engine=None if is_utf8 else "json",
+        **kwargs
+    )
+    return legacy.bytes(result, encoding=encoding, force=True)
+
+
+def dumps_json_g(items, encoding="utf-8", sized=False, buffer_size=BUFFER_SIZE):
+    chunks = _dumps_json_g(items, encoding=encoding, buffer_size=buffer_size)
+    for chunk in _stream(chunks, encoding, "strict", sized=sized):
+        yield chunk
+
+
+def default_json(obj):
+    # in case the permissive mode is disabled (no JSON patching) the
+    # standard library behaviour is kept, raising for non native values
+    if not JSON_PERMISSIVE:
+        raise TypeError(
+            "Object of type %s is not JSON serializable" % obj.__class__.__name__
+        )
+
+    # tries to retrieve the encoder for the type of the object from
+    # the types cache and in case there's none resolves it (only once)
+    cls = obj.__class__
+    encoder = JSON_TYPES.get(cls, None)
+    if encoder == None:
+        encoder = _resolve_json(cls)
+        JSON_TYPES[cls] = encoder
+    return encoder(obj)
+
+
+def get_json_engine():
+    global JSON_ENGINE
+    if JSON_ENGINE:
+        return JSON_ENGINE
+    return set_json_engine(config.conf("JSON_ENGINE", "json"))
+
+
+def set_json_engine(name):
+    global JSON_ENGINE
+    available = dict(orjson=orjson, ujson=ujson, json=json)
+    if name == "auto":
+        name = [name for name in JSON_ENGINES if available[name]][0]
+    if not name in JSON_ENGINES:
+        raise exceptions.OperationalError(message="Invalid JSON engine '%s'" % name)
+    if not available[name]:
+        raise exceptions.OperationalError(
+            message="JSON engine '%s' is not available" % name
+        )
+    JSON_ENGINE = name
+    return JSON_ENGINE
+
+
+def set_json_permissive(permissive):
+    global JSON_PERMISSIVE
+    JSON_PERMISSIVE = permissive
+    return JSON_PERMISSIVE
+
+
+def _serialize_csv(
+    items,
+    encoding="utf-8",
+    errors="strict",
+    delimiter=";",
+    strict=False,
+    keys=None,
+    encoders=None,
+    buffer_size=None,
 ):
+    # retrieves the first element from the items (that may be a
+    # generic iterator) and uses it to determine if the current
+    # sequence to be serialized is map (or model) or sequence based
+    items = iter(items)
+    first = next(items, None)
+
     # verifies if the strict mode is active and there're no items defined
     # if that's the case an operational error is raised, otherwise an in
     # case the items are not provided the default (empty string) is returned
-    if strict and not items:
+    if strict and first == None:
         raise exceptions.OperationalError(
             message="Empty items object provided, no keys available"
         )
-    if not items:
-        return str()
+    if first == None:
+        return
 
     # builds the encoder taking into account the provided encoding string
     # value, this encoder will be used to encode each of the partial values
     # that is going to be set in the target CSV buffer
     encoder = build_encoder(encoding, errors=errors)
 
-    # retrieves the first element and uses it to determine if the current
-    # sequence to be serialized is map or sequence based
-    first = items[0]
-    is_map = type(first) == dict
+    is_model = isinstance(first, model.Model)
+    is_map = is_model or isinstance(first, dict)
 
     # retrieves the various keys from the first element of the provided sequence
-    # of items then runs the eager operation (list loading) and sorts the provided
-    # keys according to the default sorting order defined for the sequence, note
-    # that in case the sequence is not map based the first element is ignored
-    keys = first.keys() if is_map else first
-    keys = legacy.eager(keys)
+    # of items (in case they're not provided) then runs the eager operation (list
+    # loading) and sorts the keys according to the default sorting order defined
+    # for the sequence, note that in case the sequence is not map based the first
+    # element is considered to be the header and is not re-inserted in the items
     if is_map:
-        keys.sort()
+        sort = not keys
+        keys = keys or (first.model if is_model else first).keys()
+        keys = legacy.eager(keys)
+        if sort:
+            keys.sort()
+        items = itertools.chain((first,), items)
+    elif keys:
+        keys = legacy.eager(keys)
+        items = itertools.chain((first,), items)
     else:
-        items = items[1:]
+        keys = legacy.eager(first)
 
     # constructs the first row (names/keys row) using the gathered sequence of keys
     # and encoding them using the currently build encoder
     keys_row = [encoder(key) if type(key) == legacy.UNICODE else key for key in keys]
 
+    # builds the sequence of column encoders, one per key, that are going to
+    # be used to convert each of the row values, this way no per value type
+    # resolution is required in case the encoders are explicitly provided
+    encoders = encoders or dict()
+    if is_map:
+        default = (
+            serialize
+            if legacy.PYTHON_3
+            else lambda value: _encode(serialize(value), encoder)
+        )
+    else:
+        default = None if legacy.PYTHON_3 else lambda value: _encode(value, encoder)
+    columns = [encoders.get(key, default) for key in keys]
+    is_plain = all(column == None for column in columns)
+
     # creates the new string buffer and uses it as the basis for the construction of
     # the CSV writer object, writing then the already build first row
     buffer = legacy.StringIO()
     writer = csv.writer(buffer, delimiter=delimiter)
     writer.writerow(keys_row)
 
-    # iterates over the complete set of items to serialize each of it's attribute values
-    # using the order defined in the keys sequence that has been defined, note that
-    # this behavior is not applied to sequence based serialization (more linear)
+    # iterates over the complete set of items to serialize each of its attribute
+    # values using the order defined in the keys sequence, flushing the buffer
+    # to the caller every time its size reaches the requested chunk size
     for item in items:
-        # creates the list that is going to support the complete set of encoded
-        # values (according to the defined encoding) and then start the base row
-        # sequence with an empty value of the passed value (for map based values)
-        row_e = []
-        row = [] if is_map else item
-
-        # iterates over the complete set of values in the map and serializes each
-        # of them, adding then them to the base row sequence
-        for key in keys if is_map else ():
-            value = item[key]
-            value = serialize(value)
-            row.append(value)
-
-        # iterates over the complete set of row values to "sanitize" them by encoding
-        # them in case they are defined as unicode based values
-        for value in row:
-            is_unicode = isinstance(value, legacy.UNICODE)
-            if is_unicode:
-                value = encoder(value)
-            row_e.append(value)
-
-        # writes the encoded based row sequence to the writer in order to output the
-        # values to the output based stream
-        writer.writerow(row_e)
-
-    # retrieves the buffer string value as the resulting value and returns it to the
-    # caller method as the final result for the CSV serialization
+        if is_model:
+            item = item.model
+        if is_map:
+            row = [column(item[key]) for key, column in zip(keys, columns)]
+        elif is_plain:
+            row = item
+        else:
+            row = [
+                column(value) if column else value
+                for value, column in zip(item, columns)
+            ]
+        writer.writerow(row)
+
+        if buffer_size and buffer.tell() >= buffer_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    # yields the remaining contents of the buffer as the final chunk
+    # of the CSV serialization (in case there's any)
     result = buffer.getvalue()
-    return result
+    if result:
+        yield result
 
 
-def serialize_ics(items, encoding="utf-8", errors="strict"):
+def _serialize_ics(items, encoding="utf-8", errors="strict", buffer_size=None):
     encoder = build_encoder(encoding, errors=errors)
 
     buffer = legacy.StringIO()
@@ -153,24 +406,166 @@ def serialize_ics(items, encoding="utf-8", errors="strict"):
         timezone = encoder(timezone)
         _uuid = encoder(_uuid)
 
-        buffer.write("BEGIN:VEVENT\r\n")
-        buffer.write("UID:%s\r\n" % _uuid)
-        buffer.write("TZID:%s\r\n" % timezone)
-        buffer.write("DTSTART:%s\r\n" % start)
-        buffer.write("DTEND:%s\r\n" % end)
-        buffer.write("DTSTAMP:%s\r\n" % start)
-        buffer.write("SUMMARY:%s\r\n" % description)
-        buffer.write("LOCATION:%s\r\n" % location)
-        buffer.write("END:VEVENT\r\n")
+        buffer.write(
+            ICS_EVENT % (_uuid, timezone, start, end, start, description, location)
+        )
+
+        if buffer_size and buffer.tell() >= buffer_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
 
     buffer.write("END:VCALENDAR\r\n")
 
-    result = buffer.getvalue()
-    return result
+    yield buffer.getvalue()
 
 
-def build_encoder(encoding, errors="strict"):
-    if legacy.PYTHON_3:
-        return lambda v: v
-    else:
-        return lambda v: v if v == None else v.encode(encoding, errors=errors)
+def _encode(value, encoder):
+    if isinstance(value, legacy.UNICODE):
+        return encoder(value)
+    return value
+
+
+def _stream(chunks, encoding, errors, sized=False):
+    # retrieves the first chunk before anything else is yielded so that
+    # any validation error (eg: strict mode) is raised before the (unknown)
+    # size is yielded, as expected by the generator response path
+    first = next(chunks, None)
+    if sized:
+        yield -1
+    if first == None:
+        return
+
+    for chunk in itertools.chain((first,), chunks):
+        if isinstance(chunk, legacy.UNICODE):
+            chunk = chunk.encode(encoding, errors)
+        yield chunk
+
+
+def _dumps_json(
+    value,
+    sort_keys=False,
+    indent=None,
+    separators=None,
+    ensure_ascii=None,
+    engine=None,
+    **kwargs
+):
+    # determines the engine that is going to be used for the encoding,
+    # note that in case extra (standard library) arguments, ASCII escaping
+    # or non compact separators are explicitly requested the standard library
+    # engine is used, as the output of the native engines is always compact
+    # and not ASCII escaped (equivalent JSON)
+    engine = engine or get_json_engine()
+    if kwargs or ensure_ascii or not separators in (None, (",", ":")):
+        engine = "json"
+
+    # the standard library escapes non ASCII characters by default, as long
+    # as the caller does not explicitly request otherwise
+    if ensure_ascii == None:
+        ensure_ascii = True
+
+    # tries to use the native engines (faster) falling back to the standard
+    # library engine for the values (or options) they're not able to handle
+    # (eg: very large integers)
+    if engine == "orjson" and indent in (None, 2):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(value, default=default_json, option=option)
+        except TypeError:
+            pass
+    if engine == "ujson":
+        try:
+            return ujson.dumps(
+                value,
+                ensure_ascii=False,
+                sort_keys=sort_keys,
+                indent=indent or 0,
+                default=default_json,
+            )
+        except (TypeError, OverflowError):
+            pass
+
+    # in case there're no extra arguments uses the cached encoder for the
+    # current set of options, avoiding the (costly) encoder creation
+    if not kwargs:
+        key = (sort_keys, indent, separators, ensure_ascii)
+        encoder = JSON_ENCODERS.get(key, None)
+        if encoder == None:
+            encoder = json.JSONEncoder(
+                sort_keys=sort_keys,
+                indent=indent,
+                separators=separators,
+                ensure_ascii=ensure_ascii,
+                default=default_json,
+            )
+            JSON_ENCODERS[key] = encoder
+        return encoder.encode(value)
+
+    if not "cls" in kwargs:
+        kwargs["default"] = kwargs.get("default", default_json)
+    return json.dumps(
+        value,
+        sort_keys=sort_keys,
+        indent=indent,
+        separators=separators,
+        ensure_ascii=ensure_ascii,
+        **kwargs
+    )
+
+
+def _dumps_json_g(items, encoding="utf-8", buffer_size=None, batch_size=JSON_BATCH):
+    # in case the encoding is not UTF-8 the batches are encoded as text and
+    # transcoded by a single incremental encoder, as the brackets and the
+    # separators are only single bytes in ASCII compatible encodings (and
+    # some encodings have state, eg: the byte order mark of UTF-16)
+    is_utf8 = encoding.lower().replace("-", "") == "utf8"
+    encoder = None if is_utf8 else codecs.getincrementalencoder(encoding)()
+    encode = lambda value, final=False: (
+        encoder.encode(value, final) if encoder else legacy.bytes(value)
+    )
+
+    # iterates over the complete set of items grouping them in batches that
+    # are encoded at once (as an array without the brackets), flushing the
+    # buffer every time its size reaches the requested chunk size
+    buffer = [encode("[")]
+    size = len(buffer[0])
+    comma = encode(",")
+    first = True
+    batch = []
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            break
+        if encoder:
+            data = encode(legacy.u(dumps_json(batch))[1:-1])
+        else:
+            data = dumps_json_b(batch)[1:-1]
+        if not first:
+            buffer.append(comma)
+            size += len(comma)
+        buffer.append(data)
+        size += len(data)
+        first = False
+        if buffer_size and size >= buffer_size:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+
+    buffer.append(encode("]", final=True))
+    yield b"".join(buffer)
+
+
+def _resolve_json(cls):
+    if hasattr(cls, "json_v"):
+        return lambda obj: obj.json_v()
+    if mongo.bson and issubclass(cls, mongo.bson.objectid.ObjectId):
+        return str
+    if issubclass(cls, legacy.BYTES):
+        return lambda obj: legacy.str(obj, encoding="utf-8")
+    return str
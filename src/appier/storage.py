@@ -29,11 +29,28 @@ __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
 import os
+import hashlib
 import tempfile
+import threading
 
 from . import config
+from . import legacy
+from . import structures
 from . import exceptions
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CHUNK_SIZE = 4194304
+""" The default size in bytes of each of the blocks (chunks)
+in which the files are split by the chunk storage engine """
+
+CONTENT_LIMIT = 1048576
+""" The default maximum size in bytes of a content to be kept
+in the (local) read cache of the content storage engine """
+
 
 class StorageEngine(object):
     @classmethod
@@ -72,6 +89,26 @@ class StorageEngine(object):
     def _compute(cls, file, *args, **kwargs):
         file._compute(*args, **kwargs)
 
+    @classmethod
+    def _chunks(cls, file, chunk_size):
+        # in case the file contains data in memory uses it as the
+        # source of the chunks, slicing it into the blocks
+        if file._has_data():
+            data = file.data
+            for index in range(0, len(data), chunk_size):
+                yield data[index : index + chunk_size]
+            return
+
+        # otherwise tries to use the underlying file (eg: upload) as
+        # the source reading it one chunk at a time (bounded memory)
+        if not file.file or not hasattr(file.file, "read"):
+            return
+        while True:
+            chunk = file.file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
 
 class BaseEngine(StorageEngine):
     @classmethod
@@ -81,7 +118,7 @@ class BaseEngine(StorageEngine):
         force = kwargs.get("force", False)
         if not file.file_name:
             return
-        if file.data and not force:
+        if file._has_data() and not force:
             return
 
         path = tempfile.mkdtemp()
@@ -262,3 +299,479 @@ class FsEngine(StorageEngine):
         # method so that it can be used for reading or writing
         os.makedirs(dir_path)
         return file_path
+
+
+class ChunkEngine(StorageEngine):
+    """
+    Storage engine that persists the files as a sequence of fixed
+    size blocks (chunks) under a per file directory, so that large
+    files never have to be fully loaded into memory either for the
+    reading (streaming) or for the seeking operations.
+    """
+
+    @classmethod
+    def store(  # pyright: ignore[reportIncompatibleMethodOverride]
+        cls, file, *args, **kwargs
+    ):
+        dir_path = cls._dir_path(file)
+        chunk_size = config.conf("FS_CHUNK_SIZE", CHUNK_SIZE, cast=int)
+
+        # iterates over the complete set of chunks of the file writing
+        # each of them into its own (sequentially named) file
+        count = 0
+        for chunk in cls._chunks(file, chunk_size):
+            chunk_path = os.path.join(dir_path, cls._name(count))
+            handle = open(chunk_path, "wb")
+            try:
+                handle.write(chunk)
+            finally:
+                handle.close()
+            count += 1
+
+        # removes any chunks that may remain from a previous (larger)
+        # version of the file, so that these are not considered
+        for name in cls._names(dir_path)[count:]:
+            os.remove(os.path.join(dir_path, name))
+
+    @classmethod
+    def load(  # pyright: ignore[reportIncompatibleMethodOverride]
+        cls, file, *args, **kwargs
+    ):
+        cls._compute(file)
+
+    @classmethod
+    def delete(  # pyright: ignore[reportIncompatibleMethodOverride]
+        cls, file, *args, **kwargs
+    ):
+        dir_path = cls._dir_path(file, ensure=False)
+        if not os.path.exists(dir_path):
+            return
+        for name in cls._names(dir_path):
+            os.remove(os.path.join(dir_path, name))
+        os.rmdir(dir_path)
+
+    @classmethod
+    def read(  # pyright: ignore[reportIncompatibleMethodOverride]
+        cls, file, *args, **kwargs
+    ):
+        size = kwargs.get("size", None)
+        pending = size or 0
+        buffer = []
+
+        # iterates over the sequence of chunks reading data from the
+        # current one until either the requested size is fulfilled or
+        # the last chunk of the file is exhausted
+        while True:
+            handle = cls._handle(file)
+            if not handle:
+                break
+            data = handle.read(pending) if size else handle.read()
+            if not data:
+                cls._next(file)
+                continue
+            buffer.append(data)
+            if not size:
+                continue
+            pending -= len(data)
+            if pending == 0:
+                break
+
+        data = b"".join(buffer)
+        is_final = True if not size or not data else False
+        if is_final:
+            cls.cleanup(file)
+        return data
+
+    @classmethod
+    def seek(  # pyright: ignore[reportIncompatibleMethodOverride]
+        cls, file, *args, **kwargs
+    ):
+        offset = kwargs.get("offset", None)
+        if offset == None:
+            return
+
+        # determines the size of the chunks from the first one (all
+        # of the chunks but the last are of the same size) and uses
+        # it to determine the chunk and the offset inside of it
+        dir_path = cls._dir_path(file, ensure=False)
+        first_path = os.path.join(dir_path, cls._name(0))
+        chunk_size = os.path.getsize(first_path) if os.path.exists(first_path) else 0
+        index = offset // chunk_size if chunk_size else 0
+        offset = offset % chunk_size if chunk_size else 0
+
+        cls.cleanup(file)
+        file._chunk = index
+        handle = cls._handle(file)
+        if not handle:
+            return
+        handle.seek(offset)
+
+    @classmethod
+    def cleanup(  # pyright: ignore[reportIncompatibleMethodOverride]
+        cls, file, *args, **kwargs
+    ):
+        if hasattr(file, "_chunk"):
+            del file._chunk
+        if not hasattr(file, "_handle"):
+            return
+        file._handle.close()
+        del file._handle
+
+    @classmethod
+    def is_seekable(cls):  # pyright: ignore[reportIncompatibleMethodOverride]
+        return True
+
+    @classmethod
+    def _compute(cls, file):
+        dir_path = cls._dir_path(file, ensure=False)
+        names = cls._names(dir_path)
+        paths = [os.path.join(dir_path, name) for name in names]
+        size = sum(os.path.getsize(path) for path in paths)
+        mtime = os.path.getmtime(paths[-1] if paths else dir_path)
+        file.hash = str(mtime)
+        file.size = size
+        file.etag = str(mtime)
+
+    @classmethod
+    def _handle(cls, file):
+        handle = hasattr(file, "_handle") and file._handle
+        if handle:
+            return handle
+        index = file._chunk if hasattr(file, "_chunk") else 0
+        dir_path = cls._dir_path(file, ensure=False)
+        chunk_path = os.path.join(dir_path, cls._name(index))
+        if not os.path.exists(chunk_path):
+            return None
+        handle = open(chunk_path, "rb")
+        file._chunk = index
+        file._handle = handle
+        return handle
+
+    @classmethod
+    def _next(cls, file):
+        index = file._chunk if hasattr(file, "_chunk") else 0
+        cls.cleanup(file)
+        file._chunk = index + 1
+
+    @classmethod
+    def _name(cls, index):
+        return "%08d" % index
+
+    @classmethod
+    def _names(cls, dir_path):
+        if not os.path.exists(dir_path):
+            return []
+        names = [name for name in os.listdir(dir_path) if name.isdigit()]
+        names.sort()
+        return names
+
+    @classmethod
+    def _dir_path(cls, file, ensure=True, base=None):
+        # verifies that the standard params value is defined and
+        # if that's not the case defaults the value, then tries to
+        # retrieve the directory path from the params
+        params = file.params or {}
+        dir_path = params.get("dir_path", None)
+
+        # resolves the base path (shared with the file system engine)
+        # and defines the default directory path for the file chunks
+        base = base or config.conf("FS_PATH", "~/.data")
+        dir_path = dir_path or os.path.join(base, file.guid)
+        dir_path = os.path.expanduser(dir_path)
+        dir_path = os.path.normpath(dir_path)
+
+        # in case the ensure flag is set and the directory does not
+        # exists creates it (including the parent directories)
+        if ensure and not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        return dir_path
+
+
+class ContentEngine(FsEngine):
+    """
+    Content addressed storage engine that stores each file under
+    a path derived from the SHA-256 digest of its contents, so that
+    identical files are stored only once (deduplicated).
+
+    Each stored content keeps the set of files (guids) referencing
+    it and is only removed once the last of them is deleted, the
+    digest is also used as a stable (strong) hash and etag value.
+
+    The references are shared among processes (eg: forked workers)
+    so their changes are serialized with a file lock when available.
+    """
+
+    LOCK = threading.RLock()
+    """ The lock that controls the access to the references of
+    the contents and to the read cache, ensuring thread safety,
+    the cross process safety is ensured by a file lock """
+
+    CACHE = structures.LimitedSizeDict(max_size=128)
+    """ The (local) read cache mapping the digest of the contents
+    with their data, shared among every file of the same content """
+
+    @classmethod
+    def store(  # pyright: ignore[reportIncompatibleMethodOverride]
+        cls, file, *args, **kwargs
+    ):
+        params = dict(file.params or {})
+        previous = params.get("digest", None)
+
+        # in case there's no contents available for the file (eg: file
+        # loaded from the data source) there's nothing to be stored as
+        # the previously stored content remains valid
+        if not file._has_data() and not file.file:
+            return
+
+        # computes the digest of the contents (spooling them into a
+        # temporary file) and moves the temporary file into the final
+        # path in case the content does not exist yet (deduplication)
+        digest, temp_path = cls._spool(file)
+        params["digest"] = digest
+        file.params = params
+        file_path = cls._file_path(file)
+        try:
+            lock = cls._lock()
+            try:
+                if temp_path and not os.path.exists(file_path):
+                    os.rename(temp_path, file_path)
+                    temp_path = None
+                if not os.path.exists(file_path):
+                    cls._write(file_path, file.data or b"")
+                cls._acquire(digest, file.guid)
+                if previous and not previous == digest:
+                    cls._release(previous, file.guid)
+            finally:
+                cls._unlock(lock)
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+
+        cls._compute(file)
+
+    @classmethod
+    def delete(  # pyright: ignore[reportIncompatibleMethodOverride]
+        cls, file, *args, **kwargs
+    ):
+        params = file.params or {}
+        digest = params.get("digest", None)
+        if not digest:
+            return
+        lock = cls._lock()
+        try:
+            cls._release(digest, file.guid)
+        finally:
+            cls._unlock(lock)
+
+    @classmethod
+    def clear_cache(cls):
+        cls.LOCK.acquire()
+        try:
+            cls.CACHE.clear()
+        finally:
+            cls.LOCK.release()
+
+    @classmethod
+    def _lock(cls):
+        # acquires the (thread) lock and then, in case file locking is
+        # available, the file lock under the base path so that changes
+        # from other processes are also excluded
+        cls.LOCK.acquire()
+        if not fcntl:
+            return None
+        try:
+            base_path = cls._base_path(ensure=True)
+            lock = open(os.path.join(base_path, ".lock"), "a")
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        except Exception:
+            cls.LOCK.release()
+            raise
+        return lock
+
+    @classmethod
+    def _unlock(cls, lock):
+        try:
+            if not lock:
+                return
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            lock.close()
+        finally:
+            cls.LOCK.release()
+
+    @classmethod
+    def _compute(cls, file):
+        params = file.params or {}
+        digest = params.get("digest", None)
+        if not digest:
+            return
+        file_path = cls._file_path(file, ensure=False)
+        file.hash = digest
+        file.size = os.path.getsize(file_path)
+        file.etag = digest
+
+    @classmethod
+    def _handle(cls, file):
+        handle = hasattr(file, "_handle") and file._handle
+        if handle:
+            return handle
+
+        # tries to retrieve the contents from the (local) read cache,
+        # reading and caching them in case they are small enough
+        data = cls._cached(file)
+        if data == None:
+            handle = open(cls._file_path(file, ensure=False), "rb")
+        else:
+            handle = legacy.BytesIO(data)
+
+        file._handle = handle
+        return handle
+
+    @classmethod
+    def _cached(cls, file):
+        # determines the maximum number of items in the cache, in case
+        # it's not set (default) the cache is considered to be disabled
+        cache_size = config.conf("CONTENT_CACHE", 0, cast=int)
+        if not cache_size:
+            return None
+
+        params = file.params or {}
+        digest = params.get("digest", None)
+
+        cls.LOCK.acquire()
+        try:
+            cls.CACHE.max_size = cache_size
+            if digest in cls.CACHE:
+                return cls.CACHE[digest]
+        finally:
+            cls.LOCK.release()
+
+        file_path = cls._file_path(file, ensure=False)
+        limit = config.conf("CONTENT_CACHE_LIMIT", CONTENT_LIMIT, cast=int)
+        if os.path.getsize(file_path) > limit:
+            return None
+
+        handle = open(file_path, "rb")
+        try:
+            data = handle.read()
+        finally:
+            handle.close()
+
+        cls.LOCK.acquire()
+        try:
+            cls.CACHE[digest] = data
+        finally:
+            cls.LOCK.release()
+
+        return data
+
+    @classmethod
+    def _spool(cls, file):
+        # in case the data is available in memory the digest is
+        # computed directly from it and no spooling is required
+        if file._has_data():
+            digest = hashlib.sha256(file.data).hexdigest()
+            return digest, None
+
+        # otherwise reads the underlying file in chunks updating the
+        # digest and writing the chunks into a temporary file under
+        # the base path (so that it can be atomically renamed)
+        base_path = cls._base_path(ensure=True)
+        fd, temp_path = tempfile.mkstemp(dir=base_path)
+        hash = hashlib.sha256()
+        handle = os.fdopen(fd, "wb")
+        try:
+            for chunk in cls._chunks(file, CHUNK_SIZE):
+                hash.update(chunk)
+                handle.write(chunk)
+        finally:
+            handle.close()
+        return hash.hexdigest(), temp_path
+
+    @classmethod
+    def _acquire(cls, digest, guid):
+        refs = cls._refs(digest)
+        if guid in refs:
+            return
+        refs.add(guid)
+        cls._refs_w(digest, refs)
+
+    @classmethod
+    def _release(cls, digest, guid):
+        refs = cls._refs(digest)
+        refs.discard(guid)
+        if refs:
+            cls._refs_w(digest, refs)
+            return
+
+        # the last reference to the content has been removed, meaning
+        # that both the content and its references file are removed
+        file_path = cls._path(digest)
+        refs_path = file_path + ".refs"
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        if os.path.exists(refs_path):
+            os.remove(refs_path)
+        cls.CACHE.pop(digest, None)
+
+    @classmethod
+    def _refs(cls, digest):
+        refs_path = cls._path(digest) + ".refs"
+        if not os.path.exists(refs_path):
+            return set()
+        handle = open(refs_path, "rb")
+        try:
+            data = handle.read()
+        finally:
+            handle.close()
+        data = legacy.str(data)
+        return set(value for value in data.split("\n") if value)
+
+    @classmethod
+    def _refs_w(cls, digest, refs):
+        refs_path = cls._path(digest) + ".refs"
+        data = "\n".join(sorted(refs))
+        cls._write(refs_path, legacy.bytes(data))
+
+    @classmethod
+    def _write(cls, path, data):
+        # writes the data to a (uniquely named) temporary file and then
+        # renames it to the target path so that the write operation is atomic
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        handle = os.fdopen(fd, "wb")
+        try:
+            handle.write(data)
+        finally:
+            handle.close()
+        replace = getattr(os, "replace", None)
+        if replace:
+            replace(temp_path, path)
+            return
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+
+    @classmethod
+    def _file_path(cls, file, ensure=True, base=None):
+        params = file.params or {}
+        digest = params.get("digest", None)
+        if not digest:
+            raise exceptions.OperationalError(message="No content digest for file")
+        return cls._path(digest, ensure=ensure, base=base)
+
+    @classmethod
+    def _path(cls, digest, ensure=False, base=None):
+        base_path = cls._base_path(ensure=ensure, base=base)
+        dir_path = os.path.join(base_path, digest[:2])
+        if ensure and not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        return os.path.join(dir_path, digest)
+
+    @classmethod
+    def _base_path(cls, ensure=False, base=None):
+        base = base or config.conf("FS_PATH", "~/.data")
+        base_path = os.path.join(base, "content")
+        base_path = os.path.expanduser(base_path)
+        base_path = os.path.normpath(base_path)
+        if ensure and not os.path.exists(base_path):
+            os.makedirs(base_path)
+        return base_path
@@ -1,7 +1,13 @@
-from typing import Any
+from threading import RLock
+from typing import IO, Any, Iterator
+
+from .structures import LimitedSizeDict
 
 from .typesf import File
 
+CHUNK_SIZE: int
+CONTENT_LIMIT: int
+
 class StorageEngine:
     @classmethod
     def load(cls, file: File, *args, **kwargs) -> None: ...
@@ -21,6 +27,8 @@ class StorageEngine:
     def is_stored(cls) -> bool: ...
     @classmethod
     def _compute(cls, file: File, *args, **kwargs) -> None: ...
+    @classmethod
+    def _chunks(cls, file: File, chunk_size: int) -> Iterator[bytes]: ...
 
 class BaseEngine(StorageEngine):
     @classmethod
@@ -59,3 +67,73 @@ class FsEngine(StorageEngine):
     def _file_path(
         cls, file: File, ensure: bool = ..., base: str | None = ...
     ) -> str: ...
+
+class ChunkEngine(StorageEngine):
+    @classmethod
+    def store(cls, file: File, *args, **kwargs) -> None: ...
+    @classmethod
+    def load(cls, file: File, *args, **kwargs) -> None: ...
+    @classmethod
+    def delete(cls, file: File, *args, **kwargs) -> None: ...
+    @classmethod
+    def read(cls, file: File, *args, **kwargs) -> bytes | None: ...
+    @classmethod
+    def seek(cls, file: File, *args, **kwargs) -> None: ...
+    @classmethod
+    def cleanup(cls, file: File, *args, **kwargs) -> None: ...
+    @classmethod
+    def is_seekable(cls) -> bool: ...
+    @classmethod
+    def _compute(cls, file: File) -> None: ...
+    @classmethod
+    def _handle(cls, file: File) -> Any: ...
+    @classmethod
+    def _next(cls, file: File) -> None: ...
+    @classmethod
+    def _name(cls, index: int) -> str: ...
+    @classmethod
+    def _names(cls, dir_path: str) -> list[str]: ...
+    @classmethod
+    def _dir_path(
+        cls, file: File, ensure: bool = ..., base: str | None = ...
+    ) -> str: ...
+
+class ContentEngine(FsEngine):
+    LOCK: RLock
+    CACHE: LimitedSizeDict
+    @classmethod
+    def store(cls, file: File, *args, **kwargs) -> None: ...
+    @classmethod
+    def delete(cls, file: File, *args, **kwargs) -> None: ...
+    @classmethod
+    def clear_cache(cls) -> None: ...
+    @classmethod
+    def _lock(cls) -> IO[str] | None: ...
+    @classmethod
+    def _unlock(cls, lock: IO[str] | None) -> None: ...
+    @classmethod
+    def _compute(cls, file: File) -> None: ...
+    @classmethod
+    def _handle(cls, file: File) -> Any: ...
+    @classmethod
+    def _cached(cls, file: File) -> bytes | None: ...
+    @classmethod
+    def _spool(cls, file: File) -> tuple[str, str | None]: ...
+    @classmethod
+    def _acquire(cls, digest: str, guid: str) -> None: ...
+    @classmethod
+    def _release(cls, digest: str, guid: str) -> None: ...
+    @classmethod
+    def _refs(cls, digest: str) -> set[str]: ...
+    @classmethod
+    def _refs_w(cls, digest: str, refs: set[str]) -> None: ...
+    @classmethod
+    def _write(cls, path: str, data: bytes) -> None: ...
+    @classmethod
+    def _file_path(
+        cls, file: File, ensure: bool = ..., base: str | None = ...
+    ) -> str: ...
+    @classmethod
+    def _path(cls, digest: str, ensure: bool = ..., base: str | None = ...) -> str: ...
+    @classmethod
+    def _base_path(cls, ensure: bool = ..., base: str | None = ...) -> str: ...
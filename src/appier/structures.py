@@ -301,10 +301,102 @@ class LimitedSizeDict(dict):
             self._order.remove(key)
         elif len(self) >= self.max_size:
             oldest_key = self._order.popleft()
-            del self[oldest_key]
+            dict.__delitem__(self, oldest_key)
         dict.__setitem__(self, key, value)
         self._order.append(key)
 
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._order.remove(key)
+
+    def pop(self, key, *args):
+        if key in self:
+            self._order.remove(key)
+        return dict.pop(self, key, *args)
+
+    def clear(self):
+        dict.clear(self)
+        self._order.clear()
+
+
+class LRUDict(dict):
+    """
+    Size limited dictionary that removes the least recently
+    used item once the maximum size is reached.
+
+    Both the access and the insertion of an item are considered
+    usages, the order is kept using a circular doubly linked list
+    so that every operation runs in constant time.
+    """
+
+    def __init__(self, max_size=128):
+        dict.__init__(self)
+        self.max_size = max_size
+        self._links = dict()
+        self._root = []
+        self._root[:] = [self._root, self._root, None]
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        self._touch(key)
+        return value
+
+    def __setitem__(self, key, value):
+        # in case the maximum size is not positive (eg: caching disabled)
+        # there's no room for any item and so nothing is stored
+        if self.max_size <= 0:
+            return
+        if key in self:
+            self._touch(key)
+        else:
+            if len(self) >= self.max_size:
+                self._evict()
+            self._append(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._unlink(self._links.pop(key))
+
+    def get(self, key, default=None):
+        if not key in self:
+            return default
+        return self[key]
+
+    def pop(self, key, *args):
+        if key in self:
+            self._unlink(self._links.pop(key))
+        return dict.pop(self, key, *args)
+
+    def clear(self):
+        dict.clear(self)
+        self._links.clear()
+        self._root[:] = [self._root, self._root, None]
+
+    def _append(self, key):
+        root = self._root
+        last = root[0]
+        link = [last, root, key]
+        last[1] = link
+        root[0] = link
+        self._links[key] = link
+
+    def _unlink(self, link):
+        previous, next, _key = link
+        previous[1] = next
+        next[0] = previous
+
+    def _touch(self, key):
+        self._unlink(self._links[key])
+        self._append(key)
+
+    def _evict(self):
+        link = self._root[1]
+        key = link[2]
+        self._unlink(link)
+        del self._links[key]
+        dict.__delitem__(self, key)
+
 
 lazy_dict = LazyDict
 lazy = LazyValue
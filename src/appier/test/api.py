@@ -28,6 +28,7 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import time
 import unittest
 
 import appier
@@ -147,3 +148,52 @@ class APITest(unittest.TestCase):
         self.assertEqual(result["uuid"], "abc")
         self.assertEqual("token" in result, False)
         self.assertEqual(isinstance(result, appier.OrderedDict), True)
+
+    def test_gather(self):
+        def sleep(value):
+            time.sleep(0.2)
+            return value
+
+        def fail():
+            raise RuntimeError("fail")
+
+        start = time.time()
+        result = appier.gather(
+            [(sleep, (index,)) for index in range(5)] + [lambda: "last"], workers=6
+        )
+        self.assertEqual(result, [0, 1, 2, 3, 4, "last"])
+        self.assertEqual(time.time() - start < 0.6, True)
+
+        result = appier.gather([(sleep, (), dict(value=1)), (sleep, (2,))], workers=1)
+        self.assertEqual(result, [1, 2])
+
+        result = appier.gather([])
+        self.assertEqual(result, [])
+
+        self.assertRaises(RuntimeError, appier.gather, [lambda: 1, fail])
+
+        result = appier.gather([lambda: 1, fail], raise_e=False)
+        self.assertEqual(result[0], 1)
+        self.assertEqual(isinstance(result[1], RuntimeError), True)
+
+    def test_gather_a(self):
+        if not appier.legacy.PYTHON_ASYNC:
+            self.skipTest("No asyncio support available")
+
+        import asyncio
+
+        def sleep(value):
+            time.sleep(0.2)
+            return value
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            start = time.time()
+            future = appier.gather_a([(sleep, (index,)) for index in range(4)])
+            result = loop.run_until_complete(future)
+            self.assertEqual(result, [0, 1, 2, 3])
+            self.assertEqual(time.time() - start < 0.6, True)
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
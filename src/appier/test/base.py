@@ -28,6 +28,10 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import os
+import json
+import shutil
+import tempfile
 import unittest
 
 import appier
@@ -163,6 +167,44 @@ class BaseTest(unittest.TestCase):
         result = self.app.has_locale("hello", context="extra")
         self.assertEqual(result, False)
 
+    def test_bundles(self):
+        bundles_path = tempfile.mkdtemp()
+        try:
+            file = open(os.path.join(bundles_path, "extra.pt_pt.json"), "wb")
+            try:
+                file.write(json.dumps(dict(hello="Olá")).encode("utf-8"))
+            finally:
+                file.close()
+
+            self.app._load_bundles(bundles_path=bundles_path)
+
+            result = self.app.to_locale("hello", locale="pt_pt")
+            self.assertEqual(result, appier.legacy.u("Olá"))
+
+            result = self.app.to_locale("hello", locale="pt_pt", context="extra")
+            self.assertEqual(result, appier.legacy.u("Olá"))
+
+            result = self.app.to_locale("hello", locale="en_us")
+            self.assertEqual(result, "hello")
+
+            self.app._unload_bundles(bundles_path=bundles_path)
+
+            result = self.app.to_locale("hello", locale="pt_pt")
+            self.assertEqual(result, "hello")
+
+            file = open(os.path.join(bundles_path, "extra.pt_pt.json"), "wb")
+            try:
+                file.write(json.dumps(dict(hello="Olá!")).encode("utf-8"))
+            finally:
+                file.close()
+
+            self.app._load_bundles(bundles_path=bundles_path)
+
+            result = self.app.to_locale("hello", locale="pt_pt")
+            self.assertEqual(result, "Olá!")
+        finally:
+            shutil.rmtree(bundles_path, ignore_errors=True)
+
     def test_field(self):
         request = appier.Request("GET", "/")
         request.set_params(
@@ -0,0 +1,194 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+
+import os
+import time
+import unittest
+import threading
+
+import appier
+
+
+class BusTest(unittest.TestCase):
+    def setUp(self):
+        self.app = appier.App()
+
+    def tearDown(self):
+        self.app.unload()
+
+    def test_memory(self):
+        bus = appier.MemoryBus.new()
+        values = []
+
+        bus.bind("event", lambda value: values.append(value))
+        bus.trigger("event", 1)
+        bus.trigger("event", 2)
+
+        self.assertEqual(values, [1, 2])
+
+    def test_local(self):
+        bus = appier.LocalBus.new()
+        values = []
+
+        bus.bind("event", lambda value: values.append(value))
+        bus.trigger("event", 1)
+        bus.trigger("event", 2)
+
+        self.assertEqual(values, [1, 2])
+
+        bus.unload()
+
+    def test_local_fork(self):
+        if not hasattr(os, "fork"):
+            if not hasattr(self, "skipTest"):
+                return
+            self.skipTest("No fork support available")
+
+        bus = appier.LocalBus.new()
+        event = threading.Event()
+        values = []
+
+        def on_pong(value):
+            values.append(value)
+            event.set()
+
+        bus.bind("pong", on_pong)
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                bus.reload()
+                bus.trigger("pong", os.getpid())
+                time.sleep(0.1)
+                bus.unload()
+            finally:
+                os._exit(0)
+
+        event.wait(10.0)
+        os.waitpid(pid, 0)
+
+        self.assertEqual(values, [pid])
+
+        bus.unload()
+
+    def test_local_writer(self):
+        event = threading.Event()
+
+        class SlowConnection(object):
+            def __init__(self):
+                self.messages = []
+                self.closed = False
+
+            def send(self, message):
+                event.wait(10.0)
+                self.messages.append(message)
+
+            def close(self):
+                self.closed = True
+
+        broker = appier.bus.get_broker()
+        connection = SlowConnection()
+        broker.on_connection(connection)
+        writer = broker._writers[connection]
+
+        try:
+            broker.publish("event", b"first")
+            broker.publish("event", b"second")
+            self.assertEqual(connection.messages, [])
+        finally:
+            event.set()
+            broker._remove(connection)
+
+        writer.join(10.0)
+
+        self.assertEqual(
+            connection.messages, [("event", b"first"), ("event", b"second")]
+        )
+        self.assertEqual(connection.closed, True)
+        self.assertEqual(connection in broker._writers, False)
+        self.assertEqual(broker is appier.bus.get_broker(), True)
+        self.assertEqual(broker is appier.queuing.get_server(), False)
+
+    def test_local_writer_bounded(self):
+        broker = appier.bus.get_broker()
+        writer = appier.bus.LocalWriter(broker, None, max_size=2)
+
+        writer.put(("event", b"first"))
+        writer.put(("event", b"second"))
+        writer.put(("event", b"third"))
+
+        self.assertEqual(writer.dropped, 1)
+        self.assertEqual(writer.queue.qsize(), 2)
+
+        writer.stop()
+
+        self.assertEqual(writer._stopped, True)
+
+    def test_redis_batch(self):
+        try:
+            bus = appier.RedisBus.new(batch=60.0, coalesce=True)
+        except Exception:
+            if not hasattr(self, "skipTest"):
+                return
+            self.skipTest("No Redis server present")
+
+        bus.trigger("event", 1)
+        bus.trigger("event", 1)
+        bus.trigger("event", 2)
+
+        items, _keys = bus._buffer[bus._to_channel("event")]
+
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[0], dict(args=(1,), kwargs=dict()))
+        self.assertEqual(items[1], dict(args=(2,), kwargs=dict()))
+
+        values = []
+        bus._dispatch([lambda value: values.append(value)], items)
+
+        self.assertEqual(values, [1, 2])
+
+        bus.flush()
+
+        self.assertEqual(bus._buffer, dict())
+
+        bus.coalesce("change", lambda name, version: name)
+        bus.trigger("change", "first", 1)
+        bus.trigger("change", "second", 1)
+        bus.trigger("change", "first", 2)
+
+        items, _keys = bus._buffer[bus._to_channel("change")]
+
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[0], dict(args=("first", 2), kwargs=dict()))
+        self.assertEqual(items[1], dict(args=("second", 1), kwargs=dict()))
+
+        bus.flush()
+        bus.unload()
@@ -75,3 +75,67 @@ class CryptTest(unittest.TestCase):
         data = spritz.decrypt(result)
 
         self.assertEqual(data, b"hello world")
+
+    def test_chunked(self):
+        data = b"hello world" * 100
+
+        for name in ("rc4", "spritz"):
+            cipher = appier.Cipher.new(name, b"hello key")
+            result = cipher.encrypt(data)
+
+            cipher = appier.Cipher.new(name, b"hello key")
+            result_c = cipher.encrypt(data[:7]) + cipher.encrypt(data[7:])
+
+            self.assertEqual(result_c, result)
+            self.assertEqual(cipher.encrypt(b""), b"")
+
+            cipher = appier.Cipher.new(name, b"hello key")
+            self.assertEqual(cipher.decrypt(result), data)
+
+    def test_spritz_absorb(self):
+        spritz = appier.Spritz(b"hello key")
+        result = spritz.encrypt(b"hello world")
+
+        spritz = appier.Spritz(b"hello key")
+        spritz.absorb(b"nonce")
+        result_n = spritz.encrypt(b"hello world")
+
+        self.assertNotEqual(result_n, result)
+
+        spritz = appier.Spritz(b"hello key")
+        spritz.absorb(b"nonce")
+        data = spritz.decrypt(result_n)
+
+        self.assertEqual(data, b"hello world")
+
+    def test_spritz_long_key(self):
+        spritz = appier.Spritz(b"k" * 200)
+        result = spritz.encrypt(b"hello world")
+
+        spritz = appier.Spritz(b"k" * 200)
+        data = spritz.decrypt(result)
+
+        self.assertEqual(data, b"hello world")
+        self.assertNotEqual(result, b"hello world")
+
+    def test_spritz_shuffle(self):
+        spritz = appier.Spritz(b"hello key")
+        spritz.squeeze(10)
+        spritz.shuffle()
+        result = spritz.squeeze(10)
+
+        self.assertEqual(result, b"9\x0c\x88\xdd\x9af\xf7\xe9\xad\x95")
+
+        spritz = appier.Spritz(b"hello key")
+        spritz.shuffle()
+        spritz.shuffle()
+        result = spritz.squeeze(10)
+
+        self.assertEqual(result, b"\x19\xe5'\x9eKp(\x80F\xf4")
+
+        spritz = appier.Spritz(b"hello key")
+        spritz.whip(16)
+        spritz.shuffle()
+        result = spritz.squeeze(10)
+
+        self.assertEqual(result, b'\xe7\xea\xaf\xfb\x8a\x9d\x18b"\xd1')
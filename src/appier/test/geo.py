@@ -0,0 +1,229 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+
+import os
+import struct
+import tempfile
+import unittest
+
+import appier
+
+try:
+    import maxminddb
+except ImportError:
+    maxminddb = None
+
+NETWORKS = (
+    (
+        "1.2.3.0/24",
+        dict(
+            city=dict(names=dict(en="Porto", pt="Porto")),
+            country=dict(iso_code="PT", names=dict(en="Portugal")),
+            continent=dict(code="EU", names=dict(en="Europe")),
+            location=dict(latitude=41.15, longitude=-8.61),
+            postal=dict(code="4000"),
+        ),
+    ),
+    (
+        "8.8.8.8/32",
+        dict(
+            country=dict(iso_code="US", names=dict(en="United States")),
+            continent=dict(code="NA", names=dict(en="North America")),
+        ),
+    ),
+)
+""" The sequence of networks (and associated records) that are
+going to be stored in the locally generated database fixture """
+
+
+class GeoTest(unittest.TestCase):
+    def setUp(self):
+        if not maxminddb:
+            if not hasattr(self, "skipTest"):
+                return
+            self.skipTest("No maxminddb module present")
+
+        self.path = tempfile.mktemp(suffix=".mmdb")
+        file = open(self.path, "wb")
+        try:
+            file.write(_build_db(NETWORKS))
+        finally:
+            file.close()
+
+        appier.GeoResolver.load(path=self.path)
+
+    def tearDown(self):
+        if not maxminddb:
+            return
+        appier.GeoResolver.unload()
+        os.remove(self.path)
+
+    def test_resolve(self):
+        result = appier.GeoResolver.resolve("1.2.3.4")
+
+        self.assertEqual(
+            result,
+            dict(
+                city=dict(name="Porto"),
+                country=dict(iso_code="PT", name="Portugal"),
+                continent=dict(code="EU", name="Europe"),
+                location=dict(latitude=41.15, longitude=-8.61),
+            ),
+        )
+
+        result = appier.GeoResolver.resolve("1.2.3.4", simplified=False)
+
+        self.assertEqual(result["postal"], dict(code="4000"))
+        self.assertEqual(result["city"]["names"], dict(en="Porto", pt="Porto"))
+
+        result = appier.GeoResolver.resolve("8.8.8.8")
+
+        self.assertEqual(result["country"], dict(iso_code="US", name="United States"))
+        self.assertEqual("city" in result, False)
+
+        result = appier.GeoResolver.resolve("9.9.9.9")
+
+        self.assertEqual(result, None)
+
+    def test_cache(self):
+        appier.GeoResolver.resolve("1.2.3.4")
+        appier.GeoResolver.resolve("1.2.3.5")
+        appier.GeoResolver.resolve("8.8.8.8")
+        appier.GeoResolver.resolve("9.9.9.9")
+
+        cache = appier.GeoResolver._cache
+
+        self.assertEqual(sorted(cache.keys()), ["1.2.3/24", "8.8.8.8", "9.9.9/24"])
+        self.assertEqual(cache["8.8.8.8"]["country"]["iso_code"], "US")
+        self.assertEqual(cache["9.9.9/24"], None)
+
+        result = appier.GeoResolver.resolve("1.2.3.200")
+
+        self.assertEqual(result, cache["1.2.3/24"])
+        self.assertEqual(result is cache["1.2.3/24"], False)
+
+        result["country"]["iso_code"] = "XX"
+        result = appier.GeoResolver.resolve("1.2.3.200")
+
+        self.assertNotEqual(result["country"]["iso_code"], "XX")
+
+    def test_resolve_many(self):
+        addresses = ["1.2.3.4", "8.8.8.8", "9.9.9.9", "1.2.3.4"]
+        results = appier.GeoResolver.resolve_many(addresses)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0]["city"], dict(name="Porto"))
+        self.assertEqual(results[1]["country"]["iso_code"], "US")
+        self.assertEqual(results[2], None)
+        self.assertEqual(results[3] is results[0], True)
+
+        results = appier.GeoResolver.resolve_many(addresses, simplified=False)
+
+        self.assertEqual(results[0]["postal"], dict(code="4000"))
+        self.assertEqual(results[2], None)
+
+
+def _build_db(networks, record_size=24):
+    # encodes the complete set of records into the data section and
+    # builds the (binary) search tree with the paths for each network
+    # leading to the offset of the associated record in the data section
+    nodes = [[None, None]]
+    data = b""
+    for network, record in networks:
+        address, prefix_len = network.split("/")
+        octets = [int(value) for value in address.split(".")]
+        value = struct.unpack(">I", struct.pack("BBBB", *octets))[0]
+        bits = [(value >> (31 - index)) & 1 for index in range(int(prefix_len))]
+        node = 0
+        for bit in bits[:-1]:
+            if nodes[node][bit] == None:
+                nodes.append([None, None])
+                nodes[node][bit] = ("node", len(nodes) - 1)
+            node = nodes[node][bit][1]
+        nodes[node][bits[-1]] = ("data", len(data))
+        data += _encode(record)
+
+    # serializes the search tree converting each of the node records into
+    # the proper numeric value (node index, empty or data section pointer)
+    node_count = len(nodes)
+    tree = b""
+    for node in nodes:
+        for item in node:
+            if item == None:
+                value = node_count
+            elif item[0] == "node":
+                value = item[1]
+            else:
+                value = node_count + 16 + item[1]
+            tree += struct.pack(">I", value)[1:]
+
+    metadata = dict(
+        node_count=("uint32", node_count),
+        record_size=("uint16", record_size),
+        ip_version=("uint16", 4),
+        database_type="Appier-Test",
+        languages=["en"],
+        binary_format_major_version=("uint16", 2),
+        binary_format_minor_version=("uint16", 0),
+        build_epoch=("uint64", 1704067200),
+        description=dict(en="Appier test database"),
+    )
+
+    return tree + b"\x00" * 16 + data + b"\xab\xcd\xefMaxMind.com" + _encode(metadata)
+
+
+def _encode(value):
+    if isinstance(value, dict):
+        items = sorted(value.items())
+        return _control(7, len(items)) + b"".join(
+            _encode(key) + _encode(_value) for key, _value in items
+        )
+    if isinstance(value, list):
+        return _control(11, len(value)) + b"".join(_encode(item) for item in value)
+    if isinstance(value, tuple):
+        kind, number = value
+        type, size = dict(uint16=(5, 2), uint32=(6, 4), uint64=(9, 8))[kind]
+        data = struct.pack(">Q", number)[8 - size :].lstrip(b"\x00")
+        return _control(type, len(data)) + data
+    if isinstance(value, float):
+        return _control(3, 8) + struct.pack(">d", value)
+    data = appier.legacy.bytes(value, "utf-8")
+    return _control(2, len(data)) + data
+
+
+def _control(type, size):
+    extra = b""
+    if size >= 29:
+        extra = struct.pack("B", size - 29)
+        size = 29
+    if type <= 7:
+        return struct.pack("B", (type << 5) | size) + extra
+    return struct.pack("BB", size, type - 7) + extra
@@ -59,10 +59,10 @@ class GraphTest(unittest.TestCase):
         ]
         graph.add_edges(edges)
 
-        self.assertEqual(graph.edges["A"], [("B", 1)])
-        self.assertEqual(graph.edges["B"], [("D", 20), ("C", 10)])
-        self.assertEqual(graph.edges["D"], [("F", 1)])
-        self.assertEqual(graph.edges["F"], [("D", 1)])
+        self.assertEqual(graph.edges["A"], dict(B=1))
+        self.assertEqual(graph.edges["B"], dict(D=20, C=10))
+        self.assertEqual(graph.edges["D"], dict(F=1))
+        self.assertEqual(graph.edges["F"], dict(D=1))
 
     def test_add_edges_handle_invalid(self):
         graph = appier.Graph()
@@ -77,24 +77,24 @@ class GraphTest(unittest.TestCase):
         ]
         graph.add_edges(edges)
 
-        self.assertEqual(graph.edges["A"], [("B", 1)])
-        self.assertEqual(graph.edges["B"], [("D", 20), ("C", 10)])
-        self.assertEqual(graph.edges["D"], [("F", 1)])
-        self.assertEqual(graph.edges["F"], [("D", 1)])
+        self.assertEqual(graph.edges["A"], dict(B=1))
+        self.assertEqual(graph.edges["B"], dict(D=20, C=10))
+        self.assertEqual(graph.edges["D"], dict(F=1))
+        self.assertEqual(graph.edges["F"], dict(D=1))
 
     def test_add_edge(self):
         graph = appier.Graph()
 
         graph.add_edge("A", "B")
-        self.assertEqual(graph.edges["A"], [("B", 1)])
+        self.assertEqual(graph.edges["A"], dict(B=1))
 
         graph.add_edge("B", "D", cost=20)
         graph.add_edge("B", "C", cost=10)
-        self.assertEqual(graph.edges["B"], [("D", 20), ("C", 10)])
+        self.assertEqual(graph.edges["B"], dict(D=20, C=10))
 
         graph.add_edge("D", "F", bidirectional=True)
-        self.assertEqual(graph.edges["D"], [("F", 1)])
-        self.assertEqual(graph.edges["F"], [("D", 1)])
+        self.assertEqual(graph.edges["D"], dict(F=1))
+        self.assertEqual(graph.edges["F"], dict(D=1))
 
     def test_disjktra_no_path(self):
         graph = appier.Graph([("A", "B"), ("B", "C"), ("F", "G")])
@@ -189,3 +189,60 @@ class GraphTest(unittest.TestCase):
         path, cost = graph.dijkstra("C", "F")
         self.assertEqual(path, ["C", "D", "F"])
         self.assertEqual(cost, 23)
+
+    def test_add_edge_duplicate(self):
+        graph = appier.Graph([("A", "B", 5), ("A", "B", 3), ("A", "B", 4)])
+        self.assertEqual(graph.edges["A"], dict(B=3))
+
+        path, cost = graph.dijkstra("A", "B")
+        self.assertEqual(path, ["A", "B"])
+        self.assertEqual(cost, 3)
+
+    def test_astar(self):
+        graph = appier.Graph()
+        for x in range(5):
+            for y in range(5):
+                if x < 4:
+                    graph.add_edge((x, y), (x + 1, y), bidirectional=True)
+                if y < 4:
+                    graph.add_edge((x, y), (x, y + 1), bidirectional=True)
+
+        heuristic = lambda node, dst: abs(node[0] - dst[0]) + abs(node[1] - dst[1])
+
+        path, cost = graph.astar((0, 0), (4, 4), heuristic)
+        self.assertEqual(len(path), 9)
+        self.assertEqual(path[0], (0, 0))
+        self.assertEqual(path[-1], (4, 4))
+        self.assertEqual(cost, 8)
+
+        path, cost = graph.astar((0, 0), (0, 0), heuristic)
+        self.assertEqual(path, [(0, 0)])
+        self.assertEqual(cost, 0)
+
+        path, cost = graph.astar((0, 0), (9, 9), heuristic)
+        self.assertEqual(path, [])
+        self.assertEqual(cost, appier.defines.INFINITY)
+
+    def test_tree(self):
+        graph = appier.Graph([("A", "B"), ("B", "C", 10), ("B", "D", 4), ("D", "C", 5)])
+
+        dist, prev = graph.tree("A")
+        self.assertEqual(dist, dict(A=0, B=1, C=10, D=5))
+        self.assertEqual(prev["C"], "D")
+        self.assertEqual(graph.tree("A"), (dist, prev))
+
+        path, cost = graph.dijkstra("A", "C")
+        self.assertEqual(path, ["A", "B", "D", "C"])
+        self.assertEqual(cost, 10)
+
+        graph.add_edge("B", "C", cost=2)
+
+        path, cost = graph.dijkstra("A", "E")
+        self.assertEqual(path, [])
+        self.assertEqual(cost, appier.defines.INFINITY)
+        self.assertEqual(graph._trees["A"][0]["C"], 3)
+
+        path, cost = graph.dijkstra("A", "C")
+        self.assertEqual(path, ["A", "B", "C"])
+        self.assertEqual(cost, 3)
+        self.assertEqual(graph.tree("A")[0]["C"], 3)
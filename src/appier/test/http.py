@@ -28,11 +28,66 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import json
+import time
+import socket
 import unittest
 import threading
 
 import appier
 
+try:
+    import http.server as _server
+except ImportError:
+    import BaseHTTPServer as _server
+
+try:
+    import socketserver as _socketserver
+except ImportError:
+    import SocketServer as _socketserver
+
+
+class LocalHandler(_server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.startswith("/redirect"):
+            self.send_response(302)
+            self.send_header("Location", "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path.startswith("/error"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        # for the stale path the connection is closed after the response
+        # without notifying the client, as an expired keep-alive would do
+        if self.path.startswith("/stale"):
+            self.close_connection = True
+
+        data = json.dumps(dict(path=self.path)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        self.rfile.read(length)
+        self.do_GET()
+
+    def log_message(self, *args, **kwargs):
+        pass
+
+
+class LocalServer(_socketserver.ThreadingMixIn, _server.HTTPServer):
+    daemon_threads = True
+
 
 class HTTPTest(unittest.TestCase):
     def setUp(self):
@@ -103,6 +158,151 @@ class HTTPTest(unittest.TestCase):
         self.assertEqual(authorization, "dXNlcm5hbWU6cGFzc3dvcmQ=")
         self.assertEqual(params, dict(hello=["world"]))
 
+    def test_pool(self):
+        server = LocalServer(("127.0.0.1", 0), LocalHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            appier.http.reset_pools()
+            url = "http://127.0.0.1:%d" % server.server_address[1]
+
+            for _index in range(3):
+                result = appier.get(url + "/hello", client="pool")
+                self.assertEqual(result, dict(path="/hello"))
+
+            stats = appier.http.pool_stats()
+            self.assertEqual(stats["misses"], 1)
+            self.assertEqual(stats["hits"], 2)
+            self.assertEqual(stats["waits"], 0)
+
+            result = appier.get(url + "/redirect", client="pool")
+            self.assertEqual(result, dict(path="/"))
+
+            self.assertRaises(
+                appier.HTTPError, lambda: appier.get(url + "/error", client="pool")
+            )
+
+            result = appier.get(url + "/hello", client="legacy")
+            self.assertEqual(result, dict(path="/hello"))
+
+            stats = appier.http.pool_stats()
+            self.assertEqual(stats["misses"], 1)
+            self.assertEqual(stats["hits"], 5)
+
+            with appier.conf_override("HTTP_LEGACY_POOL", True):
+                result = appier.get(url + "/hello", client="legacy")
+                self.assertEqual(result, dict(path="/hello"))
+
+            stats = appier.http.pool_stats()
+            self.assertEqual(stats["misses"], 1)
+            self.assertEqual(stats["hits"], 6)
+
+            appier.http.reset_pools()
+            self.assertEqual(appier.http.pool_stats(), dict())
+        finally:
+            appier.http.reset_pools()
+            server.shutdown()
+            server.server_close()
+
+    def test_pool_retry(self):
+        server = LocalServer(("127.0.0.1", 0), LocalHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            appier.http.reset_pools()
+            url = "http://127.0.0.1:%d" % server.server_address[1]
+
+            result = appier.get(url + "/stale", client="pool")
+            self.assertEqual(result, dict(path="/stale"))
+            time.sleep(0.1)
+
+            result = appier.get(url + "/hello", client="pool")
+            self.assertEqual(result, dict(path="/hello"))
+
+            stats = appier.http.pool_stats()
+            self.assertEqual(stats["misses"], 2)
+            self.assertEqual(stats["discards"], 1)
+
+            result = appier.post(url + "/stale", data=b"data", client="pool")
+            self.assertEqual(result, dict(path="/stale"))
+            time.sleep(0.1)
+
+            self.assertRaises(
+                (socket.error, appier.legacy.HTTPException),
+                lambda: appier.post(url + "/hello", data=b"data", client="pool"),
+            )
+
+            result = appier.post(
+                url + "/stale", data=b"data", client="pool", idempotent=True
+            )
+            self.assertEqual(result, dict(path="/stale"))
+            time.sleep(0.1)
+
+            result = appier.post(
+                url + "/hello", data=b"data", client="pool", idempotent=True
+            )
+            self.assertEqual(result, dict(path="/hello"))
+        finally:
+            appier.http.reset_pools()
+            server.shutdown()
+            server.server_close()
+
+    def test_stream(self):
+        server = LocalServer(("127.0.0.1", 0), LocalHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            appier.http.reset_pools()
+            url = "http://127.0.0.1:%d" % server.server_address[1]
+            expected = json.dumps(dict(path="/hello")).encode("utf-8")
+
+            for client, reuse in (("pool", True), ("legacy", False), ("netius", False)):
+                response = appier.get(
+                    url + "/hello", client=client, reuse=reuse, stream=True
+                )
+                self.assertEqual(isinstance(response, appier.HTTPStreamResponse), True)
+                self.assertEqual(response.getcode(), 200)
+                self.assertEqual(response.length, len(expected))
+                self.assertEqual(b"".join(response.iter_chunks(chunk_size=4)), expected)
+                self.assertEqual(response.closed, True)
+
+            response = appier.get(url + "/hello", client="pool", stream=True)
+            generator = response.generator()
+            self.assertEqual(next(generator), len(expected))
+            self.assertEqual(b"".join(generator), expected)
+
+            response = appier.get(url + "/redirect", client="pool", stream=True)
+            self.assertEqual(
+                response.read(), json.dumps(dict(path="/")).encode("utf-8")
+            )
+            response.close()
+
+            stats = appier.http.pool_stats()
+            self.assertEqual(stats["misses"], 1)
+            self.assertEqual(stats["discards"], 0)
+        finally:
+            appier.http.reset_pools()
+            server.shutdown()
+            server.server_close()
+
+    def test_stream_readline(self):
+        file = appier.legacy.BytesIO(b"first\nsecond line\n\nlast")
+        response = appier.HTTPStreamResponse(file, chunk_size=4)
+
+        self.assertEqual(response.readline(), b"first\n")
+        self.assertEqual(response.read(3), b"sec")
+        self.assertEqual(response.readline(), b"ond line\n")
+        self.assertEqual(response.readline(), b"\n")
+        self.assertEqual(response.readline(), b"last")
+        self.assertEqual(response.readline(), b"")
+        self.assertEqual(response.read(), b"")
+
     def test_redirect(self):
         if appier.conf("NO_NETWORK", False, cast=bool):
             self.skipTest("Network access is disabled")
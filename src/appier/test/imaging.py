@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+
+import threading
+import unittest
+
+import appier
+
+
+class PipelineTest(unittest.TestCase):
+    def test_run(self):
+        pipeline = appier.Pipeline(workers=2, cache_size=8)
+        calls = []
+
+        def method(value):
+            calls.append(value)
+            return value * 2
+
+        try:
+            self.assertEqual(pipeline.run(("key", 1), method, 1), 2)
+            self.assertEqual(pipeline.run(("key", 1), method, 1), 2)
+            self.assertEqual(pipeline.run(("key", 2), method, 2), 4)
+        finally:
+            pipeline.close()
+
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(pipeline.hits, 1)
+        self.assertEqual(pipeline.misses, 2)
+
+    def test_coalesce(self):
+        if not appier.imaging.concurrent:
+            if not hasattr(self, "skipTest"):
+                return
+            self.skipTest("No concurrent module present")
+
+        pipeline = appier.Pipeline(workers=2, cache_size=8)
+        event = threading.Event()
+        calls = []
+
+        def method(value):
+            event.wait(10.0)
+            calls.append(value)
+            return value
+
+        try:
+            first = pipeline.submit("key", method, b"first")
+            second = pipeline.submit("key", method, b"first")
+            event.set()
+
+            self.assertEqual(first.result(), b"first")
+            self.assertEqual(second.result(), b"first")
+        finally:
+            pipeline.close()
+
+        self.assertEqual(calls, [b"first"])
+        self.assertEqual(pipeline.coalesced, 1)
+
+    def test_error(self):
+        pipeline = appier.Pipeline(workers=2, cache_size=8)
+
+        def method():
+            raise appier.OperationalError(message="Invalid image")
+
+        try:
+            self.assertRaises(
+                appier.OperationalError, lambda: pipeline.run("key", method)
+            )
+            self.assertRaises(
+                appier.OperationalError, lambda: pipeline.run("key", method)
+            )
+        finally:
+            pipeline.close()
+
+        self.assertEqual(pipeline.misses, 2)
+        self.assertEqual(len(pipeline.cache), 0)
+
+    def test_cache_limit(self):
+        pipeline = appier.Pipeline(workers=2, cache_size=8, cache_limit=4)
+
+        try:
+            pipeline.run("small", lambda: b"abc")
+            pipeline.run("large", lambda: b"abcdef")
+
+            self.assertEqual("small" in pipeline.cache, True)
+            self.assertEqual("large" in pipeline.cache, False)
+        finally:
+            pipeline.close()
+
+    def test_global(self):
+        pipeline = appier.imaging.get_pipeline()
+
+        self.assertEqual(appier.imaging.get_pipeline(), pipeline)
+
+        appier.imaging.reset_pipeline()
+
+        self.assertNotEqual(appier.imaging.get_pipeline(), pipeline)
+
+        appier.imaging.reset_pipeline()
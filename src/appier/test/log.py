@@ -29,7 +29,10 @@ __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
 import os
+import json
+import socket
 import logging
+import threading
 import tempfile
 import unittest
 
@@ -274,6 +277,14 @@ class LogTest(unittest.TestCase):
         self.assertEqual(len(latest), 1)
         self.assertEqual(latest, ["hello world 2"])
 
+        self.assertEqual(
+            list(memory_handler.messages), ["hello world 2", "hello world"]
+        )
+        self.assertEqual(list(memory_handler.messages_l["ERROR"]), ["hello world 2"])
+        self.assertEqual(
+            list(memory_handler.messages_l["INFO"]), ["hello world 2", "hello world"]
+        )
+
     def test_memory_handler_file(self):
         memory_handler = appier.MemoryHandler()
         formatter = logging.Formatter("%(message)s")
@@ -312,3 +323,197 @@ class LogTest(unittest.TestCase):
 
         latest = memory_handler.get_latest(count=1)
         self.assertEqual(len(latest), 0)
+
+    def test_memory_handler_limits(self):
+        memory_handler = appier.MemoryHandler(max_length=3)
+        formatter = logging.Formatter("%(message)s")
+        memory_handler.setFormatter(formatter)
+
+        for index, level in enumerate(
+            (logging.ERROR, logging.INFO, logging.INFO, logging.INFO)
+        ):
+            record = logging.makeLogRecord(
+                dict(msg="message %d" % index, levelname=logging.getLevelName(level))
+            )
+            memory_handler.emit(record)
+
+        latest = memory_handler.get_latest()
+        self.assertEqual(latest, ["message 3", "message 2", "message 1"])
+
+        latest = memory_handler.get_latest(level=logging.ERROR)
+        self.assertEqual(latest, [])
+
+        latest = memory_handler.get_latest(level=logging.INFO)
+        self.assertEqual(latest, ["message 3", "message 2", "message 1"])
+        self.assertEqual(memory_handler.size, 27)
+
+        memory_handler = appier.MemoryHandler(max_size=20)
+        memory_handler.setFormatter(formatter)
+
+        for index in range(3):
+            record = logging.makeLogRecord(
+                dict(msg="message %d" % index, levelname="WARNING")
+            )
+            memory_handler.emit(record)
+
+        latest = memory_handler.get_latest()
+        self.assertEqual(latest, ["message 2", "message 1"])
+
+        latest = memory_handler.get_latest(level="warn")
+        self.assertEqual(latest, ["message 2", "message 1"])
+        self.assertEqual(memory_handler.size, 18)
+
+        record = logging.makeLogRecord(dict(msg="x" * 30, levelname="WARNING"))
+        memory_handler.emit(record)
+
+        latest = memory_handler.get_latest()
+        self.assertEqual(latest, ["x" * 30])
+        self.assertEqual(memory_handler.size, 30)
+
+        for level in appier.log.LEVELS:
+            self.assertEqual(len(memory_handler.entries_l[level]) <= 1, True)
+
+        record = logging.makeLogRecord(
+            dict(msg=appier.legacy.u("olá"), levelname="WARNING")
+        )
+        memory_handler.emit(record)
+
+        self.assertEqual(memory_handler.size, 4)
+
+    def test_queue_handler(self):
+        memory_handler = appier.MemoryHandler()
+        memory_handler.setLevel(logging.INFO)
+        memory_handler.setFormatter(logging.Formatter("%(message)s"))
+
+        queue_handler = appier.QueueHandler([memory_handler])
+        queue_handler.start()
+
+        self.assertEqual(queue_handler.is_running(), True)
+
+        try:
+            logger = logging.getLogger("appier.test.queue")
+            logger.propagate = False
+            logger.setLevel(logging.DEBUG)
+            logger.addHandler(queue_handler)
+
+            values = ["hello world"]
+            logger.info("%s", values)
+            logger.debug("hidden")
+            values.append("changed")
+            queue_handler.flush()
+
+            latest = memory_handler.get_latest()
+            self.assertEqual(latest, ["['hello world']"])
+
+            try:
+                raise appier.OperationalError(message="failure")
+            except appier.OperationalError:
+                logger.exception("error")
+            queue_handler.flush()
+
+            latest = memory_handler.get_latest(count=1)
+            self.assertEqual(latest[0].startswith("error\n"), True)
+            self.assertEqual("failure" in latest[0], True)
+        finally:
+            logger.removeHandler(queue_handler)
+            queue_handler.close()
+
+        self.assertEqual(queue_handler.is_running(), False)
+        self.assertEqual(queue_handler.dropped, 0)
+
+        record = logging.makeLogRecord(dict(msg="direct", levelno=logging.INFO))
+        queue_handler.emit(record)
+
+        latest = memory_handler.get_latest(count=1)
+        self.assertEqual(latest, ["direct"])
+
+    def test_queue_handler_drop(self):
+        event = threading.Event()
+
+        class BlockingHandler(logging.Handler):
+            def __init__(self):
+                logging.Handler.__init__(self)
+                self.messages = []
+
+            def emit(self, record):
+                event.wait()
+                self.messages.append(record.getMessage())
+
+        blocking_handler = BlockingHandler()
+
+        queue_handler = appier.QueueHandler(
+            [blocking_handler], max_size=1, policy="drop"
+        )
+        queue_handler.start()
+
+        try:
+            for index in range(5):
+                record = logging.makeLogRecord(
+                    dict(
+                        msg="message %d" % index,
+                        levelno=logging.WARNING,
+                        levelname="WARNING",
+                    )
+                )
+                queue_handler.emit(record)
+
+            self.assertEqual(queue_handler.dropped >= 3, True)
+            self.assertEqual(queue_handler.dropped <= 4, True)
+            self.assertEqual(
+                queue_handler.dropped_l, dict(WARNING=queue_handler.dropped)
+            )
+
+            stats = queue_handler.get_stats()
+            self.assertEqual(stats["dropped"], queue_handler.dropped)
+            self.assertEqual(stats["policy"], "drop")
+            self.assertEqual(stats["max_size"], 1)
+        finally:
+            event.set()
+            queue_handler.close()
+
+        self.assertEqual(len(blocking_handler.messages) + queue_handler.dropped, 5)
+        self.assertEqual(blocking_handler.messages[0], "message 0")
+
+        self.assertRaises(ValueError, lambda: appier.QueueHandler([], policy="invalid"))
+
+    def test_base_formatter(self):
+        record = logging.LogRecord(
+            "appier", logging.INFO, __file__, 1, "hello world", None, None
+        )
+
+        formatter = appier.BaseFormatter("%(message)s", wrap=True)
+        result = formatter.format(record)
+
+        self.assertEqual(result, "hello world")
+        self.assertEqual(record.hostname, socket.gethostname())
+        self.assertEqual(record.json._value, None)
+
+        formatter = appier.BaseFormatter("%(hostname)s %(message)s", wrap=True)
+        result = formatter.format(record)
+
+        self.assertEqual(result, socket.gethostname() + " hello world")
+        self.assertEqual(record.json._value, None)
+        self.assertEqual(record.json.startswith("{"), True)
+        self.assertEqual(record.json, str(record.json))
+        self.assertEqual(json.loads(str(record.json))["message"], "hello world")
+
+        formatter = appier.BaseFormatter("%(json)s", wrap=True)
+        result = formatter.format(record)
+        result = json.loads(result)
+
+        self.assertEqual(result["message"], "hello world")
+        self.assertEqual(result["hostname"], socket.gethostname())
+        self.assertEqual(result["level"], "INFO")
+        self.assertEqual(result["logger"], "appier")
+
+    def test_get_hostname(self):
+        hostname = appier.log.get_hostname()
+
+        self.assertEqual(hostname, socket.gethostname())
+        self.assertEqual(appier.log.HOSTNAME_PID, os.getpid())
+
+        appier.log.HOSTNAME_PID = -1
+        hostname = appier.log.get_hostname()
+
+        self.assertEqual(hostname, socket.gethostname())
+        self.assertEqual(appier.log.HOSTNAME_PID, os.getpid())
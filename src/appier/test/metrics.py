@@ -0,0 +1,325 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Hive Appier Framework
+# Copyright (c) 2008-2024 Hive Solutions Lda.
+#
+# This file is part of Hive Appier Framework.
+#
+# Hive Appier Framework is free software: you can redistribute it and/or modify
+# it under the terms of the Apache License as published by the Apache
+# Foundation, either version 2.0 of the License, or (at your option) any
+# later version.
+#
+# Hive Appier Framework is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# Apache License for more details.
+#
+# You should have received a copy of the Apache License along with
+# Hive Appier Framework. If not, see <http://www.apache.org/licenses/>.
+
+__author__ = "João Magalhães <joamag@hive.pt>"
+""" The author(s) of the module """
+
+__copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
+""" The copyright for the module """
+
+__license__ = "Apache License, Version 2.0"
+""" The license for the module """
+
+
+import io
+import unittest
+
+import appier
+
+
+class HistogramTest(unittest.TestCase):
+    def test_basic(self):
+        histogram = appier.Histogram()
+
+        for value in range(100):
+            histogram.record(value)
+
+        self.assertEqual(len(histogram), 100)
+        self.assertEqual(histogram.min, 0)
+        self.assertEqual(histogram.max, 99)
+        self.assertEqual(histogram.mean(), 49.5)
+        self.assertEqual(histogram.percentile(50.0), 49)
+        self.assertEqual(histogram.percentile(99.0), 98)
+        self.assertEqual(histogram.percentile(100.0), 99)
+
+    def test_precision(self):
+        histogram = appier.Histogram()
+
+        values = [value * 997 for value in range(1, 10001)]
+        for value in values:
+            histogram.record(value)
+
+        for percentile in (50.0, 90.0, 99.0, 99.9):
+            expected = values[int(len(values) * percentile / 100.0) - 1]
+            result = histogram.percentile(percentile)
+            self.assertEqual(result >= expected, True)
+            self.assertEqual(result - expected <= expected / 64.0, True)
+
+        self.assertEqual(len(histogram.buckets) < 1000, True)
+
+    def test_merge(self):
+        first = appier.Histogram()
+        second = appier.Histogram()
+
+        first.record(10)
+        second.record(20, count=3)
+        first.merge(second)
+
+        self.assertEqual(first.count, 4)
+        self.assertEqual(first.min, 10)
+        self.assertEqual(first.max, 20)
+        self.assertEqual(first.percentile(50.0), 20)
+
+    def test_empty(self):
+        histogram = appier.Histogram()
+
+        self.assertEqual(histogram.mean(), None)
+        self.assertEqual(histogram.percentile(50.0), None)
+        self.assertEqual(histogram.to_dict()["count"], 0)
+        self.assertEqual(histogram.to_dict()["p50"], None)
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.app = appier.App(service=True)
+
+    def tearDown(self):
+        self.app.unload()
+
+    def test_record(self):
+        metrics = appier.Metrics()
+
+        metrics.record("GET /", 0.001, timings=dict(action=0.0005))
+        metrics.record("GET /", 0.003, code=500)
+        metrics.record(None, 0.002, code=404)
+
+        route = metrics.get("GET /")
+        self.assertEqual(route.count, 2)
+        self.assertEqual(route.errors, 1)
+        self.assertEqual(route.codes, {"2xx": 1, "5xx": 1})
+        self.assertEqual(route.latency.max, 3000)
+        self.assertEqual(route.phases["action"].count, 1)
+
+        result = metrics.to_dict()
+        self.assertEqual(result["total"]["count"], 3)
+        self.assertEqual(result["routes"]["unmatched"]["codes"], {"4xx": 1})
+        self.assertEqual(result["routes"]["GET /"]["latency"]["max"], 3.0)
+        self.assertEqual(result["nested"]["template"], ["action"])
+
+        metrics.reset()
+        self.assertEqual(metrics.get("GET /"), None)
+        self.assertEqual(metrics.total.count, 0)
+
+    def test_application(self):
+        for path in ("/info", "/info", "/unknown"):
+            environ = dict(
+                REQUEST_METHOD="GET", PATH_INFO=path, QUERY_STRING="", SCRIPT_NAME=""
+            )
+            environ["wsgi.input"] = io.BytesIO(b"")
+            environ["wsgi.url_scheme"] = "http"
+            result = self.app.application(environ, lambda code, headers: None)
+            list(result)
+
+        route = self.app.collector.get("GET /info")
+        self.assertEqual(route.count, 2)
+        self.assertEqual(route.codes, {"2xx": 2})
+        self.assertEqual(route.phases["action"].count, 2)
+        self.assertEqual(route.phases["route"].count, 2)
+        self.assertEqual(route.phases["before"].count, 2)
+        self.assertEqual(route.phases["finally"].count, 2)
+        self.assertEqual(route.latency.max >= route.phases["action"].max, True)
+
+        route = self.app.collector.get(None)
+        self.assertEqual(route.count, 1)
+        self.assertEqual(route.codes, {"4xx": 1})
+        self.assertEqual("action" in route.phases, False)
+
+
+class QueryProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.app = appier.App()
+
+    def tearDown(self):
+        self.app.unload()
+
+    def test_shape(self):
+        self.assertEqual(appier.metrics.shape(None), "{}")
+        self.assertEqual(appier.metrics.shape({"_id": 1}), "{_id: ?}")
+        self.assertEqual(
+            appier.metrics.shape({"name": "a", "age": {"$gt": 3}}),
+            "{age: {$gt: ?}, name: ?}",
+        )
+        self.assertEqual(
+            appier.metrics.shape({"_id": {"$in": [1, 2, 3]}}), "{_id: {$in: [?]}}"
+        )
+
+    def test_record(self):
+        profiler = appier.QueryProfiler(threshold=0.01, repeat=3)
+
+        queries = []
+        for index in range(5):
+            profiler.record(
+                "users", "find_one", {"_id": index}, {}, 0.001, queries=queries
+            )
+        profiler.record("users", "find", {"age": 1}, [{}, {}], 0.02, queries=queries)
+        profiler.record("users", "count", None, 3, 0.001)
+        profiler.record_request("GET /users", queries)
+
+        self.assertEqual(len(queries), 6)
+
+        metrics = profiler.collections["users"]
+        self.assertEqual(metrics.count, 7)
+        self.assertEqual(metrics.slow, 1)
+        self.assertEqual(metrics.documents, 7)
+        self.assertEqual(metrics.operations["find_one"].count, 5)
+
+        result = profiler.to_dict()
+        self.assertEqual(len(result["slow"]), 1)
+        self.assertEqual(result["slow"][0]["shape"], "{age: ?}")
+        self.assertEqual(result["slow"][0]["size"], 2)
+        self.assertEqual(len(result["repeated"]), 1)
+        self.assertEqual(result["repeated"][0]["shape"], "{_id: ?}")
+        self.assertEqual(result["repeated"][0]["max"], 5)
+        self.assertEqual(result["routes"]["GET /users"]["requests"], 1)
+        self.assertEqual(result["routes"]["GET /users"]["queries"]["max"], 6.0)
+
+    def test_collection(self):
+        class MemoryCollection(appier.Collection):
+            @appier.data.timed
+            def find(self, *args, **kwargs):
+                return [dict(_id=1)]
+
+            @appier.data.timed
+            def find_and_modify(self, *args, **kwargs):
+                return self.find(*args, **kwargs)[0]
+
+            @appier.data.timed
+            def remove(self, *args, **kwargs):
+                raise appier.OperationalError(message="Remove failed")
+
+            def profile(self, operation, *args, **kwargs):
+                if operation == "remove":
+                    raise RuntimeError("Profile failed")
+                return appier.Collection.profile(self, operation, *args, **kwargs)
+
+        self.app.query_profiler = appier.QueryProfiler()
+        self.app._request.timings = dict()
+        self.app._request.queries = []
+
+        try:
+            collection = MemoryCollection(None, "memory")
+            result = collection.find({"_id": 1})
+            collection.find_and_modify({"_id": 1})
+            self.assertRaises(appier.OperationalError, collection.remove)
+        finally:
+            queries = self.app._request.queries
+            timings = self.app._request.timings
+            self.app._request.queries = None
+            self.app._request.timings = None
+
+        self.assertEqual(result, [dict(_id=1)])
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(queries[0][:3], ("memory", "find", "{_id: ?}"))
+        self.assertEqual(queries[0][4], 1)
+        self.assertEqual(queries[1][:3], ("memory", "find_and_modify", "{_id: ?}"))
+        self.assertEqual("data" in timings, True)
+        self.assertEqual(self.app.query_profiler.collections["memory"].count, 2)
+
+
+class SamplingProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.app = appier.App(service=True)
+
+    def tearDown(self):
+        self.app.unload()
+
+    def test_sample(self):
+        profiler = appier.SamplingProfiler()
+
+        target = appier.Request()
+        target.route_name = "GET /busy"
+        profiler.begin(target)
+        try:
+            self.assertEqual(profiler.is_running(), True)
+            profiler.sample_all()
+        finally:
+            profiler.end()
+            profiler.stop()
+
+        self.assertEqual(profiler.is_running(), False)
+        self.assertEqual(profiler.requests, 1)
+        self.assertEqual(profiler.samples >= 1, True)
+
+        collapsed = profiler.collapsed()
+        lines = collapsed.strip().split("\n")
+        stacks = [line.rsplit(" ", 1)[0] for line in lines]
+        leafs = [stack.split(";")[-1] for stack in stacks]
+        self.assertEqual(all(stack.startswith("GET /busy;") for stack in stacks), True)
+        self.assertEqual(any(leaf.startswith("sample_all ") for leaf in leafs), True)
+        self.assertEqual(sum(int(line.rsplit(" ", 1)[1]) for line in lines) >= 1, True)
+
+        profiler.reset()
+        self.assertEqual(profiler.collapsed(), "")
+
+    def test_limits(self):
+        profiler = appier.SamplingProfiler(max_stacks=1, max_depth=2)
+
+        profiler.begin(None)
+        try:
+            profiler.sample_all()
+            profiler.sample_all()
+        finally:
+            profiler.end()
+            profiler.stop()
+
+        self.assertEqual(len(profiler.stacks), 1)
+        self.assertEqual(profiler.samples >= 2, True)
+
+        stack = list(profiler.stacks.keys())[0]
+        self.assertEqual(len(stack.split(";")), 3)
+        self.assertEqual(stack.startswith("unmatched;"), True)
+
+    def test_application(self):
+        self.app.profiler.token = "secret"
+
+        for token in (None, "invalid", "secret"):
+            environ = dict(
+                REQUEST_METHOD="GET",
+                PATH_INFO="/info",
+                QUERY_STRING="profile=1",
+                SCRIPT_NAME="",
+            )
+            environ["wsgi.input"] = io.BytesIO(b"")
+            environ["wsgi.url_scheme"] = "http"
+            if token:
+                environ["HTTP_X_PROFILE"] = token
+            result = self.app.application(environ, lambda code, headers: None)
+            list(result)
+
+        self.assertEqual(self.app.profiler.requests, 1)
+        self.assertEqual(self.app.profiler.targets, {})
+
+    def test_is_profiled(self):
+        request = self.app._request
+        params = request.params
+        request.params = dict(profile=["1"])
+
+        try:
+            self.assertEqual(self.app._is_profiled(), False)
+
+            request.tokens_p = lambda: ["user"]
+            self.assertEqual(self.app._is_profiled(), False)
+
+            request.tokens_p = lambda: ["admin"]
+            self.assertEqual(self.app._is_profiled(), True)
+        finally:
+            request.params = params
+            del request.tokens_p
@@ -28,6 +28,11 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import os
+import shutil
+import signal
+import threading
+import tempfile
 import unittest
 
 import appier
@@ -76,6 +81,116 @@ class PreferencesTest(unittest.TestCase):
 
         preferences.clear()
 
+    def test_log(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "preferences.log")
+            preferences = appier.LogPreferences.new(preferences_path=path, compact=4)
+            other = appier.LogPreferences.new(preferences_path=path, refresh=0.0)
+
+            preferences["first"] = 1
+            preferences["second"] = 2
+
+            self.assertEqual(preferences["first"], 1)
+            self.assertEqual(preferences["second"], 2)
+            self.assertEqual(other.get("first"), None)
+
+            preferences.flush(force=True)
+
+            self.assertEqual(other["first"], 1)
+            self.assertEqual(other["second"], 2)
+
+            del preferences["first"]
+
+            self.assertRaises(KeyError, lambda: preferences["first"])
+            self.assertEqual(preferences.get("first"), None)
+
+            for index in range(10):
+                preferences["second"] = index
+
+            preferences.flush(force=True)
+
+            self.assertEqual(other["second"], 9)
+            self.assertEqual(other.get("first"), None)
+            self.assertEqual(preferences._records, 1)
+
+            other["third"] = 3
+            other.unload()
+            preferences._refresh(force=True)
+
+            self.assertEqual(preferences["third"], 3)
+
+            preferences.clear()
+
+            self.assertEqual(preferences.get("second"), None)
+
+            preferences["invalid"] = lambda: None
+            preferences["fourth"] = 4
+            preferences.flush(force=True)
+
+            self.assertEqual(preferences.get("invalid"), None)
+
+            other = appier.LogPreferences.new(preferences_path=path, refresh=0.0)
+
+            self.assertEqual(other["fourth"], 4)
+            self.assertEqual(other.get("invalid"), None)
+
+            other.unload()
+            preferences.unload()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_log_fork(self):
+        if not hasattr(os, "fork"):
+            if not hasattr(self, "skipTest"):
+                return
+            self.skipTest("No fork support available")
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "preferences.log")
+            preferences = appier.LogPreferences.new(preferences_path=path, refresh=0.0)
+
+            # holds the lock in another thread while forking, simulating
+            # the flusher thread of the parent process writing at fork time
+            acquired = threading.Event()
+            released = threading.Event()
+
+            def hold():
+                preferences._lock.acquire()
+                try:
+                    acquired.set()
+                    released.wait(10.0)
+                finally:
+                    preferences._lock.release()
+
+            thread = threading.Thread(target=hold)
+            thread.start()
+            acquired.wait(10.0)
+            try:
+                pid = os.fork()
+                if pid == 0:
+                    code = 1
+                    try:
+                        signal.alarm(10)
+                        preferences["first"] = 1
+                        preferences.flush(force=True)
+                        code = 0 if preferences["first"] == 1 else 1
+                    finally:
+                        os._exit(code)
+            finally:
+                released.set()
+                thread.join()
+
+            _pid, status = os.waitpid(pid, 0)
+
+            self.assertEqual(status, 0)
+            self.assertEqual(preferences["first"], 1)
+
+            preferences.unload()
+        finally:
+            shutil.rmtree(directory)
+
     def test_redis(self):
         try:
             preferences = appier.RedisPreferences.new()
@@ -98,3 +213,39 @@ class PreferencesTest(unittest.TestCase):
         self.assertEqual(preferences.get("first"), None)
 
         preferences.clear()
+
+    def test_redis_cached(self):
+        try:
+            preferences = appier.RedisCachedPreferences.new()
+        except Exception:
+            if not hasattr(self, "skipTest"):
+                return
+            self.skipTest("No Redis server present")
+
+        preferences["first"] = 1
+        preferences["second"] = 2
+
+        preferences.flush()
+
+        self.assertEqual(preferences["first"], 1)
+        self.assertEqual(preferences["second"], 2)
+
+        del preferences["first"]
+
+        self.assertRaises(KeyError, lambda: preferences["first"])
+        self.assertEqual(preferences.get("first"), None)
+
+        preferences._store("second", 3, 0)
+
+        self.assertEqual(preferences["second"], 2)
+
+        preferences._reload()
+
+        self.assertEqual(preferences["second"], 2)
+
+        preferences["third"] = dict(value=1)
+        preferences["third"]["value"] = 2
+
+        self.assertEqual(preferences["third"], dict(value=1))
+
+        preferences.clear()
@@ -28,10 +28,16 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import os
 import unittest
 
 import appier
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 
 class QueuingTest(unittest.TestCase):
     def test_memory(self):
@@ -118,6 +124,59 @@ class QueuingTest(unittest.TestCase):
         self.assertEqual(_identifier_2, identifier_2)
         self.assertEqual(_identifier_3, identifier_3)
 
+    def test_multiprocess_bounded(self):
+        queue_m = appier.MultiprocessQueue(maxsize=2)
+        queue_m.push_many(["hello 1", "hello 2"])
+
+        self.assertEqual(queue_m.length(), 2)
+        self.assertRaises(queue.Full, lambda: queue_m.push("hello 3", block=False))
+        self.assertRaises(queue.Full, lambda: queue_m.push("hello 3", timeout=0.01))
+
+        result = queue_m.pop_many(10)
+
+        self.assertEqual(result, ["hello 1", "hello 2"])
+        self.assertRaises(queue.Empty, lambda: queue_m.pop(block=False))
+        self.assertRaises(queue.Empty, lambda: queue_m.pop(timeout=0.01))
+        self.assertEqual(queue_m.pop_many(10, block=True, timeout=0.01), [])
+
+    def test_multiprocess_stop(self):
+        server = appier.queuing.QueueServer()
+        server.start()
+
+        connection = server.connect()
+        connection.close()
+
+        server.stop(timeout=10.0)
+
+        self.assertEqual(server.is_alive(), False)
+        self.assertEqual(os.path.exists(server.address), False)
+        self.assertRaises(Exception, server.connect)
+
+    def test_multiprocess_fork(self):
+        if not hasattr(os, "fork"):
+            if not hasattr(self, "skipTest"):
+                return
+            self.skipTest("No fork support available")
+
+        queue_m = appier.MultiprocessQueue(maxsize=2)
+        queue_r = appier.MultiprocessQueue()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                queue_m.push_many(range(10), timeout=10.0)
+                queue_r.push(queue_r.length(), priority=1)
+            finally:
+                os._exit(0)
+
+        values = []
+        while len(values) < 10:
+            values.extend(queue_m.pop_many(10, block=True, timeout=10.0))
+        os.waitpid(pid, 0)
+
+        self.assertEqual(values, list(range(10)))
+        self.assertEqual(queue_r.pop(timeout=10.0), 0)
+
     def test_amqp(self):
         try:
             queue = appier.AMQPQueue()
@@ -162,3 +221,59 @@ class QueuingTest(unittest.TestCase):
         self.assertEqual(_identifier_1, identifier_1)
         self.assertEqual(_identifier_2, identifier_2)
         self.assertEqual(_identifier_3, identifier_3)
+
+    def test_many(self):
+        queue = appier.MemoryQueue()
+        queue.clear()
+        identifiers = queue.push_many(["hello 1", "hello 2"], priority=1)
+
+        self.assertEqual(identifiers, [None, None])
+        self.assertEqual(queue.length(), 2)
+
+        identifier = queue.push_many(["hello 3"], priority=5, identify=True)[0]
+        result = queue.pop_many(2, full=True)
+
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0], (-5, identifier, "hello 3"))
+        self.assertEqual(result[1], (-1, None, "hello 1"))
+        self.assertEqual(queue.length(), 1)
+
+        result = queue.pop_many(10)
+
+        self.assertEqual(result, ["hello 2"])
+        self.assertEqual(queue.pop_many(10), [])
+
+        queue = appier.MultiprocessQueue()
+        queue.push_many(["hello 1", "hello 2"], priority=1)
+        result = queue.pop_many(10)
+
+        self.assertEqual(sorted(result), ["hello 1", "hello 2"])
+        self.assertEqual(queue.length(), 0)
+
+    def test_amqp_many(self):
+        try:
+            queue = appier.AMQPQueue(encoder="json", prefetch=10, confirm=True)
+        except Exception:
+            if not hasattr(self, "skipTest"):
+                return
+            self.skipTest("No AMQP server present")
+
+        queue.clear()
+        values = ["hello 1", "hello 2", "hello 3"]
+        identifiers = queue.push_many(values, identify=True)
+
+        self.assertEqual(len(identifiers), 3)
+
+        result = queue.pop_many(10, full=True)
+
+        self.assertEqual([value[2] for value in result], values)
+        self.assertEqual([value[1] for value in result], identifiers)
+        self.assertEqual(queue.pop_many(10), [])
+
+        queue.push_many(values)
+        result, delivery_tags = queue.pop_many(10, ack=False)
+
+        self.assertEqual(result, values)
+        self.assertEqual(len(delivery_tags), 3)
+
+        queue.ack(delivery_tag=delivery_tags[-1], multiple=True)
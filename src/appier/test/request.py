@@ -210,3 +210,70 @@ class RequestTest(unittest.TestCase):
             UnicodeDecodeError,
             lambda: request.get_encoded(encoding="ascii", safe=False),
         )
+
+    def test_lazy(self):
+        data = appier.legacy.bytes('{"hello": "world"}', encoding="utf-8")
+        input = appier.legacy.BytesIO(data)
+        request = appier.Request(
+            "POST",
+            "/",
+            address="127.0.0.1",
+            environ=dict(
+                CONTENT_TYPE="application/json",
+                HTTP_X_REAL_IP="1.1.1.1",
+                HTTP_COOKIE="hello=world",
+            ),
+        )
+        request.set_input(input, len(data))
+        request.load_base()
+
+        self.assertEqual(input.tell(), 0)
+        self.assertEqual(request.in_length, len(data))
+        self.assertEqual(request.get_header("X-Real-IP"), "1.1.1.1")
+        self.assertEqual(request.has_header_in("X-Real-IP"), True)
+        self.assertEqual(request.has_header_in("X-Forwarded-For"), False)
+        self.assertEqual(input.tell(), 0)
+
+        self.assertEqual(request.data_j, dict(hello="world"))
+        self.assertEqual(request.get_data(), data)
+        self.assertEqual(input.tell(), len(data))
+        self.assertEqual(
+            request.in_headers, {"X-Real-Ip": "1.1.1.1", "Cookie": "hello=world"}
+        )
+        self.assertEqual(request.cookies, dict(hello="world"))
+        self.assertEqual(request.authorization, None)
+
+        data = appier.legacy.bytes("message=hello&session_id=1234", encoding="utf-8")
+        input = appier.legacy.BytesIO(data)
+        request = appier.Request(
+            "POST",
+            "/",
+            address="127.0.0.1",
+            params=dict(name=["world"]),
+            environ=dict(CONTENT_TYPE="application/x-www-form-urlencoded"),
+        )
+        request.set_input(input)
+        request.extend_args(request.params)
+        request.load_base()
+
+        self.assertEqual(request.params_s, dict(name="world"))
+        self.assertEqual(
+            request.post_s, dict(message="hello", session_id="1234", sid="1234")
+        )
+        self.assertEqual(request.files_s, dict())
+        self.assertEqual(request.post["sid"], ["1234"])
+        self.assertEqual(request.args["sid"], ["1234"])
+        self.assertEqual(request.args["name"], ["world"])
+        self.assertEqual(request.in_length, len(data))
+
+        request = appier.Request(
+            "GET", "/", environ=dict(HTTP_AUTHORIZATION="Basic aGVsbG8=")
+        )
+        request.load_base()
+
+        self.assertRaises(appier.OperationalError, lambda: request.authorization)
+        self.assertRaises(appier.OperationalError, lambda: request.authorization)
+
+        request.authorization = ("hello", "world")
+
+        self.assertEqual(request.authorization, ("hello", "world"))
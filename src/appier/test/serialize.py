@@ -28,6 +28,8 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import json
+import datetime
 import unittest
 
 import appier
@@ -56,3 +58,187 @@ class SerializeTest(unittest.TestCase):
 
         result = appier.serialize_csv([dict(item=appier.legacy.u("你好世界"))])
         self.assertEqual(result, "item\r\n你好世界\r\n")
+
+    def test_csv_keys(self):
+        result = appier.serialize_csv([dict(b=1, a="x"), dict(b=None, a="y")])
+        self.assertEqual(result, "a;b\r\nx;1\r\ny;\r\n")
+
+        result = appier.serialize_csv(
+            [dict(b=1, a="x"), dict(b=None, a="y")], keys=["b", "a"]
+        )
+        self.assertEqual(result, "b;a\r\n1;x\r\n;y\r\n")
+
+        result = appier.serialize_csv(
+            [dict(a=1), dict(a=2)], encoders=dict(a=lambda value: "#%d" % value)
+        )
+        self.assertEqual(result, "a\r\n#1\r\n#2\r\n")
+
+        result = appier.serialize_csv([["hello", "world"]], keys=["a", "b"])
+        self.assertEqual(result, "a;b\r\nhello;world\r\n")
+
+        result = appier.serialize_csv([])
+        self.assertEqual(result, "")
+
+        self.assertRaises(
+            appier.OperationalError, lambda: appier.serialize_csv([], strict=True)
+        )
+
+    def test_csv_g(self):
+        items = (dict(index=index) for index in range(1000))
+        chunks = list(appier.serialize_csv_g(items, buffer_size=1024))
+
+        self.assertEqual(len(chunks) > 1, True)
+        self.assertEqual(all(type(chunk) == bytes for chunk in chunks), True)
+
+        result = b"".join(chunks)
+        lines = result.split(b"\r\n")
+        self.assertEqual(lines[0], b"index")
+        self.assertEqual(lines[1], b"0")
+        self.assertEqual(lines[1000], b"999")
+        self.assertEqual(len(lines), 1002)
+
+        items = iter([["item"], [appier.legacy.u("你好世界")]])
+        chunks = list(appier.serialize_csv_g(items, sized=True))
+        self.assertEqual(
+            chunks, [-1, appier.legacy.u("item\r\n你好世界\r\n").encode("utf-8")]
+        )
+
+        chunks = list(appier.serialize_csv_g(iter([]), sized=True))
+        self.assertEqual(chunks, [-1])
+
+        generator = appier.serialize_csv_g(iter([]), strict=True, sized=True)
+        self.assertRaises(appier.OperationalError, lambda: next(generator))
+
+    def test_ics(self):
+        item = dict(
+            start="20240101T100000Z",
+            end="20240101T110000Z",
+            description="Meeting",
+            location="Porto",
+            uuid="uuid",
+        )
+
+        result = appier.serialize_ics([item])
+        self.assertEqual(result.startswith("BEGIN:VCALENDAR\r\n"), True)
+        self.assertEqual(result.endswith("END:VEVENT\r\nEND:VCALENDAR\r\n"), True)
+        self.assertEqual("UID:uuid\r\nTZID:Etc/GMT\r\n" in result, True)
+        self.assertEqual("SUMMARY:Meeting\r\nLOCATION:Porto\r\n" in result, True)
+
+        items = [item] * 100
+        chunks = list(appier.serialize_ics_g(items, sized=True, buffer_size=512))
+        self.assertEqual(chunks[0], -1)
+        self.assertEqual(len(chunks) > 2, True)
+
+        result = appier.serialize_ics(items)
+        self.assertEqual(b"".join(chunks[1:]), appier.legacy.bytes(result))
+
+    def test_json(self):
+        result = appier.serialize.dumps_json(dict(a=1, b="hello"), sort_keys=True)
+        self.assertEqual(result, '{"a": 1, "b": "hello"}')
+
+        result = appier.serialize.dumps_json(
+            dict(date=datetime.datetime(2024, 1, 1), data=b"hello")
+        )
+        self.assertEqual(
+            json.loads(result), dict(date="2024-01-01 00:00:00", data="hello")
+        )
+
+        self.assertRaises(
+            UnicodeDecodeError, lambda: appier.serialize.dumps_json(dict(data=b"\xff"))
+        )
+
+        result = appier.serialize.dumps_json(
+            dict(value=appier.legacy.u("你好")), ensure_ascii=False
+        )
+        self.assertEqual(json.loads(result), dict(value=appier.legacy.u("你好")))
+
+        result = appier.serialize.dumps_json_b(dict(a=1), indent=2)
+        self.assertEqual(result, b'{\n  "a": 1\n}')
+
+        result = appier.serialize.dumps_json_b(
+            dict(value=appier.legacy.u("你好")), encoding="latin-1"
+        )
+        self.assertEqual(result, b'{"value": "\\u4f60\\u597d"}')
+
+    def test_json_engines(self):
+        value = dict(
+            name=appier.legacy.u("你好"),
+            date=datetime.date(2024, 1, 1),
+            large=2**70,
+            items=[1, 2.5, None, True],
+        )
+        expected = dict(
+            name=appier.legacy.u("你好"),
+            date="2024-01-01",
+            large=2**70,
+            items=[1, 2.5, None, True],
+        )
+
+        engine = appier.serialize.get_json_engine()
+
+        try:
+            for name in appier.serialize.JSON_ENGINES:
+                try:
+                    appier.serialize.set_json_engine(name)
+                except appier.OperationalError:
+                    continue
+
+                result = appier.serialize.dumps_json_b(value, sort_keys=True)
+                self.assertEqual(type(result), bytes)
+                self.assertEqual(json.loads(result.decode("utf-8")), expected)
+
+                result = appier.serialize.dumps_json(value)
+                self.assertEqual(json.loads(result), expected)
+
+                result = appier.serialize.dumps_json(value, ensure_ascii=True)
+                self.assertEqual(json.loads(result), expected)
+                self.assertEqual("\\u4f60" in result, True)
+
+                result = appier.serialize.dumps_json(
+                    dict(a=1, b=2), sort_keys=True, separators=(", ", ": ")
+                )
+                self.assertEqual(result, '{"a": 1, "b": 2}')
+        finally:
+            appier.serialize.set_json_engine(engine)
+
+        self.assertRaises(
+            appier.OperationalError, lambda: appier.serialize.set_json_engine("invalid")
+        )
+
+    def test_json_g(self):
+        items = (dict(index=index) for index in range(1000))
+        chunks = list(appier.serialize.dumps_json_g(items, buffer_size=1024))
+
+        self.assertEqual(len(chunks) > 1, True)
+        self.assertEqual(chunks[0].startswith(b'[{"index": 0}'), True)
+
+        result = json.loads(b"".join(chunks).decode("utf-8"))
+        self.assertEqual(result, [dict(index=index) for index in range(1000)])
+
+        chunks = list(appier.serialize.dumps_json_g(iter([]), sized=True))
+        self.assertEqual(chunks, [-1, b"[]"])
+
+        items = (dict(index=index) for index in range(100))
+        chunks = list(
+            appier.serialize.dumps_json_g(items, encoding="utf-16", buffer_size=64)
+        )
+
+        result = json.loads(b"".join(chunks).decode("utf-16"))
+        self.assertEqual(result, [dict(index=index) for index in range(100)])
+
+    def test_json_permissive(self):
+        result = appier.serialize.dumps_json(dict(date=datetime.date(2024, 1, 1)))
+        self.assertEqual(result, '{"date": "2024-01-01"}')
+
+        permissive = appier.serialize.JSON_PERMISSIVE
+        appier.serialize.set_json_permissive(False)
+
+        try:
+            self.assertRaises(
+                TypeError,
+                lambda: appier.serialize.dumps_json(
+                    dict(date=datetime.date(2024, 1, 1))
+                ),
+            )
+        finally:
+            appier.serialize.set_json_permissive(permissive)
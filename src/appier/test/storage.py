@@ -303,3 +303,248 @@ class FsEngineTest(unittest.TestCase):
 
         file_path = os.path.join(self.temp_dir, "test.txt")
         self.assertEqual(os.path.exists(file_path), False)
+
+
+class ChunkEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_store(self):
+        file_data = b"Hello World"
+        file = appier.File((b"test.txt", None, file_data))
+        file.engine = "chunk"
+        file.params = {"dir_path": os.path.join(self.temp_dir, "test")}
+
+        with appier.conf_override("FS_CHUNK_SIZE", 4):
+            appier.ChunkEngine.store(file)
+
+        dir_path = os.path.join(self.temp_dir, "test")
+        self.assertEqual(
+            sorted(os.listdir(dir_path)), ["00000000", "00000001", "00000002"]
+        )
+
+        appier.ChunkEngine.load(file)
+
+        self.assertEqual(file.size, len(file_data))
+        self.assertEqual(file.hash != None, True)
+        self.assertEqual(file.etag != None, True)
+
+        with appier.conf_override("FS_CHUNK_SIZE", 8):
+            appier.ChunkEngine.store(file)
+
+        self.assertEqual(sorted(os.listdir(dir_path)), ["00000000", "00000001"])
+
+    def test_read(self):
+        file_data = b"Hello World"
+        file = appier.File((b"test.txt", None, file_data))
+        file.engine = "chunk"
+        file.params = {"dir_path": os.path.join(self.temp_dir, "test")}
+
+        with appier.conf_override("FS_CHUNK_SIZE", 4):
+            appier.ChunkEngine.store(file)
+
+        data = appier.ChunkEngine.read(file)
+
+        self.assertEqual(data, file_data)
+        self.assertEqual(hasattr(file, "_handle"), False)
+
+        data = appier.ChunkEngine.read(file, size=6)
+
+        self.assertEqual(data, b"Hello ")
+
+        data = appier.ChunkEngine.read(file, size=6)
+
+        self.assertEqual(data, b"World")
+
+        data = appier.ChunkEngine.read(file, size=6)
+
+        self.assertEqual(data, b"")
+        self.assertEqual(hasattr(file, "_handle"), False)
+
+    def test_seek(self):
+        file_data = b"Hello World"
+        file = appier.File((b"test.txt", None, file_data))
+        file.engine = "chunk"
+        file.params = {"dir_path": os.path.join(self.temp_dir, "test")}
+
+        with appier.conf_override("FS_CHUNK_SIZE", 4):
+            appier.ChunkEngine.store(file)
+
+        appier.ChunkEngine.seek(file, offset=6)
+
+        data = appier.ChunkEngine.read(file)
+
+        self.assertEqual(data, b"World")
+
+    def test_delete(self):
+        file = appier.File((b"test.txt", None, b"Hello World"))
+        file.engine = "chunk"
+        file.params = {"dir_path": os.path.join(self.temp_dir, "test")}
+
+        appier.ChunkEngine.store(file)
+
+        self.assertEqual(os.path.exists(os.path.join(self.temp_dir, "test")), True)
+
+        appier.ChunkEngine.delete(file)
+
+        self.assertEqual(os.path.exists(os.path.join(self.temp_dir, "test")), False)
+
+        appier.ChunkEngine.delete(file)
+
+        self.assertEqual(os.path.exists(os.path.join(self.temp_dir, "test")), False)
+
+    def test_is_seekable(self):
+        self.assertEqual(appier.ChunkEngine.is_seekable(), True)
+
+
+class ContentEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        appier.ContentEngine.clear_cache()
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_store(self):
+        first = appier.File((b"first.txt", None, b"Hello World"))
+        first.engine = "content"
+        second = appier.File((b"second.txt", None, b"Hello World"))
+        second.engine = "content"
+
+        with appier.conf_override("FS_PATH", self.temp_dir):
+            appier.ContentEngine.store(first)
+            appier.ContentEngine.store(second)
+            appier.ContentEngine.store(second)
+
+            first_path = appier.ContentEngine._file_path(first, ensure=False)
+            second_path = appier.ContentEngine._file_path(second, ensure=False)
+            refs = appier.ContentEngine._refs(first.params["digest"])
+
+        digest = "a591a6d40bf420404a011733cfb7b190d62c65bf0bcda32b57b277d9ad9f146e"
+        self.assertEqual(first.params["digest"], digest)
+        self.assertEqual(first_path, second_path)
+        self.assertEqual(os.path.exists(first_path), True)
+        self.assertEqual(refs, set([first.guid, second.guid]))
+        self.assertEqual(first.hash, digest)
+        self.assertEqual(first.etag, digest)
+        self.assertEqual(second.etag, digest)
+        self.assertEqual(first.size, 11)
+
+    def test_store_file(self):
+        file = appier.File((b"test.txt", None, b"Hello"))
+        file.engine = "content"
+        file.data = None
+        file.file = appier.legacy.BytesIO(b"Hello World")
+
+        with appier.conf_override("FS_PATH", self.temp_dir):
+            appier.ContentEngine.store(file)
+            data = appier.ContentEngine.read(file)
+
+        self.assertEqual(data, b"Hello World")
+        self.assertEqual(file.size, 11)
+        self.assertEqual(
+            file.etag,
+            "a591a6d40bf420404a011733cfb7b190d62c65bf0bcda32b57b277d9ad9f146e",
+        )
+
+    def test_delete(self):
+        first = appier.File((b"first.txt", None, b"Hello World"))
+        first.engine = "content"
+        second = appier.File((b"second.txt", None, b"Hello World"))
+        second.engine = "content"
+
+        with appier.conf_override("FS_PATH", self.temp_dir):
+            appier.ContentEngine.store(first)
+            appier.ContentEngine.store(second)
+            file_path = appier.ContentEngine._file_path(first, ensure=False)
+
+            appier.ContentEngine.delete(first)
+
+            self.assertEqual(os.path.exists(file_path), True)
+
+            appier.ContentEngine.delete(second)
+
+            self.assertEqual(os.path.exists(file_path), False)
+            self.assertEqual(os.path.exists(file_path + ".refs"), False)
+
+    def test_fork(self):
+        if not hasattr(os, "fork"):
+            if not hasattr(self, "skipTest"):
+                return
+            self.skipTest("No fork support available")
+
+        files = []
+        for index in range(4):
+            file = appier.File((b"test.txt", None, b"Hello World"))
+            file.engine = "content"
+            files.append(file)
+
+        with appier.conf_override("FS_PATH", self.temp_dir):
+            pids = []
+            for file in files:
+                pid = os.fork()
+                if pid == 0:
+                    try:
+                        for _index in range(10):
+                            appier.ContentEngine.store(file)
+                    finally:
+                        os._exit(0)
+                pids.append(pid)
+            for pid in pids:
+                os.waitpid(pid, 0)
+
+            digest = "a591a6d40bf420404a011733cfb7b190d62c65bf0bcda32b57b277d9ad9f146e"
+            refs = appier.ContentEngine._refs(digest)
+            names = os.listdir(os.path.dirname(appier.ContentEngine._path(digest)))
+
+        self.assertEqual(refs, set(file.guid for file in files))
+        self.assertEqual(sorted(names), [digest, digest + ".refs"])
+
+    def test_update(self):
+        file = appier.File((b"test.txt", None, b"Hello World"))
+        file.engine = "content"
+
+        with appier.conf_override("FS_PATH", self.temp_dir):
+            appier.ContentEngine.store(file)
+            previous_path = appier.ContentEngine._file_path(file, ensure=False)
+
+            file.data = b"Hello"
+            appier.ContentEngine.store(file)
+            file_path = appier.ContentEngine._file_path(file, ensure=False)
+
+            data = appier.ContentEngine.read(file)
+
+        self.assertNotEqual(previous_path, file_path)
+        self.assertEqual(os.path.exists(previous_path), False)
+        self.assertEqual(data, b"Hello")
+
+    def test_cache(self):
+        file = appier.File((b"test.txt", None, b"Hello World"))
+        file.engine = "content"
+
+        with appier.conf_override("FS_PATH", self.temp_dir):
+            with appier.conf_override("CONTENT_CACHE", 16):
+                appier.ContentEngine.store(file)
+                file_path = appier.ContentEngine._file_path(file, ensure=False)
+
+                data = appier.ContentEngine.read(file)
+
+                self.assertEqual(data, b"Hello World")
+                self.assertEqual(
+                    file.params["digest"] in appier.ContentEngine.CACHE, True
+                )
+
+                appier.ContentEngine.seek(file, offset=6)
+                data = appier.ContentEngine.read(file)
+
+                self.assertEqual(data, b"World")
+
+                appier.ContentEngine.delete(file)
+
+        self.assertEqual(os.path.exists(file_path), False)
+        self.assertEqual(file.params["digest"] in appier.ContentEngine.CACHE, False)
@@ -238,6 +238,20 @@ class LimitedSizeDictTest(unittest.TestCase):
         self.assertNotIn("key_0", self.limited_dict)
         self.assertIn("key_%d" % self.dict_size, self.limited_dict)
 
+    def test_delete_item(self):
+        self.limited_dict["first"] = "first_value"
+        self.limited_dict["second"] = "second_value"
+        del self.limited_dict["first"]
+        self.assertNotIn("first", self.limited_dict)
+        self.assertEqual(self.limited_dict.pop("second"), "second_value")
+        self.assertEqual(self.limited_dict.pop("second", None), None)
+        for index in range(self.dict_size + 1):
+            self.limited_dict["key_%d" % index] = "value_%d" % index
+        self.assertNotIn("key_0", self.limited_dict)
+        self.limited_dict.clear()
+        self.assertEqual(len(self.limited_dict), 0)
+        self.assertEqual(len(self.limited_dict._order), 0)
+
     def test_maintaining_order(self):
         for index in range(self.dict_size):
             self.limited_dict["key_%d" % index] = "value_%d" % index
@@ -258,3 +272,52 @@ class LimitedSizeDictTest(unittest.TestCase):
         repr_str = repr(self.limited_dict)
         self.assertIn("'first': 'first_value'", repr_str)
         self.assertIn("'second': 'second_value'", repr_str)
+
+
+class LRUDictTest(unittest.TestCase):
+    def setUp(self):
+        self.dict_size = 4
+        self.lru_dict = appier.LRUDict(self.dict_size)
+
+    def test_exceeding_size_limit(self):
+        for index in range(self.dict_size + 1):
+            self.lru_dict["key_%d" % index] = "value_%d" % index
+        self.assertNotIn("key_0", self.lru_dict)
+        self.assertIn("key_%d" % self.dict_size, self.lru_dict)
+        self.assertEqual(len(self.lru_dict), self.dict_size)
+
+    def test_recently_used(self):
+        for index in range(self.dict_size):
+            self.lru_dict["key_%d" % index] = "value_%d" % index
+        self.assertEqual(self.lru_dict["key_0"], "value_0")
+        self.assertEqual(self.lru_dict.get("key_1"), "value_1")
+        self.lru_dict["key_2"] = "new_value_2"
+        self.lru_dict["new_key"] = "new_value"
+        self.assertIn("key_0", self.lru_dict)
+        self.assertIn("key_1", self.lru_dict)
+        self.assertIn("key_2", self.lru_dict)
+        self.assertNotIn("key_3", self.lru_dict)
+        self.assertEqual(self.lru_dict.get("key_3"), None)
+
+    def test_delete_item(self):
+        self.lru_dict["first"] = "first_value"
+        self.lru_dict["second"] = "second_value"
+        del self.lru_dict["first"]
+        self.assertNotIn("first", self.lru_dict)
+        self.assertEqual(self.lru_dict.pop("second"), "second_value")
+        self.assertEqual(self.lru_dict.pop("second", None), None)
+        for index in range(self.dict_size + 1):
+            self.lru_dict["key_%d" % index] = "value_%d" % index
+        self.assertNotIn("key_0", self.lru_dict)
+        self.lru_dict.clear()
+        self.assertEqual(len(self.lru_dict), 0)
+        self.assertEqual(len(self.lru_dict._links), 0)
+        self.lru_dict["first"] = "first_value"
+        self.assertEqual(self.lru_dict["first"], "first_value")
+
+    def test_empty(self):
+        lru_dict = appier.LRUDict(0)
+        lru_dict["first"] = "first_value"
+        self.assertNotIn("first", lru_dict)
+        self.assertEqual(lru_dict.get("first"), None)
+        self.assertEqual(len(lru_dict), 0)
@@ -28,6 +28,7 @@ __copyright__ = "Copyright (c) 2008-2024 Hive Solutions Lda."
 __license__ = "Apache License, Version 2.0"
 """ The license for the module """
 
+import base64
 import calendar
 import unittest
 import datetime
@@ -139,6 +140,45 @@ class TypesfTest(unittest.TestCase):
         self.assertEqual(file.data, b"Hello World")
         self.assertEqual(file.data_b64, "SGVsbG8gV29ybGQ=")
 
+    def test_file_lazy(self):
+        file_m = dict(name="hello", data="SGVsbG8gV29ybGQ=")
+        file = appier.File(file_m)
+
+        self.assertEqual(file._data_v, None)
+        self.assertEqual(file._hash_v, None)
+        self.assertEqual(file.size, 11)
+        self.assertEqual(file._data_v, None)
+        self.assertEqual(file.data, b"Hello World")
+
+        for data in (b"H", b"He", b"Hel", b"Hell", b"Hello!"):
+            data_b64 = appier.legacy.str(base64.b64encode(data))
+            file = appier.File(dict(name="hello", data=data_b64))
+            self.assertEqual(file.size, len(data))
+
+        for size in (171, 300, 1000):
+            data = b"x" * size
+            data_b64 = appier.legacy.str(base64.b64encode(data))
+            data_b64 = "\n".join(
+                data_b64[index : index + 76] for index in range(0, len(data_b64), 76)
+            )
+            file = appier.File(dict(name="hello", data=data_b64 + "\n"))
+            self.assertEqual(file.size, size)
+            self.assertEqual(file.data, data)
+
+        file = appier.File((b"hello", None, b"Hello World"))
+
+        self.assertEqual(file._data_b64_v, None)
+        self.assertEqual(file._hash_v, None)
+        self.assertEqual(file._etag_v, None)
+        self.assertEqual(file.data_b64, "SGVsbG8gV29ybGQ=")
+        self.assertEqual(file.etag, "b10a8db164e0754105b7a99be72e3fe5")
+
+        file.data = b"Hello"
+
+        self.assertEqual(file.data_b64, "SGVsbG8=")
+        self.assertEqual(file.etag, "8b1a9953c4611296a827abf8c47804d7")
+        self.assertEqual(file.size, 5)
+
     def test_encrypted(self):
         encrypted = appier.encrypted(key=b"hello key")
         result = encrypted("hello world")
@@ -38,6 +38,7 @@ from . import util
 from . import crypt
 from . import legacy
 from . import common
+from . import imaging
 from . import storage
 from . import exceptions
 
@@ -111,23 +112,19 @@ class File(AbstractType):
         params = file_m.get("params", None)
         engine = file_m.get("engine", None)
 
-        is_valid = name and data_b64
-        data_b64_b = legacy.bytes(data_b64)
-        data = base64.b64decode(data_b64_b) if is_valid else None
+        # the base 64 encoded data is kept as the canonical representation
+        # of the file, the raw data is only decoded (and the hash and etag
+        # computed) on demand, if these values are accessed
         data_b64 = legacy.str(data_b64)
-        size = len(data) if is_valid else 0
-        hash = hash or self._hash(data)
-        etag = etag or self._etag(data)
         guid = guid or self._guid()
 
-        self.data = data
         self.data_b64 = data_b64
         self.file = None
         self.hash = hash
-        self.size = size
+        self.etag = etag
+        self.size = None
         self.file_name = name
         self.mime = mime
-        self.etag = etag
         self.guid = guid
         self.params = params
         self.engine = engine
@@ -137,37 +134,29 @@ class File(AbstractType):
     def build_t(self, file_t):
         name, content_type, data = file_t
 
-        is_valid = name and data
-        data_b64 = base64.b64encode(data) if is_valid else None
-        data_b64 = legacy.str(data_b64)
-        size = len(data) if is_valid else 0
-        etag = self._etag(data)
-        hash = self._hash(data)
-        guid = self._guid()
-
+        # the raw data is kept as the canonical representation of the
+        # file, the base 64 encoded data, hash and etag are all derived
+        # (and cached) on demand, avoiding the copies and digests of the
+        # payload for the files that are never serialized
         self.data = data
-        self.data_b64 = data_b64
         self.file = None
-        self.hash = hash
-        self.size = size
         self.file_name = name
         self.mime = content_type
-        self.etag = etag
-        self.guid = guid
+        self.guid = self._guid()
         self.params = None
         self.engine = None
 
         self._load()
 
     def build_i(self, file):
-        self.data = file.data
-        self.data_b64 = file.data_b64
+        self._data_v = file._data_v
+        self._data_b64_v = file._data_b64_v
+        self._hash_v = file._hash_v
+        self._etag_v = file._etag_v
+        self._size_v = file._size_v
         self.file = file.file
-        self.hash = file.hash
-        self.size = file.size
         self.file_name = file.file_name
         self.mime = file.mime
-        self.etag = file.etag
         self.guid = file.guid
         self.params = file.params
         self.engine = file.engine
@@ -176,13 +165,10 @@ class File(AbstractType):
 
     def build_f(self, file):
         self.data = None
-        self.data_b64 = None
         self.file = file
-        self.hash = hash
         self.size = file.content_length
         self.file_name = file.filename
         self.mime = file.content_type
-        self.etag = None
         self.guid = self._guid()
         self.params = None
         self.engine = None
@@ -241,7 +227,7 @@ class File(AbstractType):
         return engine.is_stored()
 
     def is_valid(self):
-        return self.file_name or (self.data or self.data_b64)
+        return self.file_name or self._has_data()
 
     def is_empty(self):
         return self.size <= 0
@@ -260,9 +246,21 @@ class File(AbstractType):
         digest = hash.hexdigest()
         return digest
 
+    def _size_b64(self, data_b64):
+        # computes the size of the decoded data directly from the length
+        # of the base 64 value, taking into account the padding characters
+        # and avoiding the (expensive) decoding of the value, notice that
+        # any whitespace (eg: line wrapping) is not part of the alphabet
+        data_b64 = "".join(legacy.str(data_b64).split())
+        padding = len(data_b64) - len(data_b64.rstrip("="))
+        return len(data_b64) * 3 // 4 - padding
+
     def _guid(self):
         return str(uuid.uuid4())
 
+    def _has_data(self):
+        return True if self._data_v or self._data_b64_v else False
+
     def _load(self, force=False):
         engine = self._engine()
         engine.load(self, force=force)
@@ -279,19 +277,81 @@ class File(AbstractType):
 
         This method should be called whenever the data attributes are
         changed as defined in specification.
+
+        Note that the values are only invalidated by this method, they
+        are going to be lazily re-computed on their first access.
         """
 
-        self.data_b64 = base64.b64encode(self.data)
-        self.data_b64 = legacy.str(self.data_b64)
-        self.hash = self._hash(self.data)
-        self.size = len(self.data)
-        self.etag = self._etag(self.data)
+        self.data = self.data
 
     def _engine(self):
         if not self.engine:
             return storage.BaseEngine
         return getattr(storage, self.engine.capitalize() + "Engine")
 
+    @property
+    def data(self):
+        if self._data_v == None and self._data_b64_v:
+            data_b64 = legacy.bytes(self._data_b64_v)
+            self._data_v = base64.b64decode(data_b64)
+        return self._data_v
+
+    @data.setter
+    def data(self, value):
+        self._data_v = value
+        self._data_b64_v = None
+        self._hash_v = None
+        self._etag_v = None
+        self._size_v = None
+
+    @property
+    def data_b64(self):
+        if self._data_b64_v == None and self._data_v:
+            data_b64 = base64.b64encode(self._data_v)
+            self._data_b64_v = legacy.str(data_b64)
+        return self._data_b64_v
+
+    @data_b64.setter
+    def data_b64(self, value):
+        self._data_v = None
+        self._data_b64_v = value
+        self._hash_v = None
+        self._etag_v = None
+        self._size_v = None
+
+    @property
+    def hash(self):
+        if self._hash_v == None:
+            self._hash_v = self._hash(self.data)
+        return self._hash_v
+
+    @hash.setter
+    def hash(self, value):
+        self._hash_v = value
+
+    @property
+    def etag(self):
+        if self._etag_v == None:
+            self._etag_v = self._etag(self.data)
+        return self._etag_v
+
+    @etag.setter
+    def etag(self, value):
+        self._etag_v = value
+
+    @property
+    def size(self):
+        if self._size_v == None and self._data_v == None and self._data_b64_v:
+            self._size_v = self._size_b64(self._data_b64_v)
+        if self._size_v == None:
+            data = self.data
+            self._size_v = len(data) if data else 0
+        return self._size_v
+
+    @size.setter
+    def size(self, value):
+        self._size_v = value
+
 
 class Files(AbstractType):
     def __init__(self, files):
@@ -341,8 +401,15 @@ class Files(AbstractType):
 
 
 class ImageFile(File):
+    @classmethod
+    def prefetch(cls, files):
+        pass
+
     def build_b64(self, file_m):
         File.build_b64(self, file_m)
+        self._build_m(file_m)
+
+    def _build_m(self, file_m):
         self.width = file_m.get("width", 0)
         self.height = file_m.get("height", 0)
         self.format = file_m.get("format", None)
@@ -464,6 +531,14 @@ class ImageFiles(Files):
     def base(self):
         return ImageFile
 
+    def build_f(self, files):
+        # allows the base (image) class to start the processing of
+        # the complete set of files in advance (concurrently) before
+        # the sequential building of each of the files
+        base = self.base()
+        base.prefetch(files if type(files) == list else [files])
+        Files.build_f(self, files)
+
 
 def image(width=None, height=None, format="png", **kwargs):
     class _ImageFile(ImageFile):
@@ -492,12 +567,10 @@ def image(width=None, height=None, format="png", **kwargs):
             if not need_resize:
                 return
 
-            # decodes the base 64 based data and then runs the resize
-            # operation with the current data re-encoding it back to
-            # the base 64 model to be used in the map storage
-            data_b64 = legacy.bytes(self.data_b64)
-            data = base64.b64decode(data_b64)
-            data = self.resize(data)
+            # runs the resize operation with the current data (decoded
+            # only once and cached) through the image pipeline and then
+            # re-encodes it back to the base 64 model for the map storage
+            data = self.derive(self.data)
             data_b64 = base64.b64encode(data)
             data_b64 = legacy.str(data_b64)
 
@@ -520,8 +593,11 @@ def image(width=None, height=None, format="png", **kwargs):
                     del file_m[name]
 
             # runs the rebuilding of the information taking into
-            # account the new information from the file
-            ImageFile.build_b64(self, file_m)
+            # account the new information from the file, re-using
+            # the resized data instead of decoding it back
+            File.build_b64(self, file_m)
+            self._data_v = data
+            self._build_m(file_m)
 
         def build_t(self, file_t):
             # unpacks the file tuple into its component to be
@@ -531,7 +607,7 @@ def image(width=None, height=None, format="png", **kwargs):
             # tries to run the resize operation to ensure that
             # the proper size and format is present in the data
             try:
-                _data = self.resize(data) if data else data
+                _data = self.derive(data) if data else data
             except Exception:
                 _data = data
 
@@ -544,11 +620,46 @@ def image(width=None, height=None, format="png", **kwargs):
             file_t = (name, content_type, _data)
             ImageFile.build_t(self, file_t)
 
+        @classmethod
+        def prefetch(cls, files):
+            # submits the resizing of the complete set of (tuple based)
+            # files to the image pipeline so that they are processed
+            # concurrently, the building of the files then waits for them
+            for file in files:
+                if not isinstance(file, tuple):
+                    continue
+                _name, _content_type, data = file
+                if not data:
+                    continue
+                cls._submit(data)
+
+        @classmethod
+        def _submit(cls, data):
+            key = (
+                imaging.digest(data),
+                width,
+                height,
+                format,
+                repr(sorted(kwargs.items())),
+            )
+            return imaging.submit(key, cls._resize_data, data)
+
+        def derive(self, data=None):
+            data = data or self.data
+            if not data:
+                return data
+            future = self._submit(data)
+            return future.result()
+
         def resize(self, data=None):
+            data = data or self.data
+            return self._resize_data(data)
+
+        @classmethod
+        def _resize_data(cls, data):
             util.ensure_pip("PIL", package="pillow")
             import PIL.Image
 
-            data = data or self.data
             if not data:
                 return data
 
@@ -564,8 +675,8 @@ def image(width=None, height=None, format="png", **kwargs):
             out_buffer = legacy.BytesIO()
             try:
                 image = PIL.Image.open(in_buffer)
-                image = self._resize(image, size)
-                image = self._format(image, format, background)
+                image = cls._resize(image, size)
+                image = cls._format(image, format, background)
                 image.save(out_buffer, format, **params)
                 data = out_buffer.getvalue()
             finally:
@@ -587,7 +698,8 @@ def image(width=None, height=None, format="png", **kwargs):
                 return True
             return False
 
-        def _resize(self, image, size, resample=None):
+        @classmethod
+        def _resize(cls, image, size, resample=None):
             util.ensure_pip("PIL", package="pillow")
             import PIL.Image
 
@@ -646,14 +758,11 @@ def image(width=None, height=None, format="png", **kwargs):
             image = image.resize(size, resample)
             return image
 
-        def _format(self, image, format, background):
+        @classmethod
+        def _format(cls, image, format, background):
             util.ensure_pip("PIL", package="pillow")
             import PIL.Image
 
-            # retrieves the reference to the top level class that is
-            # going to be used for the access to some of the values
-            cls = self.__class__
-
             # converts the target format into the lower based version
             # (normalization) and verifies if it's considered to be
             # an RGB only format, if that's not the case there's nothing
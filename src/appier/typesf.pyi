@@ -46,6 +46,7 @@ class File(AbstractType):
     def _hash(self, data: bytes | None) -> str | None: ...
     def _etag(self, data: bytes | None) -> str | None: ...
     def _guid(self) -> str: ...
+    def _has_data(self) -> bool: ...
     def _load(self, force: bool = ...) -> None: ...
     def _store(self, force: bool = ...) -> None: ...
     def _compute(self) -> None: ...
@@ -69,7 +70,10 @@ class ImageFile(File):
     height: int
     format: str | None
     kwargs: dict[str, Any]
+    @classmethod
+    def prefetch(cls, files: Sequence[FileLike]) -> None: ...
     def build_b64(self, file_m: dict[str, Any]) -> None: ...
+    def _build_m(self, file_m: dict[str, Any]) -> None: ...
     def build_t(self, file_t: tuple[str, str | None, bytes | None]) -> None: ...
     def build_i(self, file: File) -> None: ...
     def build_f(self, file: Any) -> None: ...
@@ -89,6 +93,7 @@ class ImageFile(File):
 
 class ImageFiles(Files):
     def base(self) -> type[ImageFile]: ...
+    def build_f(self, files: Any) -> None: ...
 
 def image(
     width: int | None = ..., height: int | None = ..., format: str = ..., **kwargs